@@ -0,0 +1,108 @@
+"""
+Shared fixtures.
+
+The golden-image suite (test_golden.py) renders the fixed-seed configs in
+golden/cases.json once per session, one case per worker process, and hands
+every stage image back to the tests. Workers force the built-in fallback
+noise, so results don't depend on whether the optional `noise` package is
+installed.
+
+    python -m pytest tests -q                    # check (pre-commit gate)
+    python -m pytest tests -q --update-golden    # accept the current output
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+GOLDEN_DIR = Path(__file__).resolve().parent / "golden"
+
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("golden", "golden-image regression suite")
+    group.addoption("--update-golden", action="store_true",
+                    help="Overwrite the stored golden images and hashes with the current output.")
+    group.addoption("--golden-diff-dir", default=str(GOLDEN_DIR / "diffs"),
+                    help="Where expected/actual/diff images of mismatching stages go.")
+
+
+def load_golden_spec() -> dict[str, Any]:
+    return json.loads((GOLDEN_DIR / "cases.json").read_text(encoding="utf-8"))
+
+
+def build_case_config(spec: dict[str, Any], name: str, output_dir: Path) -> dict:
+    from zomboid_map_gen import batch, config as cfg
+
+    conf = cfg.default_config()
+    for path, value in {**spec.get("base", {}), **spec["cases"][name].get("overrides", {})}.items():
+        batch.set_path(conf, path, json.loads(json.dumps(value)))
+    conf["output_dir"] = str(output_dir)
+    return conf
+
+
+# ---- render workers (top-level so they pickle under spawn too) ----
+def _init_render_worker(repo_root: str) -> None:
+    # relative asset paths in the default config resolve against the repo
+    os.chdir(repo_root)
+    from zomboid_map_gen.utils import noise_utils, parallel
+
+    noise_utils.noise = None
+    parallel.run_inline()
+
+
+def _render_case(case: dict[str, Any], conf: dict) -> dict[str, Any]:
+    from PIL import Image
+    from zomboid_map_gen import core
+
+    if case.get("kind") == "lowres":
+        layers = core.generate_lowres_preview(conf, 0, 0, int(case.get("factor", 4)))
+    else:
+        layers = core.generate_from_config(conf)
+    return {stage: img for stage, img in layers.items() if isinstance(img, Image.Image)}
+
+
+@pytest.fixture(scope="session")
+def golden_renders(request, tmp_path_factory) -> dict[str, dict[str, Any] | BaseException]:
+    """Case name -> {stage: image}, or the exception the case raised.
+
+    Only the cases selected for this session (e.g. with -k) are rendered.
+    """
+    spec = load_golden_spec()
+    selected = {item.callspec.params["case"] for item in request.session.items
+                if "golden_renders" in getattr(item, "fixturenames", ())
+                and "case" in getattr(getattr(item, "callspec", None), "params", {})}
+    out_root = tmp_path_factory.mktemp("golden_runs")
+    confs = {name: build_case_config(spec, name, out_root / name)
+             for name in spec["cases"] if name in selected}
+    workers = max(1, min(len(confs), os.cpu_count() or 1))
+    results: dict[str, dict[str, Any] | BaseException] = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_render_worker,
+                             initargs=(str(REPO_ROOT),)) as ex:
+        futures = {name: ex.submit(_render_case, spec["cases"][name], conf) for name, conf in confs.items()}
+        for name, fut in futures.items():
+            try:
+                results[name] = fut.result()
+            except Exception as exc:
+                results[name] = exc
+    return results
+
+
+@pytest.fixture(scope="session")
+def golden_update(request) -> bool:
+    return bool(request.config.getoption("--update-golden"))
+
+
+@pytest.fixture(scope="session")
+def golden_diff_dir(request) -> Path:
+    return Path(request.config.getoption("--golden-diff-dir"))
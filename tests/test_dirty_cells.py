@@ -0,0 +1,81 @@
+"""
+Incremental tile export: a local edit must only dirty the cells around it.
+Adding a town to the path planner's map is re-planned on a flat terrain and
+every cell whose fingerprint is unchanged must also render the same roads and
+details pixels, so skipping it on re-export is safe.
+"""
+
+from __future__ import annotations
+
+import json
+
+from PIL import Image, ImageChops
+
+from zomboid_map_gen import batch, config as cfg
+from zomboid_map_gen.export import dirty_cells
+from zomboid_map_gen.roads import rasterize, road_generator
+from zomboid_map_gen.utils import colors, noise_utils
+from zomboid_map_gen.vegetation import detail_generator
+
+CELLS = 16
+CELL_SIZE = 24
+
+DETAILS = {
+    "enabled": True,
+    "layers": [
+        {"name": "trash", "rule_color": [160, 130, 95], "density": 0.3, "sampling": "points",
+         "road_mode": "asphalt_only", "near_road_radius": 2, "stride": 2, "jitter": 1},
+        {"name": "flowers", "rule_color": [240, 200, 160], "density": 0.1, "sampling": "points",
+         "terrain_in": ["light_grass"], "cluster_radius": 3},
+    ],
+    "quick": {},
+}
+
+
+def _config(towns: int) -> dict:
+    conf = cfg.default_config()
+    for path, value in {
+        "seed": 7, "canvas.cells_x": CELLS, "canvas.cells_y": CELLS, "canvas.cell_size": CELL_SIZE,
+        "roads.path_cache": False, "roads.planner": "path", "roads.highways_count": 1,
+        "roads.towns": towns, "roads.town_block": 24, "roads.farm_spurs": 4,
+    }.items():
+        batch.set_path(conf, path, value)
+    conf["details"] = json.loads(json.dumps(DETAILS))
+    return conf
+
+
+def _changed_cells(a: Image.Image, b: Image.Image) -> set[tuple[int, int]]:
+    diff = ImageChops.difference(a, b)
+    return {
+        (cx, cy)
+        for cy in range(CELLS) for cx in range(CELLS)
+        if diff.crop((cx * CELL_SIZE, cy * CELL_SIZE, (cx + 1) * CELL_SIZE, (cy + 1) * CELL_SIZE)).getbbox()
+    }
+
+
+def test_adding_a_town_dirties_only_nearby_cells(monkeypatch):
+    monkeypatch.setattr(noise_utils, "noise", None)
+    size = CELLS * CELL_SIZE
+    terrain = Image.new("RGBA", (size, size), colors.VANILLA["light_grass"])
+
+    results = []
+    for towns in (1, 2):
+        conf = _config(towns)
+        net, _ = road_generator.plan(conf, terrain, None)
+        settings = road_generator.render_settings(conf)
+        prints = dirty_cells.cell_fingerprints(
+            "base", CELLS, CELLS, CELL_SIZE, net, settings, detail_generator.road_reach(conf))
+        roads = rasterize.render_full(net, settings, max_workers=1)
+        details = detail_generator.generate(conf, size, size, terrain, None,
+                                            road_network=net, road_settings=settings)
+        results.append((prints, roads, details))
+
+    (before, roads_a, details_a), (after, roads_b, details_b) = results
+    dirty = {cell for cell in before if before[cell] != after[cell]}
+    assert 0 < len(dirty) < CELLS * CELLS // 2
+
+    details_changed = _changed_cells(details_a, details_b)
+    assert details_changed, "the new town should add details somewhere"
+    assert details_changed <= dirty
+    assert _changed_cells(roads_a, roads_b) <= dirty
+
@@ -0,0 +1,117 @@
+"""
+Golden-image regression: every stage image of each case in golden/cases.json
+must match the stored reference. A matching pixel hash passes at once;
+otherwise the stage is diffed against golden/<case>/<stage>.png and fails
+when more pixels changed (by more than `pixel_tolerance` in any channel) than
+`max_changed_fraction` allows. Failing stages leave <stage>.expected.png,
+<stage>.actual.png and <stage>.diff.png (changes in red) in the diff dir.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import shutil
+from functools import reduce
+from pathlib import Path
+from typing import Any
+
+import pytest
+from PIL import Image, ImageChops
+
+from conftest import GOLDEN_DIR, load_golden_spec
+
+SPEC = load_golden_spec()
+EXPECTED_PATH = GOLDEN_DIR / "expected.json"
+
+
+def image_digest(img: Image.Image) -> str:
+    h = hashlib.sha256(f"{img.mode}:{img.width}x{img.height}:".encode("ascii"))
+    if img.mode == "P":
+        h.update(bytes(img.getpalette() or []))
+    h.update(img.tobytes())
+    return h.hexdigest()
+
+
+def _load_expected() -> dict[str, dict[str, str]]:
+    if not EXPECTED_PATH.exists():
+        return {}
+    return json.loads(EXPECTED_PATH.read_text(encoding="utf-8"))
+
+
+def _store(case: str, images: dict[str, Image.Image]) -> None:
+    case_dir = GOLDEN_DIR / case
+    shutil.rmtree(case_dir, ignore_errors=True)
+    case_dir.mkdir(parents=True)
+    for stage, img in images.items():
+        img.save(case_dir / f"{stage}.png")
+    expected = _load_expected()
+    expected[case] = {stage: image_digest(img) for stage, img in sorted(images.items())}
+    EXPECTED_PATH.write_text(json.dumps(dict(sorted(expected.items())), indent=2) + "\n", encoding="utf-8")
+
+
+def _changed_mask(expected: Image.Image, actual: Image.Image, tolerance: int) -> Image.Image:
+    diff = ImageChops.difference(expected.convert("RGBA"), actual.convert("RGBA"))
+    largest = reduce(ImageChops.lighter, diff.split())
+    return largest.point(lambda v: 255 if v > tolerance else 0)
+
+
+def _write_diff(out_dir: Path, stage: str, expected: Image.Image | None, actual: Image.Image,
+                mask: Image.Image | None) -> None:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    actual.save(out_dir / f"{stage}.actual.png")
+    if expected is None:
+        return
+    expected.save(out_dir / f"{stage}.expected.png")
+    if mask is not None:
+        vis = expected.convert("L").point(lambda v: v // 3).convert("RGB")
+        vis.paste((255, 0, 0), mask=mask)
+        vis.save(out_dir / f"{stage}.diff.png")
+
+
+def _compare(case: str, stage: str, actual: Image.Image, digest: str, threshold: dict[str, Any],
+             diff_dir: Path) -> str | None:
+    """None when the stage matches, else a one-line failure."""
+    if image_digest(actual) == digest:
+        return None
+    ref_path = GOLDEN_DIR / case / f"{stage}.png"
+    if not ref_path.exists():
+        _write_diff(diff_dir, stage, None, actual, None)
+        return f"{stage}: hash mismatch and no reference image {ref_path}"
+    with Image.open(ref_path) as ref:
+        expected = ref.copy()
+    if expected.size != actual.size or expected.mode != actual.mode:
+        _write_diff(diff_dir, stage, expected, actual, None)
+        return (f"{stage}: expected {expected.mode} {expected.size}, "
+                f"got {actual.mode} {actual.size}")
+    mask = _changed_mask(expected, actual, int(threshold.get("pixel_tolerance", 0)))
+    changed = mask.histogram()[255] / float(actual.width * actual.height)
+    if changed <= float(threshold.get("max_changed_fraction", 0.0)):
+        return None
+    _write_diff(diff_dir, stage, expected, actual, mask)
+    return f"{stage}: {changed:.3%} of pixels changed (diff in {diff_dir})"
+
+
+@pytest.mark.parametrize("case", sorted(SPEC["cases"]))
+def test_golden(case, golden_renders, golden_update, golden_diff_dir):
+    result = golden_renders[case]
+    if isinstance(result, BaseException):
+        raise result
+    if golden_update:
+        _store(case, result)
+        return
+
+    expected = _load_expected().get(case)
+    if expected is None:
+        pytest.fail(f"no golden images for {case!r}; run pytest with --update-golden")
+    threshold = {**SPEC.get("threshold", {}), **SPEC["cases"][case].get("threshold", {})}
+    diff_dir = golden_diff_dir / case
+    shutil.rmtree(diff_dir, ignore_errors=True)
+
+    failures = [f"{stage}: missing from output" for stage in sorted(set(expected) - set(result))]
+    failures += [f"{stage}: unexpected new output" for stage in sorted(set(result) - set(expected))]
+    for stage in sorted(set(expected) & set(result)):
+        failure = _compare(case, stage, result[stage], expected[stage], threshold, diff_dir)
+        if failure:
+            failures.append(failure)
+    assert not failures, f"golden case {case!r} changed:\n  " + "\n  ".join(failures)
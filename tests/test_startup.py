@@ -0,0 +1,77 @@
+"""
+Startup-time regression: the CLI's --help and the GUI module import must not
+pull in Pillow, the generators or the process pool. Checked with
+`python -X importtime` in a fresh interpreter.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+HEAVY_MODULES = (
+    "PIL.Image",
+    "zomboid_map_gen.core",
+    "zomboid_map_gen.terrain.terrain_generator",
+    "zomboid_map_gen.vegetation.vegetation_generator",
+    "zomboid_map_gen.roads.road_generator",
+    "zomboid_map_gen.export.encoding",
+    "multiprocessing",
+    "concurrent.futures.process",
+)
+# generous: a cold CI box, but far below what loading Pillow + the pipeline costs
+IMPORT_BUDGET_US = 250_000
+
+
+def _importtime(*args: str) -> dict[str, int]:
+    """Module -> cumulative import time (us) for `python -X importtime <args>`.
+
+    "<total>" sums the top-level imports (everything the command loaded).
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=REPO_ROOT, capture_output=True, text=True, timeout=60,
+    )
+    assert proc.returncode == 0, proc.stderr
+    times: dict[str, int] = {"<total>": 0}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        try:
+            times[name.strip()] = int(cumulative)
+        except ValueError:  # header row
+            continue
+        if not name[1:].startswith(" "):
+            times["<total>"] += int(cumulative)
+    return times
+
+
+def _assert_light(times: dict[str, int], what: str) -> None:
+    loaded = sorted(m for m in HEAVY_MODULES if m in times)
+    assert not loaded, f"{what} imports heavy modules eagerly: {loaded}"
+    total = times["<total>"]
+    assert total < IMPORT_BUDGET_US, f"{what} spent {total / 1000:.0f} ms importing"
+
+
+def test_cli_help_is_light():
+    times = _importtime("-m", "zomboid_map_gen.cli", "--help")
+    _assert_light(times, "cli --help")
+
+
+def test_core_import_defers_generators():
+    times = _importtime("-c", "import zomboid_map_gen.core")
+    loaded = sorted(m for m in HEAVY_MODULES if m in times and m != "zomboid_map_gen.core")
+    assert not loaded, f"zomboid_map_gen.core imports heavy modules eagerly: {loaded}"
+
+
+@pytest.mark.skipif(importlib.util.find_spec("tkinter") is None, reason="tkinter not available")
+def test_gui_import_is_light():
+    times = _importtime("-c", "import zomboid_map_gen.ui.main_gui")
+    _assert_light(times, "ui.main_gui")
@@ -0,0 +1,188 @@
+# zomboid_map_gen/batch.py
+"""
+Batch rendering: many configs, seeds and parameter variants in one go.
+
+Runs are the product of configs x seeds x grid values. Each run gets its own
+output directory under the batch root and is executed by one long-lived pool
+of worker processes; inside a worker the pipeline's own pool jobs run
+in-process (parallel.run_inline), so N runs use N cores instead of nesting
+pools, and per-process state (palettes, presets, the on-disk TBX index) is
+set up once per worker rather than once per run.
+
+A manifest (batch_manifest.json) records every run's seed, overrides,
+output directory, status and timings.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterable, Mapping, Sequence
+
+from . import core
+from .utils import parallel
+
+MANIFEST_NAME = "batch_manifest.json"
+
+
+@dataclass(slots=True)
+class BatchRun:
+    name: str
+    config: str
+    seed: int
+    params: dict[str, Any]
+    output_dir: str
+    conf: dict = field(repr=False)
+
+
+def parse_seeds(spec: str) -> list[int]:
+    """'0-49', '3,7,11' or a mix ('0-3,10') -> seed list."""
+    seeds: list[int] = []
+    for part in (p.strip() for p in spec.split(",")):
+        if not part:
+            continue
+        lo, sep, hi = part.partition("-")
+        if sep and lo:
+            start, stop = int(lo), int(hi)
+            step = 1 if stop >= start else -1
+            seeds.extend(range(start, stop + step, step))
+        else:
+            seeds.append(int(part))
+    return seeds
+
+
+def parse_grid(specs: Iterable[str]) -> dict[str, list[Any]]:
+    """['terrain.preset=default,islands', 'roads.enabled=true,false'] -> {path: values}.
+
+    Values are read as JSON where possible, else kept as strings.
+    """
+    grid: dict[str, list[Any]] = {}
+    for spec in specs:
+        path, sep, values = spec.partition("=")
+        if not sep or not path.strip():
+            raise ValueError(f"grid entry must look like section.key=v1,v2: {spec!r}")
+        grid[path.strip()] = [_parse_value(v.strip()) for v in values.split(",") if v.strip()]
+    return grid
+
+
+def _parse_value(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def set_path(conf: dict, path: str, value: Any) -> None:
+    """Set a dotted key (`terrain.layers.0.scale`) in a nested config."""
+    keys = path.split(".")
+    node: Any = conf
+    for key in keys[:-1]:
+        node = node[int(key)] if isinstance(node, list) else node.setdefault(key, {})
+    last = keys[-1]
+    if isinstance(node, list):
+        node[int(last)] = value
+    else:
+        node[last] = value
+
+
+def expand_runs(
+    configs: Sequence[tuple[str, dict]],
+    out_root: Path,
+    seeds: Sequence[int] | None = None,
+    grid: Mapping[str, Sequence[Any]] | None = None,
+) -> list[BatchRun]:
+    """Every (config, seed, grid point) combination, each with its own output dir."""
+    grid = dict(grid or {})
+    keys = list(grid)
+    runs: list[BatchRun] = []
+    for label, base in configs:
+        for seed in (seeds or [int(base.get("seed", 0))]):
+            for values in itertools.product(*(grid[k] for k in keys)):
+                conf = json.loads(json.dumps(base))
+                conf["seed"] = int(seed)
+                params = dict(zip(keys, values))
+                for path, value in params.items():
+                    set_path(conf, path, value)
+                name = _run_name(len(runs), label, seed, params)
+                conf["output_dir"] = str(Path(out_root) / name)
+                runs.append(BatchRun(name=name, config=label, seed=int(seed), params=params,
+                                     output_dir=conf["output_dir"], conf=conf))
+    return runs
+
+
+def _run_name(index: int, label: str, seed: int, params: Mapping[str, Any]) -> str:
+    parts = [f"{index:03d}", label, f"s{seed}"]
+    parts.extend(f"{path.rsplit('.', 1)[-1]}-{value}" for path, value in params.items())
+    name = "_".join(str(p) for p in parts)
+    return "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in name)
+
+
+def run_batch(
+    runs: Sequence[BatchRun],
+    out_root: Path,
+    max_workers: int | None = None,
+    progress: Callable[[int, int, dict], None] | None = None,
+) -> dict:
+    """Render every run across one worker pool and write the batch manifest."""
+    out_root = Path(out_root)
+    out_root.mkdir(parents=True, exist_ok=True)
+    workers = max(1, min(len(runs), max_workers or parallel.cpu_count())) if runs else 1
+    started = time.time()
+    records: list[dict | None] = [None] * len(runs)
+
+    ex = None
+    if workers <= 1:
+        # one run at a time: let the pipeline use its own pools
+        results = ((i, _run_worker(run.conf)) for i, run in enumerate(runs))
+    else:
+        ex = ProcessPoolExecutor(max_workers=workers, initializer=parallel.run_inline)
+        futures = {ex.submit(_run_worker, run.conf): i for i, run in enumerate(runs)}
+        results = ((futures[f], f.result()) for f in as_completed(futures))
+    try:
+        for done, (i, result) in enumerate(results, start=1):
+            run = runs[i]
+            record = {k: v for k, v in asdict(run).items() if k != "conf"}
+            record.update(result)
+            records[i] = record
+            if progress:
+                progress(done, len(runs), record)
+    finally:
+        if ex is not None:
+            ex.shutdown(wait=True, cancel_futures=True)
+
+    finished = [r for r in records if r is not None]
+    manifest = {
+        "version": 1,
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+        "elapsed_seconds": round(time.time() - started, 3),
+        "workers": workers,
+        "runs_total": len(runs),
+        "runs_ok": sum(1 for r in finished if r["status"] == "ok"),
+        "runs_failed": sum(1 for r in finished if r["status"] != "ok"),
+        "runs": finished,
+    }
+    (out_root / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+# ---- worker (top-level for Windows spawn) ----
+def _run_worker(conf: dict) -> dict:
+    start = time.perf_counter()
+    try:
+        core.generate_from_config(conf)
+    except Exception as exc:
+        return {
+            "status": "failed",
+            "seconds": round(time.perf_counter() - start, 3),
+            "error": f"{type(exc).__name__}: {exc}",
+            "traceback": traceback.format_exc(),
+            "outputs": [],
+        }
+    out_dir = Path(conf.get("output_dir", "output"))
+    outputs = sorted(str(p) for p in out_dir.iterdir() if p.is_file()) if out_dir.exists() else []
+    return {"status": "ok", "seconds": round(time.perf_counter() - start, 3), "outputs": outputs}
@@ -3,30 +3,57 @@
 Command-line entry point.
 Run with:
     python -m zomboid_map_gen.cli
+
+Batch mode (several configs, a seed range and/or a parameter grid):
+    python -m zomboid_map_gen.cli --config a.json --config b.json \
+        --seeds 0-49 --grid terrain.preset=default,islands --batch-out output/batch
 """
 
 import argparse
 import sys
 import traceback
+from pathlib import Path
 from . import config as cfg
-from . import core
+
+# core / batch (and with them PIL and the generators) load only once a run
+# starts, so --help and argument errors stay instant
 
 
 def main():
     print("[ZOMBOID-MAP-GEN] CLI starting...")
 
     parser = argparse.ArgumentParser(description="Project Zomboid map generator")
-    parser.add_argument("--config", type=str, help="Path to config file (JSON).")
+    parser.add_argument("--config", type=str, action="append",
+                        help="Path to config file (JSON). Repeat for a batch over several configs.")
+    parser.add_argument("--seeds", type=str, help="Batch: seeds to render, e.g. 0-49 or 3,7,11.")
+    parser.add_argument("--grid", type=str, action="append", default=[],
+                        help="Batch: section.key=v1,v2,... (repeatable; runs cover every combination).")
+    parser.add_argument("--batch-out", type=str, help="Batch: root folder for per-run outputs and the manifest.")
+    parser.add_argument("--jobs", type=int, help="Batch: runs rendered in parallel (default: CPU count).")
+    parser.add_argument("--trace", nargs="?", const="", metavar="PATH",
+                        help="Write a Chrome trace of the run (default: <output_dir>/trace.json) and print a summary.")
+    parser.add_argument("--memory", action="store_true",
+                        help="Record per-stage memory use to <output_dir>/memory_report.json.")
     args = parser.parse_args()
 
+    configs = args.config or []
+    if len(configs) > 1 or args.seeds or args.grid:
+        sys.exit(_run_batch(args, configs))
+
     try:
-        if args.config:
-            print(f"[ZOMBOID-MAP-GEN] Loading config from {args.config}")
-            conf = cfg.load_config(args.config)
+        if configs:
+            print(f"[ZOMBOID-MAP-GEN] Loading config from {configs[0]}")
+            conf = cfg.load_config(configs[0])
         else:
             print("[ZOMBOID-MAP-GEN] Using default config")
             conf = cfg.default_config()
 
+        if args.trace is not None:
+            _enable_trace(conf, args.trace)
+        if args.memory:
+            conf.setdefault("memory", {})["enabled"] = True
+        from . import core
+
         print("[ZOMBOID-MAP-GEN] Calling core.generate_from_config(...)")
         core.generate_from_config(conf)
         print("[ZOMBOID-MAP-GEN] Generation complete.")
@@ -36,5 +63,46 @@ def main():
         sys.exit(1)
 
 
+def _run_batch(args, config_paths: list[str]) -> int:
+    from . import batch
+
+    try:
+        if config_paths:
+            configs = [(Path(p).stem, cfg.load_config(p)) for p in config_paths]
+        else:
+            configs = [("default", cfg.default_config())]
+        seeds = batch.parse_seeds(args.seeds) if args.seeds else None
+        grid = batch.parse_grid(args.grid)
+    except (OSError, ValueError) as e:
+        print(f"[ZOMBOID-MAP-GEN] ERROR reading batch options: {e}")
+        return 2
+
+    out_root = Path(args.batch_out) if args.batch_out else Path(configs[0][1].get("output_dir", "output")) / "batch"
+    runs = batch.expand_runs(configs, out_root, seeds=seeds, grid=grid)
+    for run in runs:
+        # one trace / memory report per run, in its output folder
+        if args.trace is not None:
+            _enable_trace(run.conf, "")
+        if args.memory:
+            run.conf.setdefault("memory", {})["enabled"] = True
+    print(f"[ZOMBOID-MAP-GEN] Batch: {len(runs)} runs -> {out_root}")
+
+    def report(done, total, record):
+        status = "ok" if record["status"] == "ok" else f"FAILED ({record['error']})"
+        print(f"[ZOMBOID-MAP-GEN] [{done}/{total}] {record['name']}: {status} in {record['seconds']:.1f}s")
+
+    manifest = batch.run_batch(runs, out_root, max_workers=args.jobs, progress=report)
+    print(f"[ZOMBOID-MAP-GEN] Batch complete: {manifest['runs_ok']} ok, {manifest['runs_failed']} failed "
+          f"in {manifest['elapsed_seconds']:.1f}s. Manifest: {out_root / batch.MANIFEST_NAME}")
+    return 1 if manifest["runs_failed"] else 0
+
+
+def _enable_trace(conf: dict, path: str) -> None:
+    trace_conf = conf.setdefault("trace", {})
+    trace_conf["enabled"] = True
+    if path:
+        trace_conf["path"] = path
+
+
 if __name__ == "__main__":
     main()
@@ -18,6 +18,10 @@ def default_config() -> dict:
             "enabled": True,
             "cell_x": 0,
             "cell_y": 0,
+            # live updates first show a 1/lowres_factor render of the cheap
+            # stages (terrain, vegetation), then swap in the full pass
+            "progressive": True,
+            "lowres_factor": 4,
             "thumbs": {
                 "terrain": True,
                 "vegetation": True,
@@ -104,6 +108,11 @@ def default_config() -> dict:
             "pothole_density": 0.02,
             # pathfinder still available
             "planner_grid": 4,
+            # reuse A* results across regenerations when the cost grid is unchanged
+            "path_cache": True,
+            "path_cache_dir": "",
+            # on-disk entries kept; the least recently used go first
+            "path_cache_max_files": 4096,
             "towns": 1,
             "town_block": 48,
             "farm_spurs": 12,
@@ -116,6 +125,10 @@ def default_config() -> dict:
                 "asset_root": "zomboid_map_gen/assets/prototype_lots",
                 "collision_padding": 8,
                 "attempts_per_lot": 100,
+                # share of a lot footprint that must be preferred ground (0..1);
+                # categories can override with the same keys
+                "min_terrain_coverage": 0.5,
+                "min_vegetation_coverage": 0.25,
                 "categories": {
                     "residential": {
                         "folder": "residential",
@@ -155,10 +168,33 @@ def default_config() -> dict:
                 },
             },
         },
+        # Chrome trace-event JSON of stages, pool dispatches, worker chunks and
+        # file writes (path defaults to <output_dir>/trace.json); summary to stdout
+        "trace": {
+            "enabled": False,
+            "path": "",
+            "summary": True,
+        },
+        # per-stage RSS / tracemalloc accounting -> <output_dir>/<report>;
+        # warn: print a warning when the projected peak exceeds free RAM
+        "memory": {
+            "enabled": False,
+            "report": "memory_report.json",
+            "top": 10,
+            "warn": True,
+        },
+        # stage-output store: raw uncompressed rasters per pipeline stage
+        # (dir defaults to <output_dir>/stages); resume reuses unchanged stages
+        "store": {
+            "enabled": False,
+            "dir": "",
+            "resume": True,
+        },
         "export": {
             "terrain_png": "terrain.png",
             "vegetation_png": "vegetation.png",
             "roads_png": "roads.png",
+            "roads_graph_json": "roads_graph.json",
             "combined_png": "combined.png",
             "lots_png": "lots.png",
             "details_png": "details.png",
@@ -167,6 +203,17 @@ def default_config() -> dict:
             "preview_png": "preview.png",
             "preview_max_dim": 768,
             "preview_include_details": True,
+            # PNG encoding profile: fast | default | small | archive
+            # (see export/encoding.py); per-file bytes/time go to encoding_report
+            "encoding": "fast",
+            "encoding_report": "encoding_report.json",
+            # tile export re-encodes only cells whose inputs changed since the
+            # last export into the same folder (tiles_manifest.json there)
+            "incremental_tiles": True,
+            # full-map roads.png and combined.png; when off, no full-size roads
+            # image is built and every consumer (details, tiles, preview)
+            # draws road cells from the network
+            "full_map_roads": True,
         },
         "worlded": {
             "project_prefix": "INFINITY_Z",
@@ -179,6 +226,13 @@ def default_config() -> dict:
             "replace_existing": True,
             "open_folder": False,
             "auto_launch": False,
+            # re-encode tiles copied into the project with this profile;
+            # empty keeps the files exactly as exported
+            "encoding": "",
+            # place changed tiles by reflink/hardlink when the export and the
+            # project share a filesystem (unchanged tiles are skipped either way);
+            # False always copies
+            "link_tiles": True,
         },
         "audio": {
             "enabled": True,
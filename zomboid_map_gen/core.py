@@ -1,52 +1,204 @@
 # zomboid_map_gen/core.py
+from __future__ import annotations
+
+import json
 from pathlib import Path
+from typing import Callable
+
 from . import config as cfg
-from .terrain import terrain_generator
-from .vegetation import vegetation_generator
-from .roads import road_generator
-from .roads import road_post
-from .lots import prototype as lots_prototype
-from .export import writer
-from .vegetation import detail_generator
+from .terrain import presets as terrain_presets
+from .vegetation import presets as vegetation_presets
 from .utils import colors as base_colors
+from .utils import memprof
+from .utils import cancel
+from .utils import trace
 from .utils import rules_palette as rules_palette_utils
-from PIL import Image, ImageDraw
-import json
-from typing import Callable
+from .utils.lazy import lazy_import
+
+# generators, export and PIL load on first use: importing core stays cheap
+terrain_generator = lazy_import(".terrain.terrain_generator", __package__)
+vegetation_generator = lazy_import(".vegetation.vegetation_generator", __package__)
+detail_generator = lazy_import(".vegetation.detail_generator", __package__)
+road_generator = lazy_import(".roads.road_generator", __package__)
+road_post = lazy_import(".roads.road_post", __package__)
+rasterize = lazy_import(".roads.rasterize", __package__)
+roads_network = lazy_import(".roads.network", __package__)
+lots_prototype = lazy_import(".lots.prototype", __package__)
+encoding = lazy_import(".export.encoding", __package__)
+dirty_cells = lazy_import(".export.dirty_cells", __package__)
+tiles = lazy_import(".export.tiles", __package__)
+writer = lazy_import(".export.writer", __package__)
+image_utils = lazy_import(".utils.image_utils", __package__)
+indexed = lazy_import(".utils.indexed", __package__)
+raster_store = lazy_import(".utils.raster_store", __package__)
+Image = lazy_import("PIL.Image")
+ImageDraw = lazy_import("PIL.ImageDraw")
+
+STAGES = ("terrain", "vegetation", "roads", "details")
+
+
+def generate_from_config(conf: dict, until: str | None = None,
+                         on_stage: Callable[[str], None] | None = None) -> dict | None:
+    """
+    Run the full pipeline and write the outputs. Returns the in-memory layers
+    (terrain, vegetation, roads, lots, details, combined, road_network) so
+    callers such as tile export don't have to reload them from disk.
+
+    With the stage store enabled (conf["store"]), every stage output is kept
+    as a raw uncompressed raster and, with `resume`, reused when its config
+    is unchanged. `until` stops after that stage (returns None) so stages can
+    run as separate processes sharing the store.
+
+    Run inside cancel.scope(token) to make the run abortable: the token is
+    checked between stages and while waiting on pool chunks, and a cancelled
+    run raises cancel.Cancelled before writing any outputs.
+
+    `on_stage(name)` is called as each stage (and the final "compose" and
+    "export" steps) starts, for progress reporting.
 
-def generate_from_config(conf: dict):
+    With conf["trace"]["enabled"] the run is traced (see utils.trace), with
+    conf["memory"]["enabled"] memory is accounted per stage (utils.memprof);
+    a warning is printed up front when the projected peak exceeds free RAM.
+    """
+    if until is not None and until not in STAGES:
+        raise ValueError(f"unknown stage {until!r}; expected one of {', '.join(STAGES)}")
+    with trace.run_trace(conf), memprof.run_profile(conf):
+        phases = trace.Phases("stage")
+
+        def report(name: str) -> None:
+            phases.enter(f"stage:{name}")
+            memprof.enter_stage(name)
+            if on_stage:
+                on_stage(name)
+
+        try:
+            return _run_pipeline(conf, until, report)
+        finally:
+            phases.close()
+
+
+def _run_pipeline(conf: dict, until: str | None, report: Callable[[str], None]) -> dict | None:
     base_colors.apply_palette_overrides(conf.get("terrain", {}).get("palette"))
     out_dir = Path(conf.get("output_dir", "output"))
     out_dir.mkdir(parents=True, exist_ok=True)
+    store = raster_store.store_for(conf)
+    resume = store is not None and bool((conf.get("store") or {}).get("resume", True))
+
+    t_key = raster_store.stage_key(conf, ("seed", "canvas", "terrain"))
+    report("terrain")
+    terrain_img = _stage(store, resume, "terrain", t_key,
+                         lambda: terrain_generator.generate(conf) if conf.get("terrain", {}).get("enabled", True) else None)
+    if store is not None and terrain_img is not None and not (resume and store.has("terrain_classes", t_key)):
+        # nearest-palette class per pixel, for consumers that want classes rather than colours
+        names = [name for name in base_colors.VANILLA if name]
+        store.put("terrain_classes", image_utils.palette_index(terrain_img, [base_colors.VANILLA[n] for n in names]), t_key)
+        store.put_json("terrain_class_names", names, t_key)
+    if until == "terrain":
+        return None
 
-    terrain_img = terrain_generator.generate(conf) if conf.get("terrain", {}).get("enabled", True) else None
-    veg_img = vegetation_generator.generate(conf, terrain_img) if conf.get("vegetation", {}).get("enabled", True) else None
-    roads_img, lots_img = road_generator.generate(conf, terrain_img, veg_img) if conf.get("roads", {}).get("enabled", True) else (None, None)
+    v_key = raster_store.stage_key(conf, ("seed", "canvas", "vegetation"), t_key)
+    report("vegetation")
+    veg_img = _stage(store, resume, "vegetation", v_key,
+                     lambda: vegetation_generator.generate(conf, terrain_img) if conf.get("vegetation", {}).get("enabled", True) else None)
+    if until == "vegetation":
+        return None
+
+    r_key = raster_store.stage_key(conf, ("seed", "canvas", "roads"), t_key, v_key)
+    report("roads")
+    road_network = _roads_stage(store, resume, r_key, conf, terrain_img, veg_img)
+    if until == "roads":
+        return None
+    road_settings = road_generator.render_settings(conf) if road_network is not None else None
+    # the full-map roads image only backs roads.png/combined.png; everything
+    # else draws the cells it needs from the network
+    roads_img = None
+    if road_network is not None and (conf.get("export", {}) or {}).get("full_map_roads", True):
+        roads_img = rasterize.render_full(road_network, road_settings)
 
     # Optional details bitmap based on rules (terrain/veg/roads aware)
-    details_img = None
-    try:
-        if conf.get("details", {}).get("enabled", True):
-            w, h = (terrain_img.size if terrain_img is not None else (None, None))
-            if w and h:
-                details_img = detail_generator.generate(conf, w, h, terrain_img, veg_img, roads_img)
-    except Exception:
-        details_img = None
+    def _details():
+        try:
+            if conf.get("details", {}).get("enabled", True):
+                w, h = (terrain_img.size if terrain_img is not None else (None, None))
+                if w and h:
+                    return detail_generator.generate(conf, w, h, terrain_img, veg_img, roads_img,
+                                                     road_network=road_network, road_settings=road_settings)
+        except cancel.Cancelled:
+            raise
+        except Exception:
+            pass
+        return None
 
+    d_key = raster_store.stage_key(conf, ("seed", "canvas", "details"), t_key, v_key, r_key)
+    report("details")
+    details_img = _stage(store, resume, "details", d_key, _details)
+    if until == "details":
+        return None
+
+    cancel.check()
+    report("compose")
     terrain_img, veg_img, details_img = _apply_rules_palette(conf, terrain_img, veg_img, details_img)
 
     # Optional: carve vegetation where roads are present (punch out trees on roads)
     if veg_img is not None and roads_img is not None:
         road_post.carve_vegetation_mask(veg_img, roads_img, skip_dirt=True)
+    elif veg_img is not None and road_network is not None:
+        cell_size = int(road_settings["cell_size"])
+        for (cx, cy), tile in rasterize.iter_cells(road_network, road_settings):
+            road_post.carve_vegetation_mask(veg_img, tile, skip_dirt=True, origin=(cx * cell_size, cy * cell_size))
 
-    # Apply details onto vegetation if enabled
+    # Apply details onto vegetation if enabled (an indexed layer stays indexed)
     if veg_img is not None and details_img is not None:
         if conf.get("details", {}).get("apply_to_vegetation", True):
-            veg_img = veg_img.copy()
-            veg_img.alpha_composite(details_img.convert("RGBA"))
+            veg_img = indexed.composite(veg_img, details_img)
+
+    lots_img = _generate_lots_overlay(conf, terrain_img, veg_img, roads_img, road_network)
+    cancel.check()
+    report("export")
+    combined_img = writer.save_all(conf, terrain_img, veg_img, roads_img, lots_img, details_img,
+                                   road_network=road_network, road_settings=road_settings)
+    if store is not None:
+        # final layers, for the GUI and other readers that would otherwise decode PNGs
+        f_key = raster_store.stage_key(conf, ("lots", "rules_palette", "worlded"), d_key)
+        for name, img in (("final_terrain", terrain_img), ("final_vegetation", veg_img), ("roads", roads_img),
+                          ("final_details", details_img), ("lots", lots_img), ("combined", combined_img)):
+            store.put(name, img, f_key)
+    return {
+        "terrain": terrain_img,
+        "vegetation": veg_img,
+        "roads": roads_img,
+        "lots": lots_img,
+        "details": details_img,
+        "combined": combined_img,
+        "road_network": road_network,
+    }
 
-    lots_img = _generate_lots_overlay(conf, terrain_img, veg_img, roads_img)
-    writer.save_all(conf, terrain_img, veg_img, roads_img, lots_img, details_img)
+
+def _stage(store, resume: bool, name: str, key: str, build: Callable[[], Image.Image | None]):
+    """Reuse a stored stage output under `key`, else build (and store) it."""
+    cancel.check()
+    if resume:
+        img = store.get(name, key)
+        if img is not None or store.is_empty_stage(name, key):
+            return img
+    img = build()
+    if store is not None:
+        store.put(name, img, key)
+    return img
+
+
+def _roads_stage(store, resume: bool, key: str, conf: dict, terrain_img, veg_img):
+    """Planned road network, or None with roads off (the roads lots raster is replaced later anyway)."""
+    cancel.check()
+    if resume and store.has("roads_graph", key):
+        graph = store.get_json("roads_graph", key)
+        return roads_network.RoadNetwork.from_dict(graph) if graph else None
+    road_network = None
+    if conf.get("roads", {}).get("enabled", True):
+        road_network, _ = road_generator.plan(conf, terrain_img, veg_img)
+    if store is not None:
+        store.put_json("roads_graph", road_network.to_dict() if road_network is not None else None, key)
+    return road_network
 
 
 def _conf_for_cell(conf: dict, cell_x: int, cell_y: int) -> dict:
@@ -69,14 +221,78 @@ def _conf_for_cell(conf: dict, cell_x: int, cell_y: int) -> dict:
     return copy
 
 
-def generate_preview_from_config(conf: dict, cell_x: int = 0, cell_y: int = 0):
+def generate_preview_from_config(conf: dict, cell_x: int = 0, cell_y: int = 0,
+                                 on_stage: Callable[[str], None] | None = None):
     """Generate a fast preview by rendering only one cell.
 
     - Keeps noise alignment stable by offsetting transforms by the cell origin
     - Writes the same output files (terrain/vegetation/roads/etc) and preview.png
     """
     c2 = _conf_for_cell(conf, cell_x, cell_y)
-    return generate_from_config(c2)
+    return generate_from_config(c2, on_stage=on_stage)
+
+
+def _conf_at_resolution(conf: dict, factor: int) -> dict:
+    """
+    Copy of a one-cell config rendered at 1/factor resolution. Noise is sampled
+    in pixel coordinates, so dividing the cell size, every noise/warp scale and
+    the transform offsets by the same factor samples the same field on a
+    coarser grid, which lines up with the full render once upscaled.
+    """
+    copy = json.loads(json.dumps(conf))
+    canvas = copy.setdefault("canvas", {})
+    canvas["cell_size"] = -(-int(canvas.get("cell_size", 300)) // factor)
+
+    def shrink(section: str, default_scale: float):
+        sec = copy.setdefault(section, {})
+        sec["scale"] = float(sec.get("scale", default_scale)) / factor
+        tr = sec.setdefault("transform", {})
+        tr["offset_x"] = float(tr.get("offset_x", 0.0)) / factor
+        tr["offset_y"] = float(tr.get("offset_y", 0.0)) / factor
+        for layer in sec.get("layers", []) or []:
+            layer["scale"] = float(layer.get("scale", 60)) / factor
+            warp = layer.setdefault("warp", {})
+            warp["amount"] = float(warp.get("amount", 0.0)) / factor
+            warp["scale"] = float(warp.get("scale", 100.0)) / factor
+
+    terrain = copy.get("terrain", {})
+    veg = copy.get("vegetation", {})
+    shrink("terrain", terrain_presets.get_preset(terrain.get("preset", "default"))["scale"])
+    shrink("vegetation", vegetation_presets.get_preset(veg.get("preset", "overgrown"))["scale"])
+    return copy
+
+
+def generate_lowres_preview(conf: dict, cell_x: int = 0, cell_y: int = 0, factor: int = 4) -> dict:
+    """
+    Quick look at one cell: terrain and vegetation sampled at 1/factor
+    resolution and upscaled nearest-neighbour to the cell size. Nothing is
+    written; roads, details and lots are left to the full preview pass.
+    Returns in-memory terrain, vegetation and combined images (any may be None).
+    """
+    factor = max(1, int(factor))
+    c2 = _conf_for_cell(conf, cell_x, cell_y)
+    size = int(c2.get("canvas", {}).get("cell_size", 300))
+    base_colors.apply_palette_overrides(c2.get("terrain", {}).get("palette"))
+    lo = _conf_at_resolution(c2, factor)
+
+    terrain_img = terrain_generator.generate(lo) if lo.get("terrain", {}).get("enabled", True) else None
+    veg_img = vegetation_generator.generate(lo, terrain_img) if lo.get("vegetation", {}).get("enabled", True) else None
+    terrain_img, veg_img, _ = _apply_rules_palette(lo, terrain_img, veg_img, None)
+
+    def upscale(img):
+        if img is None:
+            return None
+        # each low-res pixel covers exactly factor x factor full-res pixels
+        big = img.resize((img.width * factor, img.height * factor), Image.NEAREST)
+        return big.crop((0, 0, size, size))
+
+    terrain_img, veg_img = upscale(terrain_img), upscale(veg_img)
+    combined = None
+    if terrain_img is not None:
+        combined = terrain_img.convert("RGBA")
+        if veg_img is not None:
+            combined.alpha_composite(veg_img.convert("RGBA"))
+    return {"terrain": terrain_img, "vegetation": veg_img, "combined": combined}
 
 
 LOT_COLOR_MAP = {
@@ -95,13 +311,14 @@ LOT_COLOR_MAP = {
 }
 
 
-def _generate_lots_overlay(conf: dict, terrain_img, veg_img, roads_img=None):
+def _generate_lots_overlay(conf: dict, terrain_img, veg_img, roads_img=None, road_network=None):
     lots_conf = conf.get("lots", {}) or {}
     mode = lots_conf.get("mode", "manual") or "manual"
     placed = lots_conf.get("placed", []) or []
 
     if mode == "prototype":
-        placed = lots_prototype.generate_prototype_layout(lots_conf, terrain_img, roads_img, veg_img)
+        placed = lots_prototype.generate_prototype_layout(lots_conf, terrain_img, roads_img, veg_img,
+                                                          road_network=road_network, seed=conf.get("seed", 0))
 
     if not placed or terrain_img is None:
         return None
@@ -111,6 +328,7 @@ def _generate_lots_overlay(conf: dict, terrain_img, veg_img, roads_img=None):
     width, height = terrain_img.size
     img = Image.new("RGBA", (width, height), (0, 0, 0, 0))
     draw = ImageDraw.Draw(img)
+    veg_px = indexed.PixelView(veg_img) if mask and veg_img else None
     for lot in placed:
         x, y = lot.get("x", 0), lot.get("y", 0)
         w, h = lot.get("width", 0), lot.get("height", 0)
@@ -121,7 +339,7 @@ def _generate_lots_overlay(conf: dict, terrain_img, veg_img, roads_img=None):
         if mask and veg_img:
             px = min(max(x, 0), veg_img.width - 1)
             py = min(max(y, 0), veg_img.height - 1)
-            if veg_img.getpixel((px, py))[3] > 0:
+            if veg_px[px, py][3] > 0:
                 continue
         draw.rectangle([x, y, x2, y2], fill=color + (160,))
     return img
@@ -142,62 +360,64 @@ def _apply_rules_palette(conf: dict, terrain_img, veg_img, details_img):
 
 
 def generate_tiles(conf: dict, prefix: str, progress: Callable[[int, int], None] | None = None, *,
-                   tile_root_override: Path | None = None):
+                   tile_root_override: Path | None = None, on_stage: Callable[[str], None] | None = None):
     canvas = conf.get("canvas", {})
     cells_x = max(1, int(canvas.get("cells_x", 1)))
     cells_y = max(1, int(canvas.get("cells_y", 1)))
     out_dir = Path(conf.get("output_dir", "output"))
     sanitized = _sanitize_prefix(prefix)
     tiles_root = Path(tile_root_override) if tile_root_override is not None else out_dir / sanitized
-    terrain_dir = tiles_root / "Terrain"
-    veg_dir = tiles_root / "Vegetation"
-    roads_dir = tiles_root / "Roads"
-    for d in (terrain_dir, veg_dir, roads_dir):
-        d.mkdir(parents=True, exist_ok=True)
+
+    cell_size = int(canvas.get("cell_size", 300))
 
     full_conf = json.loads(json.dumps(conf))
-    generate_from_config(full_conf)
-
-    exp = full_conf.get("export", {})
-    combined_path = out_dir / exp.get("combined_png", "combined.png")
-    preview_path = out_dir / exp.get("preview_png", "preview.png")
-    if not combined_path.exists():
-        if preview_path.exists():
-            combined_path = preview_path
-        else:
-            raise FileNotFoundError(
-                f"Tile export needs a combined or preview image but none were created in {out_dir}; "
-                "ensure terrain/roads generation wasn't disabled."
-            )
-    veg_full = out_dir / exp.get("vegetation_png", "vegetation.png")
-    roads_full = out_dir / exp.get("roads_png", "roads.png")
-
-    combo_img = Image.open(combined_path)
-    veg_img = Image.open(veg_full) if veg_full.exists() else None
-    roads_img = Image.open(roads_full) if roads_full.exists() else None
-
-    total = cells_x * cells_y
-    idx = 0
-    size = int(canvas.get("cell_size", 300))
-    for y in range(cells_y):
-        for x in range(cells_x):
-            idx += 1
-            box = (x * size, y * size, min((x + 1) * size, combo_img.width), min((y + 1) * size, combo_img.height))
-            tile_combined = combo_img.crop(box)
-            tile_combined.save(terrain_dir / f"{sanitized}_{x}_{y}.png")
-            if veg_img:
-                veg_tile = veg_img.crop(box)
-                veg_tile.save(veg_dir / f"{sanitized}_{x}_{y}_veg.png")
-            if roads_img:
-                road_tile = roads_img.crop(box)
-                road_tile.save(roads_dir / f"{sanitized}_roads_{x}_{y}.png")
-            if progress:
-                progress(idx, total)
-    combo_img.close()
-    if veg_img:
-        veg_img.close()
-    if roads_img:
-        roads_img.close()
+    layers = generate_from_config(full_conf, on_stage=on_stage)
+    if layers["terrain"] is None:
+        raise ValueError(
+            "Tile export needs a terrain image but none was created; "
+            "ensure terrain generation wasn't disabled."
+        )
+
+    exp = full_conf.get("export", {}) or {}
+    profile = encoding.profile_name(exp)
+    if on_stage:
+        on_stage("tiles")
+
+    # re-encode only cells whose inputs changed since the last export here
+    base = dirty_cells.base_key(full_conf, profile)
+    road_network = layers["road_network"]
+    road_settings = road_generator.render_settings(full_conf) if road_network is not None else None
+    prints = dirty_cells.cell_fingerprints(
+        base, cells_x, cells_y, cell_size, road_network, road_settings,
+        detail_generator.road_reach(full_conf) if layers["details"] is not None else -1,
+    )
+    cells = None
+    if exp.get("incremental_tiles", True):
+        manifest = dirty_cells.load_manifest(tiles_root, sanitized)
+        dirty_cells.remove_stale(manifest, prints, tiles_root, sanitized)
+        cells = dirty_cells.dirty_cells(manifest, prints, tiles_root, sanitized,
+                                        vegetation=bool(layers["vegetation"]), roads=road_network is not None)
+    dirty_cells.forget_cells(tiles_root, sanitized, base, prints, cells)
+    stats = tiles.export_tiles(
+        layers["terrain"],
+        layers["vegetation"],
+        road_network,
+        road_settings,
+        tiles_root,
+        sanitized,
+        cell_size,
+        cells_x,
+        cells_y,
+        progress=progress,
+        profile=profile,
+        cells=cells,
+    )
+    dirty_cells.save_manifest(tiles_root, sanitized, base, prints)
+    encoding.write_report(tiles_root / "encoding_report.json", profile, stats)
+    if progress and cells is not None and not cells:
+        # nothing changed: still tell the caller the export is complete
+        progress(len(prints), len(prints))
+    return tiles_root
 
 
 def _sanitize_prefix(prefix: str) -> str:
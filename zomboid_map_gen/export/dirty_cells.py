@@ -0,0 +1,165 @@
+# zomboid_map_gen/export/dirty_cells.py
+"""
+Per-cell input fingerprints for incremental tile export.
+
+A cell's tiles (terrain+roads, vegetation, roads) are a function of:
+
+- the noise fields and everything else that spans the whole map: seed,
+  canvas, terrain and vegetation sections (palette included), details and
+  Rules palette settings, the Rules.txt in use and the encoding profile ->
+  one `base` key shared by every cell
+- the road strokes clipped to the cell plus the rasterizer's margin (the
+  same clip roads.rasterize draws from) and the road render settings. The
+  margin also covers detail_generator.road_reach(): details draw from a
+  per-cell RNG stream and only read roads that close to their cell, so
+  nothing else about them varies per cell
+
+Lots are not part of any tile, so they don't enter the fingerprint.
+
+`tiles_manifest.json` in the tiles folder records each cell's fingerprint; a
+re-export crops and encodes only cells whose fingerprint changed or whose
+files are missing, and leaves the other tile files alone. Cells about to be
+rewritten are dropped from the manifest before their tiles are touched, so
+an export that stops part way leaves them dirty rather than recorded with
+the previous fingerprint. The map-wide
+passes themselves still run for the whole canvas (terrain postprocess
+draws from whole-canvas RNG streams); enable the stage store
+(`store.enabled`) to reuse unchanged terrain and vegetation between exports.
+"""
+
+from __future__ import annotations
+
+import json
+from hashlib import blake2s
+from pathlib import Path
+from typing import Any, Iterable, Mapping
+
+from ..roads import rasterize
+from ..roads.network import RoadNetwork
+from ..utils import raster_store, trace
+from ..utils import rules_palette as rules_palette_utils
+
+MANIFEST_NAME = "tiles_manifest.json"
+MANIFEST_VERSION = 1
+
+# sections behind the map-wide fields; roads add per-cell strokes on top
+_BASE_SECTIONS = ("seed", "canvas", "terrain", "vegetation", "details", "rules_palette")
+
+Cell = tuple[int, int]
+
+
+def _rules_stamp(conf: Mapping) -> list[Any] | None:
+    path = rules_palette_utils.get_rules_file(dict(conf))
+    if path is None:
+        return None
+    st = path.stat()
+    return [str(path), st.st_mtime_ns, st.st_size]
+
+
+def base_key(conf: Mapping, profile: str) -> str:
+    """Key of the inputs every cell shares; a change here dirties the whole map."""
+    return raster_store.stage_key(conf, _BASE_SECTIONS, profile, json.dumps(_rules_stamp(conf)))
+
+
+def tile_paths(tiles_root: Path, prefix: str, x: int, y: int) -> list[Path]:
+    """Every file a cell may have written (only existing ones are checked)."""
+    return [
+        tiles_root / "Terrain" / f"{prefix}_{x}_{y}.png",
+        tiles_root / "Vegetation" / f"{prefix}_{x}_{y}_veg.png",
+        tiles_root / "Roads" / f"{prefix}_roads_{x}_{y}.png",
+    ]
+
+
+def cell_fingerprints(
+    base: str,
+    cells_x: int,
+    cells_y: int,
+    cell_size: int,
+    road_network: RoadNetwork | None,
+    road_settings: Mapping | None,
+    detail_reach: int = -1,
+) -> dict[Cell, str]:
+    """`detail_reach`: detail_generator.road_reach() (-1 when details ignore roads)."""
+    pad = rasterize.cell_padding(road_network) + max(0, detail_reach) if road_network is not None else 0
+    settings = json.dumps(dict(road_settings or {}), sort_keys=True, default=str)
+    prints: dict[Cell, str] = {}
+    for y in range(cells_y):
+        for x in range(cells_x):
+            h = blake2s(digest_size=16)
+            h.update(base.encode("ascii"))
+            h.update(settings.encode("utf-8"))
+            if road_network is not None:
+                box = rasterize.cell_box(road_network, cell_size, x, y)
+                strokes = rasterize.clip_strokes(road_network, box, pad)
+                h.update(json.dumps(strokes, separators=(",", ":")).encode("ascii"))
+            prints[(x, y)] = h.hexdigest()
+    return prints
+
+
+def load_manifest(tiles_root: Path, prefix: str) -> dict[str, Any]:
+    try:
+        data = json.loads((tiles_root / MANIFEST_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION or data.get("prefix") != prefix:
+        return {}
+    return data
+
+
+def save_manifest(tiles_root: Path, prefix: str, base: str, prints: Mapping[Cell, str]) -> None:
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "prefix": prefix,
+        "base": base,
+        "cells": {f"{x},{y}": fp for (x, y), fp in sorted(prints.items())},
+    }
+    tiles_root.mkdir(parents=True, exist_ok=True)
+    path = tiles_root / MANIFEST_NAME
+    with trace.span("write:json", "io", path=str(path)):
+        path.write_text(json.dumps(manifest, indent=1), encoding="utf-8")
+
+
+def recorded_cells(manifest: Mapping[str, Any]) -> dict[Cell, str]:
+    cells: dict[Cell, str] = {}
+    for key, fp in (manifest.get("cells") or {}).items():
+        x, _, y = key.partition(",")
+        cells[(int(x), int(y))] = fp
+    return cells
+
+
+def forget_cells(tiles_root: Path, prefix: str, base: str, prints: Mapping[Cell, str],
+                 cells: Iterable[Cell] | None) -> None:
+    """Drop `cells` (every cell when None) from the manifest before their tiles are rewritten."""
+    if cells is None:
+        (tiles_root / MANIFEST_NAME).unlink(missing_ok=True)
+        return
+    cells = set(cells)
+    if cells:
+        save_manifest(tiles_root, prefix, base, {c: fp for c, fp in prints.items() if c not in cells})
+
+
+def _has_tiles(tiles_root: Path, prefix: str, cell: Cell, vegetation: bool, roads: bool) -> bool:
+    # the terrain tile is always written; the others when their layer exists
+    terrain, veg, road = tile_paths(tiles_root, prefix, *cell)
+    expected = [terrain] + ([veg] if vegetation else []) + ([road] if roads else [])
+    return all(path.exists() for path in expected)
+
+
+def dirty_cells(manifest: Mapping[str, Any], prints: Mapping[Cell, str], tiles_root: Path,
+                prefix: str, *, vegetation: bool = True, roads: bool = True) -> list[Cell]:
+    """Cells whose fingerprint changed or that lack one of their tiles (`vegetation`/`roads`: layers exported)."""
+    recorded = recorded_cells(manifest)
+    return [c for c, fp in prints.items()
+            if recorded.get(c) != fp or not _has_tiles(tiles_root, prefix, c, vegetation, roads)]
+
+
+def remove_stale(manifest: Mapping[str, Any], prints: Mapping[Cell, str], tiles_root: Path,
+                 prefix: str) -> int:
+    """Delete tiles of recorded cells that are no longer in the grid."""
+    removed = 0
+    for cell in set(recorded_cells(manifest)) - set(prints):
+        for path in tile_paths(tiles_root, prefix, *cell):
+            if path.exists():
+                path.unlink()
+                removed += 1
+    return removed
@@ -0,0 +1,101 @@
+# zomboid_map_gen/export/encoding.py
+"""
+PNG encoding profiles shared by the writer, tile export and WorldEd bridge.
+
+- fast:    zlib level 1, no optimize (iteration; files WorldEd just re-reads)
+- default: Pillow's defaults
+- small:   optimize, stored as a palette image when that is lossless
+- archive: zlib level 9 + optimize, pixels left in their own mode
+
+Every save reports bytes written and encode time so profiles can be compared.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterable
+
+from PIL import Image, ImageChops
+
+from ..utils import trace
+
+PROFILES: dict[str, dict] = {
+    "fast": {"compress_level": 1},
+    "default": {},
+    "small": {"optimize": True, "palette": True},
+    "archive": {"compress_level": 9, "optimize": True},
+}
+DEFAULT_PROFILE = "fast"
+
+
+@dataclass(slots=True)
+class EncodeStat:
+    path: str
+    bytes: int
+    seconds: float
+    mode: str
+
+
+def profile_name(section: dict | None, fallback: str = DEFAULT_PROFILE) -> str:
+    """Validated profile name from a config section's `encoding` key."""
+    name = str((section or {}).get("encoding") or fallback).strip().lower()
+    return name if name in PROFILES else fallback
+
+
+def save_png(img: Image.Image, path: Path, profile: str = DEFAULT_PROFILE) -> EncodeStat:
+    """
+    Encode to a temporary file and rename it over `path`: the old file is
+    replaced, never written through, so a hardlink to it (a synced WorldEd
+    project, see worlded.bridge) keeps its content.
+    """
+    options = dict(PROFILES.get(profile, PROFILES[DEFAULT_PROFILE]))
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with trace.span("write:png", "io", path=str(path), profile=profile):
+        start = time.perf_counter()
+        if options.pop("palette", False):
+            img = to_palette(img) or img
+        try:
+            img.save(tmp, format="PNG", **options)
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+        elapsed = time.perf_counter() - start
+    return EncodeStat(path=str(path), bytes=Path(path).stat().st_size, seconds=round(elapsed, 4), mode=img.mode)
+
+
+def to_palette(img: Image.Image) -> Image.Image | None:
+    """
+    Lossless "P" copy of an image with at most 256 colours, or None. The
+    quantized result is checked against the source and rejected on any change.
+    """
+    if img.mode not in ("RGB", "RGBA"):
+        return None
+    colors = img.getcolors(256)
+    if colors is None:
+        return None
+    if img.mode == "RGBA":
+        pal = img.quantize(colors=max(1, len(colors)), method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+    else:
+        pal = img.quantize(colors=max(1, len(colors)), method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE)
+    # alpha_only=False: an RGBA bbox otherwise only looks at the alpha band
+    if ImageChops.difference(pal.convert(img.mode), img).getbbox(alpha_only=False) is not None:
+        return None
+    return pal
+
+
+def write_report(path: Path, profile: str, stats: Iterable[EncodeStat]) -> None:
+    stats = list(stats)
+    report = {
+        "profile": profile,
+        "files": len(stats),
+        "total_bytes": sum(s.bytes for s in stats),
+        "total_seconds": round(sum(s.seconds for s in stats), 4),
+        "entries": [asdict(s) for s in stats],
+    }
+    with trace.span("write:json", "io", path=str(path)):
+        Path(path).write_text(json.dumps(report, indent=2), encoding="utf-8")
@@ -0,0 +1,124 @@
+# zomboid_map_gen/export/tiles.py
+"""
+Per-cell tile export from in-memory rasters and the road network.
+
+The main process only crops terrain and vegetation (cheap, C-level) and clips
+the road strokes of each cell; drawing the cell's roads and PNG encoding
+with the export profile (see export.encoding), which dominate for hundreds
+of tiles, run in a process pool. Each job is one cell and writes that cell's
+terrain (+ roads), vegetation and roads tiles, so no full-map roads image is
+needed. Jobs are built lazily and at most two per worker are in flight, so
+the main process never holds more than a few cells' payloads on top of the
+source rasters. Progress is reported as jobs complete. `cells`
+restricts the export to some cells (see export.dirty_cells); other tiles are
+left untouched. Indexed layers travel with their palette and are written as
+palette PNGs. Workers have no tracer, so they time each file themselves and
+the main process records the write:png spans.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Callable, Iterable, Mapping
+
+from PIL import Image
+
+from ..roads import rasterize
+from ..roads.network import RoadNetwork
+from ..utils import indexed, trace
+from ..utils.parallel import cpu_count, iter_process_map
+from . import encoding
+
+
+def export_tiles(
+    terrain_img: Image.Image,
+    veg_img: Image.Image | None,
+    road_network: RoadNetwork | None,
+    road_settings: Mapping | None,
+    tiles_root: Path,
+    prefix: str,
+    cell_size: int,
+    cells_x: int,
+    cells_y: int,
+    progress: Callable[[int, int], None] | None = None,
+    max_workers: int | None = None,
+    profile: str = encoding.DEFAULT_PROFILE,
+    cells: Iterable[tuple[int, int]] | None = None,
+) -> list[encoding.EncodeStat]:
+    """
+    Write every cell's (or the given cells') tiles; returns the encode stats
+    of each file written. Roads are drawn from `road_network` with
+    `road_settings` (roads.rasterize.render_settings).
+    """
+    terrain_dir = tiles_root / "Terrain"
+    veg_dir = tiles_root / "Vegetation"
+    roads_dir = tiles_root / "Roads"
+    for d in (terrain_dir, veg_dir, roads_dir):
+        d.mkdir(parents=True, exist_ok=True)
+
+    cells = [(x, y) for y in range(cells_y) for x in range(cells_x)] if cells is None else list(cells)
+
+    def jobs():
+        # cropped only when the pool has room for another job
+        for x, y in cells:
+            box = (x * cell_size, y * cell_size,
+                   min((x + 1) * cell_size, terrain_img.width), min((y + 1) * cell_size, terrain_img.height))
+            tiles = [(terrain_dir / f"{prefix}_{x}_{y}.png", terrain_img)]
+            if veg_img:
+                tiles.append((veg_dir / f"{prefix}_{x}_{y}_veg.png", veg_img))
+            roads = None
+            if road_network is not None:
+                roads = (rasterize.cell_job(road_network, road_settings, x, y),
+                         str(roads_dir / f"{prefix}_roads_{x}_{y}.png"))
+            yield [_tile_payload(img, box, path) for path, img in tiles], roads, profile
+
+    total = len(cells)
+    if not total:
+        return []
+    in_process = total == 1 or (max_workers is not None and max_workers <= 1)
+    if in_process:
+        results = ((i, _save_tiles_worker(*args)) for i, args in enumerate(jobs()))
+    else:
+        workers = max_workers or min(total, cpu_count())
+        results = iter_process_map(_save_tiles_worker, jobs(), max_workers=workers, window=2 * workers)
+    stats: list[encoding.EncodeStat] = []
+    for done, (_, written) in enumerate(results, start=1):
+        for stat, (start, end, pid) in written:
+            stats.append(stat)
+            if not in_process:
+                # in-process writes were already traced by save_png itself
+                trace.record("write:png", "io", start, end, pid=pid, path=stat.path, profile=profile)
+        if progress:
+            progress(done, total)
+    return stats
+
+
+def _tile_payload(img: Image.Image, box: tuple[int, int, int, int], path: Path):
+    tile = img.crop(box)
+    palette = tile.getpalette("RGBA") if tile.mode == "P" else None
+    return str(path), tile.mode, tile.size, tile.tobytes(), palette
+
+
+def _tile_image(mode: str, size: tuple[int, int], data: bytes, palette: list[int] | None) -> Image.Image:
+    tile = Image.frombytes(mode, size, data)
+    if palette is not None:
+        tile.putpalette(palette, "RGBA")
+    return tile
+
+
+# ---- worker (top-level for Windows spawn) ----
+def _save_tiles_worker(tiles, roads, profile) -> list[tuple[encoding.EncodeStat, tuple[float, float, int]]]:
+    """
+    Each file's encode stat with its (start_us, end_us, pid) timing. The
+    first tile is the terrain one, written as terrain + roads; `roads` is
+    (rasterize.cell_job, roads tile path) or None.
+    """
+    images = [(_tile_image(mode, size, data, palette), Path(path)) for path, mode, size, data, palette in tiles]
+    terrain, terrain_path = images[0]
+    images[0] = indexed.to_rgba(terrain), terrain_path
+    if roads is not None:
+        job, roads_path = roads
+        road_tile = rasterize.render_job(job)
+        images[0][0].alpha_composite(road_tile)
+        images.append((road_tile, Path(roads_path)))
+    return [trace.timed_call(encoding.save_png, (img, path, profile)) for img, path in images]
@@ -1,13 +1,27 @@
 # zomboid_map_gen/export/writer.py
 from pathlib import Path
 
+from ..roads import rasterize
+from ..utils import indexed, trace
+from . import encoding
+
 
 def _name(exp: dict, key: str, default: str) -> str:
     v = exp.get(key)
     return v if isinstance(v, str) and v.strip() else default
 
 
-def save_all(conf, terrain_img, veg_img, roads_img, lots_img, details_img=None):
+def save_all(conf, terrain_img, veg_img, roads_img, lots_img, details_img=None, road_network=None,
+             road_settings=None):
+    """
+    Write every layer; returns the combined (terrain + roads) image or None.
+    Indexed layers are saved as palette PNGs; the combined image and the
+    preview are composited in RGBA.
+
+    Without a full-map `roads_img` (export.full_map_roads off) roads.png and
+    combined.png are skipped and the preview draws the roads cell by cell
+    from `road_network` with `road_settings`.
+    """
     out_dir = Path(conf.get("output_dir", "output"))
     out_dir.mkdir(parents=True, exist_ok=True)
 
@@ -19,38 +33,51 @@ def save_all(conf, terrain_img, veg_img, roads_img, lots_img, details_img=None):
     name_roads = _name(exp, "roads_png", "roads.png")
     name_lots = _name(exp, "lots_png", "lots.png")
     name_details = _name(exp, "details_png", "details.png")
+    name_roads_graph = _name(exp, "roads_graph_json", "roads_graph.json")
 
     # Combined (terrain + roads) separate from preview (terrain + veg + roads)
     name_combined = _name(exp, "combined_png", "combined.png")
     name_preview = exp.get("preview_png") or "preview.png"
     # Optional: a smaller preview to keep GUI memory low
     preview_max_dim = int(exp.get("preview_max_dim", 768))
+    name_report = _name(exp, "encoding_report", "encoding_report.json")
+
+    profile = encoding.profile_name(exp)
+    stats: list[encoding.EncodeStat] = []
 
     if terrain_img:
-        terrain_img.save(out_dir / name_terrain)
+        stats.append(encoding.save_png(terrain_img, out_dir / name_terrain, profile))
     if veg_img:
-        veg_img.save(out_dir / name_veg)
+        stats.append(encoding.save_png(veg_img, out_dir / name_veg, profile))
     if roads_img:
-        roads_img.save(out_dir / name_roads)
+        stats.append(encoding.save_png(roads_img, out_dir / name_roads, profile))
     if lots_img:
-        lots_img.save(out_dir / name_lots)
+        stats.append(encoding.save_png(lots_img, out_dir / name_lots, profile))
     if details_img:
-        details_img.save(out_dir / name_details)
+        stats.append(encoding.save_png(details_img, out_dir / name_details, profile))
+    if road_network is not None:
+        with trace.span("write:json", "io", path=str(out_dir / name_roads_graph)):
+            road_network.save(out_dir / name_roads_graph)
 
     # Combined: terrain + roads
-    if terrain_img:
-        combo = terrain_img.copy()
+    combo = None
+    if terrain_img and (roads_img or road_network is None):
+        combo = indexed.to_rgba(terrain_img)
         if roads_img:
             combo.alpha_composite(roads_img)
-        combo.save(out_dir / name_combined)
+        stats.append(encoding.save_png(combo, out_dir / name_combined, profile))
 
     # Preview: terrain + veg + roads (+ optional details), downscaled to preview_max_dim
     if terrain_img:
-        prev = terrain_img.copy()
+        prev = indexed.to_rgba(terrain_img)
         if veg_img:
-            prev.alpha_composite(veg_img)
+            prev.alpha_composite(indexed.to_rgba(veg_img))
         if roads_img:
             prev.alpha_composite(roads_img)
+        elif road_network is not None and road_settings is not None:
+            cell_size = int(road_settings["cell_size"])
+            for (cx, cy), tile in rasterize.iter_cells(road_network, road_settings):
+                prev.alpha_composite(tile, (cx * cell_size, cy * cell_size))
         # Optionally include details in preview for quick iteration
         if details_img and exp.get("preview_include_details", True):
             prev.alpha_composite(details_img.convert("RGBA"))
@@ -60,4 +87,7 @@ def save_all(conf, terrain_img, veg_img, roads_img, lots_img, details_img=None):
             scale = preview_max_dim / float(max(w, h))
             nw, nh = int(w * scale), int(h * scale)
             prev = prev.resize((max(1, nw), max(1, nh)))
-        prev.save(out_dir / name_preview)
+        stats.append(encoding.save_png(prev, out_dir / name_preview, profile))
+
+    encoding.write_report(out_dir / name_report, profile, stats)
+    return combo
@@ -6,8 +6,22 @@ scaffolding to ingest `.tbx` building assets and sketch out auto-placement
 strategies near the generated road network.
 """
 
-from .catalog import BuildingAsset, scan_asset_catalog
-from .prototype import LotPlacement, generate_prototype_layout
+from importlib import import_module
+
+_EXPORTS = {
+    "BuildingAsset": ".catalog",
+    "scan_asset_catalog": ".catalog",
+    "LotPlacement": ".prototype",
+    "generate_prototype_layout": ".prototype",
+}
+
+
+def __getattr__(name):
+    # submodules pull in PIL; load them when a name is first used
+    if name in _EXPORTS:
+        return getattr(import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     "BuildingAsset",
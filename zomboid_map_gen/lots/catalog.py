@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+import json
+import os
+import re
 import xml.etree.ElementTree as ET
 from dataclasses import dataclass
 from pathlib import Path
@@ -21,25 +24,46 @@ class BuildingAsset:
         return self.width, self.height
 
 
-def scan_asset_catalog(root: Path, categories: Mapping[str, Mapping]) -> list[BuildingAsset]:
+# per-asset-root cache of parsed TBX metadata, keyed by path relative to the root
+INDEX_FILENAME = ".tbx_index.json"
+INDEX_VERSION = 1
+
+_META_KEYS = ("width", "height", "stories", "source")
+
+# in-process copy of each root's index, so long-lived processes skip re-reading it
+_INDEX_MEMO: dict[Path, dict[str, dict]] = {}
+
+# <floor ...> start tags and their attributes, for the raw-bytes floor scan
+_FLOOR_TAG = re.compile(rb"<floor(?=[\s/>])([^>]*)>")
+_ATTR = re.compile(rb"""([\w:.-]+)\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+_SCAN_CHUNK = 1 << 16
+
+
+def scan_asset_catalog(root: Path, categories: Mapping[str, Mapping], use_index: bool = True) -> list[BuildingAsset]:
     """
     Walk the asset tree under `root` and collect every `.tbx` file grouped by
     high-level category (residential/commercial/industrial).
+
+    Parsed metadata is kept in `INDEX_FILENAME` under `root`; only files whose
+    mtime or size changed since the last scan are parsed again. Entries of
+    folders this call doesn't scan (other categories) are kept in the index.
     """
     root = root.expanduser().resolve()
     assets: list[BuildingAsset] = []
+    index = _load_index(root) if use_index else {}
+    fresh: dict[str, dict] = {}
+    scanned: list[str] = []
 
     for category, cfg in categories.items():
         folder_name = cfg.get("folder") or category
         cat_dir = (root / folder_name).expanduser()
+        folder_key = _index_key(root, cat_dir)
+        scanned.append("" if folder_key == "." else folder_key + "/")
         if not cat_dir.exists():
             continue
 
         for tbx in cat_dir.rglob("*.tbx"):
-            try:
-                meta = _read_tbx_metadata(tbx)
-            except Exception:
-                meta = {}
+            meta = _cached_metadata(root, tbx, category, index, fresh)
             width = int(meta.get("width", cfg.get("fallback_width", 24)))
             height = int(meta.get("height", cfg.get("fallback_height", 24)))
             stories = int(meta.get("stories", cfg.get("fallback_stories", 1)))
@@ -54,48 +78,150 @@ def scan_asset_catalog(root: Path, categories: Mapping[str, Mapping]) -> list[Bu
                     metadata=meta,
                 )
             )
+
+    if use_index:
+        # files gone from a scanned folder drop out; other folders' entries stay
+        merged = {k: v for k, v in index.items() if not k.startswith(tuple(scanned))}
+        merged.update(fresh)
+        if merged != index:
+            _save_index(root, merged)
     return assets
 
 
+def _index_key(root: Path, path: Path) -> str:
+    try:
+        return path.relative_to(root).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+
+def _cached_metadata(root: Path, tbx: Path, category: str, index: Mapping[str, dict], fresh: dict[str, dict]) -> dict[str, int | str]:
+    key = _index_key(root, tbx)
+    try:
+        stat = tbx.stat()
+    except OSError:
+        return {}
+    entry = index.get(key)
+    if not (entry and entry.get("mtime") == stat.st_mtime_ns and entry.get("size") == stat.st_size):
+        try:
+            meta = _read_tbx_metadata(tbx)
+        except Exception:
+            meta = {}
+        entry = {"mtime": stat.st_mtime_ns, "size": stat.st_size}
+        entry.update({k: meta[k] for k in _META_KEYS if meta.get(k) is not None})
+    entry = dict(entry, category=category)
+    fresh[key] = entry
+    return {k: entry[k] for k in _META_KEYS if k in entry}
+
+
+def _load_index(root: Path) -> dict[str, dict]:
+    if root in _INDEX_MEMO:
+        return _INDEX_MEMO[root]
+    try:
+        data = json.loads((root / INDEX_FILENAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != INDEX_VERSION:
+        return {}
+    entries = data.get("entries")
+    entries = entries if isinstance(entries, dict) else {}
+    _INDEX_MEMO[root] = entries
+    return entries
+
+
+def _save_index(root: Path, entries: Mapping[str, dict]) -> None:
+    _INDEX_MEMO[root] = dict(entries)
+    path = root / INDEX_FILENAME
+    tmp = path.with_name(path.name + ".tmp")
+    try:
+        tmp.write_text(json.dumps({"version": INDEX_VERSION, "entries": entries}, indent=1), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError:
+        # read-only asset packs still scan, just without the cache
+        pass
+
+
 def _read_tbx_metadata(path: Path) -> dict[str, int | str]:
-    tree = ET.parse(path)
-    root = tree.getroot()
+    """
+    Size/stories from a TBX file. Only the root start tag is parsed as XML,
+    and reading stops there when it carries everything. Otherwise (BuildingEd
+    puts no story count on the root) the file is scanned in chunks as raw
+    bytes for <floor> start tags; nothing else in the file is parsed.
+    """
     meta: dict[str, int | str] = {}
 
-    def _pull(keys: Iterable[str], target: str):
-        for key in keys:
-            if key in root.attrib:
-                meta[target] = _coerce_int(root.attrib[key])
-                return True
-        return False
-
     width_keys = ("width", "Width", "w", "xCells")
     height_keys = ("height", "Height", "h", "yCells")
     stories_keys = ("stories", "Stories", "floors", "Levels")
 
-    _pull(width_keys, "width")
-    _pull(height_keys, "height")
-    pulled_stories = _pull(stories_keys, "stories")
+    with open(path, "rb") as fh:
+        root_attrib = _root_attrib(fh)
+        if root_attrib is None:
+            raise ET.ParseError(f"empty TBX: {path}")
+
+        def _pull(keys: Iterable[str], target: str):
+            for key in keys:
+                if key in root_attrib:
+                    meta[target] = _coerce_int(root_attrib[key])
+                    return True
+            return False
+
+        _pull(width_keys, "width")
+        _pull(height_keys, "height")
+        pulled_stories = _pull(stories_keys, "stories")
+        floors: list[tuple[int | None, int | None]] = []
+        if not ("width" in meta and "height" in meta and pulled_stories):
+            fh.seek(0)
+            floors = [(_coerce_int(attrib.get("width") or attrib.get("Width")),
+                       _coerce_int(attrib.get("height") or attrib.get("Height")))
+                      for attrib in _scan_floor_tags(fh)]
 
     if "width" not in meta or "height" not in meta:
-        _read_floor_stats(root, meta)
+        _read_floor_stats(floors, meta)
 
-    if not pulled_stories:
-        floors = root.findall(".//floor")
-        if floors:
-            meta["stories"] = len(floors)
+    if not pulled_stories and floors:
+        meta["stories"] = len(floors)
 
     meta["source"] = path.name
     return meta
 
 
-def _read_floor_stats(root: ET.Element, meta: dict[str, int | str]) -> None:
-    floor_nodes = root.findall(".//floor")
+def _root_attrib(fh) -> dict[str, str] | None:
+    """Attributes of the root element, reading no further than its start tag's chunk."""
+    parser = ET.XMLPullParser(events=("start",))
+    for chunk in iter(lambda: fh.read(_SCAN_CHUNK), b""):
+        parser.feed(chunk)
+        for _event, elem in parser.read_events():
+            return dict(elem.attrib)
+    return None
+
+
+def _scan_floor_tags(fh) -> Iterable[dict[str, str]]:
+    """Attributes of every <floor> start tag in the rest of `fh`."""
+    carry = b""
+    for chunk in iter(lambda: fh.read(_SCAN_CHUNK), b""):
+        data = carry + chunk
+        end = 0
+        for match in _FLOOR_TAG.finditer(data):
+            yield _tag_attrib(match.group(1))
+            end = match.end()
+        # a tag cut by the chunk boundary is matched with the next chunk
+        cut = data.rfind(b"<", end)
+        carry = data[cut:] if cut != -1 else b""
+
+
+def _tag_attrib(raw: bytes) -> dict[str, str]:
+    attrib = {}
+    for m in _ATTR.finditer(raw):
+        value = m.group(2) if m.group(2) is not None else m.group(3)
+        attrib[m.group(1).decode("utf-8", "replace")] = value.decode("utf-8", "replace")
+    return attrib
+
+
+def _read_floor_stats(floors: Iterable[tuple[int | None, int | None]], meta: dict[str, int | str]) -> None:
     max_w = meta.get("width", 0) or 0
     max_h = meta.get("height", 0) or 0
-    for floor in floor_nodes:
-        w = _coerce_int(floor.attrib.get("width") or floor.attrib.get("Width"))
-        h = _coerce_int(floor.attrib.get("height") or floor.attrib.get("Height"))
+    for w, h in floors:
         if w:
             max_w = max(max_w, w)
         if h:
@@ -0,0 +1,110 @@
+"""
+Occupancy grid for lot collision tests.
+
+Placed lots are registered in coarse buckets (16px by default). A 2D Fenwick
+tree over "buckets touched by some lot" answers the common case, a padded
+rectangle over empty ground, with four prefix sums. Only when that count is
+non-zero are the lots registered in the overlapping buckets tested exactly.
+
+Adding a lot updates the tree once per bucket it touches for the first time,
+O(log rows * log cols) each, so neither adds nor tests grow with the grid
+size or with the number of lots already placed.
+"""
+
+from __future__ import annotations
+
+from array import array
+
+
+class OccupancyGrid:
+    def __init__(self, width: int, height: int, bucket: int = 16):
+        self.width = max(1, int(width))
+        self.height = max(1, int(height))
+        self.bucket = max(1, int(bucket))
+        self.cols = -(-self.width // self.bucket)
+        self.rows = -(-self.height // self.bucket)
+        self.rects: list[tuple[int, int, int, int]] = []
+        self._members: dict[int, list[int]] = {}
+        # (rows + 1) x (cols + 1) Fenwick tree (1-based) of touched buckets
+        self._tree = array("i", bytes(4 * (self.rows + 1) * (self.cols + 1)))
+
+    def __len__(self) -> int:
+        return len(self.rects)
+
+    def add(self, x: int, y: int, w: int, h: int) -> None:
+        idx = len(self.rects)
+        self.rects.append((x, y, w, h))
+        span = self._bucket_span(x, y, x + w, y + h)
+        if span is None:
+            return
+        bx0, by0, bx1, by1 = span
+        for by in range(by0, by1):
+            row = by * self.cols
+            for bx in range(bx0, bx1):
+                members = self._members.get(row + bx)
+                if members is None:
+                    self._members[row + bx] = [idx]
+                    self._mark(by, bx)
+                else:
+                    members.append(idx)
+
+    def is_free(self, x: int, y: int, w: int, h: int, padding: int = 0) -> bool:
+        """True when (x, y, w, h) grown by `padding` touches no placed lot."""
+        x0, y0 = x - padding, y - padding
+        x1, y1 = x + w + padding, y + h + padding
+        span = self._bucket_span(x0, y0, x1, y1)
+        if span is None:
+            return True
+        bx0, by0, bx1, by1 = span
+        touched = self._count(by1, bx1) - self._count(by0, bx1) - self._count(by1, bx0) + self._count(by0, bx0)
+        if touched == 0:
+            return True
+        seen: set[int] = set()
+        for by in range(by0, by1):
+            row = by * self.cols
+            for bx in range(bx0, bx1):
+                for idx in self._members.get(row + bx, ()):
+                    if idx in seen:
+                        continue
+                    seen.add(idx)
+                    ox, oy, ow, oh = self.rects[idx]
+                    if x0 < ox + ow and x1 > ox and y0 < oy + oh and y1 > oy:
+                        return False
+        return True
+
+    def _mark(self, by: int, bx: int) -> None:
+        """Count bucket (bx, by) as touched."""
+        stride = self.cols + 1
+        tree = self._tree
+        i = by + 1
+        while i <= self.rows:
+            j = bx + 1
+            base = i * stride
+            while j <= self.cols:
+                tree[base + j] += 1
+                j += j & -j
+            i += i & -i
+
+    def _count(self, rows: int, cols: int) -> int:
+        """Touched buckets in [0, cols) x [0, rows)."""
+        stride = self.cols + 1
+        tree = self._tree
+        total = 0
+        i = rows
+        while i > 0:
+            j = cols
+            base = i * stride
+            while j > 0:
+                total += tree[base + j]
+                j -= j & -j
+            i -= i & -i
+        return total
+
+    def _bucket_span(self, x0: int, y0: int, x1: int, y1: int) -> tuple[int, int, int, int] | None:
+        """Half-open bucket range covering pixels [x0, x1) x [y0, y1), clipped to the grid."""
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(self.width, x1), min(self.height, y1)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        b = self.bucket
+        return x0 // b, y0 // b, -(-x1 // b), -(-y1 // b)
@@ -36,8 +36,9 @@ def main():
 
     terrain_img = terrain_generator.generate(conf) if conf.get("terrain", {}).get("enabled", True) else None
     veg_img = vegetation_generator.generate(conf, terrain_img) if terrain_img and conf.get("vegetation", {}).get("enabled", True) else None
-    roads_img, _ = road_generator.generate(conf, terrain_img, veg_img) if terrain_img else (None, None)
-    placements = lots_prototype.generate_prototype_layout(lots_conf, terrain_img, roads_img, veg_img)
+    roads_img, _, road_network = road_generator.generate(conf, terrain_img, veg_img) if terrain_img else (None, None, None)
+    placements = lots_prototype.generate_prototype_layout(lots_conf, terrain_img, roads_img, veg_img,
+                                                          road_network=road_network, seed=conf.get("seed", 0))
 
     out_dir = Path(conf.get("output_dir", "output"))
     out_dir.mkdir(parents=True, exist_ok=True)
@@ -1,21 +1,73 @@
 from __future__ import annotations
 
 import random
-from dataclasses import dataclass
+import re
+from array import array
+from dataclasses import dataclass, field
+from itertools import repeat
 from pathlib import Path
-from typing import Iterable, Mapping, Sequence
+from typing import Iterable, Iterator, Mapping, Sequence
 
-from PIL import Image
+from PIL import Image, ImageChops
 
 from .catalog import BuildingAsset, scan_asset_catalog
+from .coverage import CoverageMap
+from .occupancy import OccupancyGrid
+from ..roads.network import RoadNetwork
+from ..utils import cancel
 from ..utils import colors as base_colors
+from ..utils import image_utils
+from ..utils import seeds as seed_utils
+
+ORIENTATIONS = ("horizontal", "vertical", "junction", "endpoint")
+FACINGS = ("North", "South", "East", "West")
 
 
 @dataclass(slots=True)
-class RoadSample:
-    x: int
-    y: int
-    orientation: str  # horizontal / vertical / junction / endpoint
+class RoadSamples:
+    """
+    Road frontage samples as parallel arrays: xs/ys (int32) and orientation
+    codes (uint8, index into ORIENTATIONS). Samples are grouped by orientation;
+    bounds[code] is the (start, stop) slice of that group.
+    """
+    xs: array = field(default_factory=lambda: array("i"))
+    ys: array = field(default_factory=lambda: array("i"))
+    kinds: array = field(default_factory=lambda: array("B"))
+    bounds: list[tuple[int, int]] = field(default_factory=lambda: [(0, 0)] * len(ORIENTATIONS))
+
+    @classmethod
+    def from_buckets(cls, buckets: Mapping[int, tuple[Iterable[int], Iterable[int]]]) -> "RoadSamples":
+        samples = cls()
+        bounds = []
+        for code in range(len(ORIENTATIONS)):
+            start = len(samples.xs)
+            if code in buckets:
+                xs, ys = buckets[code]
+                samples.xs.extend(xs)
+                samples.ys.extend(ys)
+            stop = len(samples.xs)
+            samples.kinds.extend(repeat(code, stop - start))
+            bounds.append((start, stop))
+        samples.bounds = bounds
+        return samples
+
+    def __len__(self) -> int:
+        return len(self.xs)
+
+    def count(self, orientation: str) -> int:
+        start, stop = self.bounds[ORIENTATIONS.index(orientation)]
+        return stop - start
+
+    def pick(self, rnd: random.Random, orientation: str | None = None) -> tuple[int, int, str]:
+        """Random (x, y, orientation); limited to one orientation group if given."""
+        if orientation is None:
+            start, stop = 0, len(self.xs)
+        else:
+            start, stop = self.bounds[ORIENTATIONS.index(orientation)]
+        if stop <= start:
+            raise IndexError("no road samples to pick from")
+        i = start + rnd.randrange(stop - start)
+        return self.xs[i], self.ys[i], ORIENTATIONS[self.kinds[i]]
 
 
 @dataclass(slots=True)
@@ -58,22 +110,31 @@ VEG_COLORS = {
 }
 
 
+def load_asset_catalog(proto_conf: dict) -> list[BuildingAsset]:
+    """TBX assets for the configured (or default) asset root and categories."""
+    asset_root = Path(proto_conf.get("asset_root") or _default_asset_root())
+    return scan_asset_catalog(asset_root, proto_conf.get("categories") or _default_category_settings())
+
+
 def generate_prototype_layout(
     lots_conf: Mapping,
     terrain_img: Image.Image | None,
     roads_img: Image.Image | None,
     veg_img: Image.Image | None = None,
+    *,
+    road_network: RoadNetwork | None = None,
+    seed: int = 0,
 ) -> list[dict[str, str | int]]:
     proto_conf = (lots_conf or {}).get("prototype", {})
     enabled = proto_conf.get("enabled", False)
-    if not enabled or terrain_img is None or roads_img is None:
+    if not enabled or terrain_img is None or (roads_img is None and road_network is None):
         return []
 
     asset_root = Path(proto_conf.get("asset_root") or _default_asset_root())
     categories_conf = proto_conf.get("categories") or _default_category_settings()
     size_presets = proto_conf.get("size_presets") or _default_size_presets()
 
-    assets = scan_asset_catalog(asset_root, categories_conf)
+    assets = load_asset_catalog(proto_conf)
     assets_by_category = _group_assets_by_category(assets)
 
     for category, presets in size_presets.items():
@@ -83,17 +144,27 @@ def generate_prototype_layout(
             _virtual_asset(asset_root, category, preset) for preset in presets
         ]
 
-    road_samples = _collect_road_samples(roads_img)
+    if road_network is not None and not road_network.is_empty():
+        road_samples = _road_samples_from_network(road_network)
+    else:
+        road_samples = _collect_road_samples(roads_img)
     if not road_samples:
         return []
 
     placements: list[LotPlacement] = []
-    occupied: list[tuple[int, int, int, int]] = []
     map_width, map_height = terrain_img.size
+    occupied = OccupancyGrid(map_width, map_height)
+    terrain_cover = CoverageMap(terrain_img, TERRAIN_COLORS)
+    veg_cover = CoverageMap(veg_img, VEG_COLORS) if veg_img is not None else None
     padding_default = int(proto_conf.get("collision_padding", 6))
     attempts_default = int(proto_conf.get("attempts_per_lot", 80))
+    terrain_min_default = float(proto_conf.get("min_terrain_coverage", 0.5))
+    veg_min_default = float(proto_conf.get("min_vegetation_coverage", 0.25))
+
+    rnd = random.Random(seed_utils.derive_seed(int(seed), "lots_prototype"))
 
     for category, settings in categories_conf.items():
+        cancel.check()
         target = int(settings.get("count", 0))
         if target <= 0:
             continue
@@ -103,43 +174,55 @@ def generate_prototype_layout(
 
         padding = int(settings.get("padding_override", padding_default))
         attempts = int(settings.get("attempts_per_lot", attempts_default))
-        for _ in range(target):
-            placement = _try_place_lot(
-                category=category,
-                settings=settings,
-                assets_pool=assets_pool,
-                road_samples=road_samples,
-                terrain_img=terrain_img,
-                veg_img=veg_img,
-                map_width=map_width,
-                map_height=map_height,
-                occupied=occupied,
-                padding=padding,
-                attempts=attempts,
-            )
-            if placement:
-                placements.append(placement)
-                occupied.append((placement.x, placement.y, placement.width, placement.height))
+        placements.extend(_place_category(
+            category=category,
+            settings=settings,
+            assets_pool=assets_pool,
+            road_samples=road_samples,
+            terrain_cover=terrain_cover,
+            veg_cover=veg_cover,
+            terrain_min=float(settings.get("min_terrain_coverage", terrain_min_default)),
+            veg_min=float(settings.get("min_vegetation_coverage", veg_min_default)),
+            map_width=map_width,
+            map_height=map_height,
+            occupied=occupied,
+            padding=padding,
+            target=target,
+            attempts=attempts,
+            rnd=rnd,
+        ))
 
     return [placement.as_conf_entry() for placement in placements]
 
 
-def _try_place_lot(
+def _place_category(
     *,
     category: str,
     settings: Mapping,
     assets_pool: Sequence[BuildingAsset],
-    road_samples: Sequence[RoadSample],
-    terrain_img: Image.Image,
-    veg_img: Image.Image | None,
+    road_samples: RoadSamples,
+    terrain_cover: CoverageMap,
+    veg_cover: CoverageMap | None,
+    terrain_min: float,
+    veg_min: float,
     map_width: int,
     map_height: int,
-    occupied: list[tuple[int, int, int, int]],
+    occupied: OccupancyGrid,
     padding: int,
+    target: int,
     attempts: int,
-) -> LotPlacement | None:
+    rnd: random.Random,
+) -> list[LotPlacement]:
+    """
+    Place up to `target` lots of one category from a single candidate batch.
+
+    `attempts` candidates per lot are drawn up front. Bounds and coverage are
+    static, so every candidate is checked and scored once; valid candidates
+    are then taken best score first (ties keep draw order), skipping any that
+    collide with lots placed before them.
+    """
     if not road_samples:
-        return None
+        return []
 
     terrain_pref: set[str] = set(settings.get("terrain_pref", []))
     veg_pref: set[str] = set(settings.get("vegetation_pref", []))
@@ -147,170 +230,209 @@ def _try_place_lot(
     buffer_cfg = settings.get("lateral_variance") or {"min": -6, "max": 6}
     bias_orientation = settings.get("orientation_bias") or []
 
-    for _ in range(max(1, attempts)):
-        sample = random.choice(road_samples)
-        facing = _pick_facing(sample.orientation, bias_orientation)
-        asset = random.choice(assets_pool)
+    count = max(1, attempts) * target
+    xs, ys, asset_ids, facings = _candidate_batch(
+        rnd, count, road_samples, assets_pool, distance_cfg, buffer_cfg, bias_orientation,
+    )
+    widths = [assets_pool[i].width for i in asset_ids]
+    heights = [assets_pool[i].height for i in asset_ids]
 
-        offset = _rand_between(distance_cfg, default_min=6, default_max=20)
-        lateral = _rand_between(buffer_cfg, default_min=-4, default_max=4)
+    valid = [
+        i for i in range(count)
+        if _within_bounds(xs[i], ys[i], widths[i], heights[i], map_width, map_height)
+    ]
+    scores: dict[int, float] = {}
+    for i in valid:
+        score = 0.0
+        if terrain_pref:
+            frac = terrain_cover.fraction(terrain_pref, xs[i], ys[i], widths[i], heights[i])
+            if frac < terrain_min:
+                continue
+            score += frac
+        if veg_pref and veg_cover is not None:
+            frac = veg_cover.fraction(veg_pref, xs[i], ys[i], widths[i], heights[i])
+            if frac < veg_min:
+                continue
+            score += frac
+        scores[i] = score
 
-        lot_x, lot_y = _project_from_road(sample.x, sample.y, asset.width, asset.height, facing, offset, lateral)
-        if lot_x is None or lot_y is None:
-            continue
-        if not _within_bounds(lot_x, lot_y, asset.width, asset.height, map_width, map_height):
-            continue
-        if not _terrain_ok(terrain_img, lot_x, lot_y, asset.width, asset.height, terrain_pref):
-            continue
-        if veg_pref and not _vegetation_ok(veg_img, lot_x, lot_y, asset.width, asset.height, veg_pref):
-            continue
-        if _overlaps_existing(lot_x, lot_y, asset.width, asset.height, occupied, padding):
+    placements: list[LotPlacement] = []
+    for i in sorted(scores, key=lambda idx: -scores[idx]):
+        if len(placements) >= target:
+            break
+        if not occupied.is_free(xs[i], ys[i], widths[i], heights[i], padding):
             continue
-
+        occupied.add(xs[i], ys[i], widths[i], heights[i])
+        asset = assets_pool[asset_ids[i]]
         metadata = {
             "stories": asset.metadata.get("stories", 1),
             "source": asset.metadata.get("source", asset.path.name),
         }
-        return LotPlacement(
-            x=lot_x,
-            y=lot_y,
+        placements.append(LotPlacement(
+            x=xs[i],
+            y=ys[i],
             width=asset.width,
             height=asset.height,
-            orientation=facing,
+            orientation=FACINGS[facings[i]],
             category=category,
             asset_name=asset.label,
             asset_path=str(asset.path),
             metadata=metadata,
-        )
-    return None
+        ))
+    return placements
 
 
-def _project_from_road(rx: int, ry: int, width: int, height: int, facing: str, offset: int, lateral: int) -> tuple[int | None, int | None]:
+def _candidate_batch(
+    rnd: random.Random,
+    count: int,
+    road_samples: RoadSamples,
+    assets_pool: Sequence[BuildingAsset],
+    distance_cfg: Mapping[str, int],
+    buffer_cfg: Mapping[str, int],
+    bias_orientation: Sequence[str],
+) -> tuple[array, array, array, array]:
+    """
+    `count` random candidates as parallel arrays: lot origin x/y (int32),
+    asset index (int32) and facing code (uint8, index into FACINGS).
+    """
+    xs, ys, asset_ids, facings = array("i"), array("i"), array("i"), array("B")
+    for _ in range(count):
+        road_x, road_y, road_orientation = road_samples.pick(rnd)
+        facing = _pick_facing(road_orientation, bias_orientation, rnd)
+        asset_id = rnd.randrange(len(assets_pool))
+        asset = assets_pool[asset_id]
+        offset = _rand_between(distance_cfg, default_min=6, default_max=20, rnd=rnd)
+        lateral = _rand_between(buffer_cfg, default_min=-4, default_max=4, rnd=rnd)
+        lot_x, lot_y = _project_from_road(road_x, road_y, asset.width, asset.height, facing, offset, lateral)
+        xs.append(lot_x)
+        ys.append(lot_y)
+        asset_ids.append(asset_id)
+        facings.append(FACINGS.index(facing))
+    return xs, ys, asset_ids, facings
+
+
+def _project_from_road(rx: int, ry: int, width: int, height: int, facing: str, offset: int, lateral: int) -> tuple[int, int]:
     if facing == "North":
         return int(rx - width / 2 + lateral), int(ry + offset)
     if facing == "South":
         return int(rx - width / 2 + lateral), int(ry - offset - height)
     if facing == "East":
         return int(rx + offset), int(ry - height / 2 + lateral)
-    if facing == "West":
-        return int(rx - offset - width), int(ry - height / 2 + lateral)
-    return None, None
+    return int(rx - offset - width), int(ry - height / 2 + lateral)
 
 
 def _within_bounds(x: int, y: int, w: int, h: int, max_w: int, max_h: int) -> bool:
     return 0 <= x < max_w and 0 <= y < max_h and (x + w) <= max_w and (y + h) <= max_h
 
 
-def _terrain_ok(img: Image.Image, x: int, y: int, w: int, h: int, preferred: Iterable[str]) -> bool:
-    prefs = set(preferred or [])
-    if not prefs:
-        return True
-    return any(_classify_terrain(img, px, py) in prefs for px, py in _sample_points(x, y, w, h, img.width, img.height))
-
-
-def _vegetation_ok(img: Image.Image | None, x: int, y: int, w: int, h: int, preferred: Iterable[str]) -> bool:
-    prefs = set(preferred or [])
-    if not prefs:
-        return True
-    if img is None:
-        return True
-    return any(_classify_vegetation(img, px, py) in prefs for px, py in _sample_points(x, y, w, h, img.width, img.height))
-
-
-def _sample_points(x: int, y: int, w: int, h: int, max_w: int, max_h: int) -> list[tuple[int, int]]:
-    pts = [
-        (x + w // 2, y + h // 2),
-        (x, y),
-        (x + w - 1, y),
-        (x, y + h - 1),
-        (x + w - 1, y + h - 1),
-    ]
-    clamped = [(min(max(px, 0), max_w - 1), min(max(py, 0), max_h - 1)) for px, py in pts]
-    return clamped
-
-
-def _classify_terrain(img: Image.Image, x: int, y: int) -> str:
-    pixel = img.getpixel((x, y))[:3]
-    return _closest_color(pixel, TERRAIN_COLORS)
-
-
-def _classify_vegetation(img: Image.Image, x: int, y: int) -> str:
-    pixel = img.getpixel((x, y))[:3]
-    return _closest_color(pixel, VEG_COLORS)
-
-
-def _closest_color(pixel: tuple[int, int, int], palette: Mapping[str, tuple[int, int, int]]) -> str:
-    best_name = ""
-    best_dist = float("inf")
-    pr, pg, pb = pixel
-    for name, (rr, rg, rb) in palette.items():
-        dist = (pr - rr) ** 2 + (pg - rg) ** 2 + (pb - rb) ** 2
-        if dist < best_dist:
-            best_dist = dist
-            best_name = name
-    return best_name
-
-
-def _overlaps_existing(x: int, y: int, w: int, h: int, occupied: list[tuple[int, int, int, int]], padding: int) -> bool:
-    for ox, oy, ow, oh in occupied:
-        if (
-            x - padding < ox + ow
-            and x + w + padding > ox
-            and y - padding < oy + oh
-            and y + h + padding > oy
-        ):
-            return True
-    return False
-
-
 def _group_assets_by_category(assets: Iterable[BuildingAsset]) -> dict[str, list[BuildingAsset]]:
     grouped: dict[str, list[BuildingAsset]] = {}
     for asset in assets:
         grouped.setdefault(asset.category, []).append(asset)
+    # rglob order is filesystem-dependent; sort so a seed always places the same lots
+    for pool in grouped.values():
+        pool.sort(key=lambda asset: str(asset.path))
     return grouped
 
 
-def _collect_road_samples(roads_img: Image.Image) -> list[RoadSample]:
+# neighbour flags (left/right -> 1, up/down -> 2) to ORIENTATIONS code + 1;
+# the +1 leaves 0 free for "not a road pixel"
+_NEIGHBOUR_CODE_LUT = [4, 1, 2, 3] + [0] * 252
+_ROAD_LUT = [0] * 8 + [255] * 248
+_RUN = re.compile(rb"\x01+")
+
+
+def _collect_road_samples(roads_img: Image.Image) -> RoadSamples:
+    """
+    Every road pixel (luminance >= 8) with its orientation, classified on
+    whole masks: a pixel with a left/right road neighbour is horizontal, with
+    an up/down one vertical, both a junction, neither an endpoint.
+    """
     if roads_img is None:
-        return []
-    mask = roads_img.convert("L")
-    px = mask.load()
-    width, height = mask.size
-    samples: list[RoadSample] = []
-    for y in range(height):
-        for x in range(width):
-            if px[x, y] < 8:
+        return RoadSamples()
+    lum = roads_img.convert("L")
+    width, height = lum.size
+    shift = image_utils.shift_image
+    flag = lum.point([0] + [1] * 255)
+    horizontal = ImageChops.lighter(shift(flag, 1, 0), shift(flag, -1, 0))
+    flag = lum.point([0] + [2] * 255)
+    vertical = ImageChops.lighter(shift(flag, 0, 1), shift(flag, 0, -1))
+    codes = ImageChops.add(horizontal, vertical).point(_NEIGHBOUR_CODE_LUT)
+    codes = ImageChops.darker(codes, lum.point(_ROAD_LUT))
+    data = codes.tobytes()
+
+    buckets: dict[int, tuple[array, array]] = {}
+    for code in range(len(ORIENTATIONS)):
+        table = bytes(1 if v == code + 1 else 0 for v in range(256))
+        xs, ys = array("i"), array("i")
+        for y, x0, x1 in _mask_runs(data.translate(table), width):
+            xs.extend(range(x0, x1))
+            ys.extend(repeat(y, x1 - x0))
+        buckets[code] = (xs, ys)
+    return RoadSamples.from_buckets(buckets)
+
+
+def _mask_runs(data: bytes, width: int) -> Iterator[tuple[int, int, int]]:
+    """(y, x0, x1) for each horizontal run of 0x01 bytes in a row-major mask."""
+    for match in _RUN.finditer(data):
+        start, end = match.span()
+        while start < end:
+            y, x = divmod(start, width)
+            stop = min(end, (y + 1) * width)
+            yield y, x, x + stop - start
+            start = stop
+
+
+def _road_samples_from_network(network: RoadNetwork) -> RoadSamples:
+    """
+    Walk every road centreline one pixel at a time. Orientation comes from the
+    segment direction; shared nodes are junctions and dangling ends endpoints.
+    """
+    junction_pts = {network.nodes[i] for i in network.junctions}
+    end_pts = {network.nodes[i] for i in network.endpoints()}
+    seen: set[tuple[int, int]] = set()
+    buckets = {code: (array("i"), array("i")) for code in range(len(ORIENTATIONS))}
+    junction, endpoint = ORIENTATIONS.index("junction"), ORIENTATIONS.index("endpoint")
+    for _road_type, _width, (x1, y1), (x2, y2) in network.iter_segments():
+        dx, dy = x2 - x1, y2 - y1
+        orientation = ORIENTATIONS.index(_segment_orientation(dx, dy))
+        steps = max(abs(dx), abs(dy), 1)
+        for i in range(steps + 1):
+            x = x1 + round(dx * i / steps)
+            y = y1 + round(dy * i / steps)
+            if (x, y) in seen or not (0 <= x < network.width and 0 <= y < network.height):
                 continue
-            orientation = _infer_orientation(px, x, y, width, height)
-            samples.append(RoadSample(x=x, y=y, orientation=orientation))
-    return samples
-
-
-def _infer_orientation(px, x: int, y: int, width: int, height: int) -> str:
-    left = x > 0 and px[x - 1, y] > 0
-    right = x < width - 1 and px[x + 1, y] > 0
-    up = y > 0 and px[x, y - 1] > 0
-    down = y < height - 1 and px[x, y + 1] > 0
-    horizontal = left or right
-    vertical = up or down
-    if horizontal and not vertical:
+            seen.add((x, y))
+            if (x, y) in junction_pts:
+                kind = junction
+            elif (x, y) in end_pts:
+                kind = endpoint
+            else:
+                kind = orientation
+            xs, ys = buckets[kind]
+            xs.append(x)
+            ys.append(y)
+    return RoadSamples.from_buckets(buckets)
+
+
+def _segment_orientation(dx: int, dy: int) -> str:
+    # diagonals read as junctions, like thick diagonal strokes do in the raster scan
+    if abs(dx) > 2 * abs(dy):
         return "horizontal"
-    if vertical and not horizontal:
+    if abs(dy) > 2 * abs(dx):
         return "vertical"
-    if horizontal and vertical:
-        return "junction"
-    return "endpoint"
+    return "junction"
 
 
-def _pick_facing(road_orientation: str, bias: Sequence[str]) -> str:
-    bias = [b for b in bias if b in {"North", "South", "East", "West"}]
-    if bias and random.random() < 0.35:
-        return random.choice(bias)
+def _pick_facing(road_orientation: str, bias: Sequence[str], rnd: random.Random) -> str:
+    bias = [b for b in bias if b in FACINGS]
+    if bias and rnd.random() < 0.35:
+        return rnd.choice(bias)
     if road_orientation == "horizontal":
-        return random.choice(["North", "South"])
+        return rnd.choice(["North", "South"])
     if road_orientation == "vertical":
-        return random.choice(["East", "West"])
-    return random.choice(["North", "South", "East", "West"])
+        return rnd.choice(["East", "West"])
+    return rnd.choice(FACINGS)
 
 
 def _default_asset_root() -> Path:
@@ -377,9 +499,9 @@ def _default_size_presets() -> dict[str, list[dict[str, int | str]]]:
     }
 
 
-def _rand_between(cfg: Mapping[str, int], default_min: int, default_max: int) -> int:
+def _rand_between(cfg: Mapping[str, int], default_min: int, default_max: int, rnd: random.Random) -> int:
     lo = int(cfg.get("min", default_min))
     hi = int(cfg.get("max", default_max))
     if hi < lo:
         lo, hi = hi, lo
-    return random.randint(lo, hi)
+    return rnd.randint(lo, hi)
@@ -0,0 +1,239 @@
+"""
+Road network graph: the planned road polylines as a pipeline product.
+
+The rasters in roads.png are one rendering of this graph. Downstream stages
+(lot placement, details) can read frontage straight from the geometry instead
+of rediscovering roads pixel by pixel.
+
+- nodes are integer pixel coordinates
+- each road type keeps its stroke width and its polylines as node-index lists
+- crossings and T-branches are split into shared nodes; a junction is a node
+  used by two or more polylines
+"""
+
+from __future__ import annotations
+
+import json
+import math
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, Mapping, Sequence
+
+ROAD_TYPES = ("highway", "major", "main", "side")
+FORMAT_VERSION = 1
+
+# bucket size (px) for the segment pair search
+_BUCKET = 32
+
+
+@dataclass(slots=True)
+class RoadNetwork:
+    width: int
+    height: int
+    nodes: list[tuple[int, int]] = field(default_factory=list)
+    roads: dict[str, list[list[int]]] = field(default_factory=dict)
+    widths: dict[str, int] = field(default_factory=dict)
+    junctions: list[int] = field(default_factory=list)
+
+    def polylines(self, road_type: str) -> list[list[tuple[int, int]]]:
+        return [[self.nodes[i] for i in poly] for poly in self.roads.get(road_type, [])]
+
+    def iter_segments(self) -> Iterator[tuple[str, int, tuple[int, int], tuple[int, int]]]:
+        """Yield (road_type, width, start, end) for every polyline segment."""
+        for road_type in ROAD_TYPES:
+            width = int(self.widths.get(road_type, 1))
+            for poly in self.roads.get(road_type, []):
+                for a, b in zip(poly, poly[1:]):
+                    yield road_type, width, self.nodes[a], self.nodes[b]
+
+    def endpoints(self) -> set[int]:
+        """Polyline ends that do not connect to any other road."""
+        junctions = set(self.junctions)
+        ends: set[int] = set()
+        for polys in self.roads.values():
+            for poly in polys:
+                for idx in (poly[0], poly[-1]):
+                    if idx not in junctions:
+                        ends.add(idx)
+        return ends
+
+    def is_empty(self) -> bool:
+        return not any(self.roads.values())
+
+    def to_dict(self) -> dict:
+        return {
+            "version": FORMAT_VERSION,
+            "width": self.width,
+            "height": self.height,
+            "nodes": [list(n) for n in self.nodes],
+            "roads": {
+                road_type: {
+                    "width": int(self.widths.get(road_type, 1)),
+                    "polylines": [list(p) for p in self.roads.get(road_type, [])],
+                }
+                for road_type in ROAD_TYPES
+                if road_type in self.roads or road_type in self.widths
+            },
+            "junctions": list(self.junctions),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> "RoadNetwork":
+        roads_data = data.get("roads", {}) or {}
+        return cls(
+            width=int(data.get("width", 0)),
+            height=int(data.get("height", 0)),
+            nodes=[(int(x), int(y)) for x, y in data.get("nodes", [])],
+            roads={k: [list(map(int, p)) for p in v.get("polylines", [])] for k, v in roads_data.items()},
+            widths={k: int(v.get("width", 1)) for k, v in roads_data.items()},
+            junctions=[int(i) for i in data.get("junctions", [])],
+        )
+
+    def save(self, path: Path) -> None:
+        Path(path).write_text(json.dumps(self.to_dict(), separators=(",", ":")), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path) -> "RoadNetwork":
+        return cls.from_dict(json.loads(Path(path).read_text(encoding="utf-8")))
+
+
+def build_network(
+    width: int,
+    height: int,
+    polylines: Mapping[str, Sequence[Sequence[tuple[float, float]]]],
+    widths: Mapping[str, int],
+    snap: float = 1.5,
+) -> RoadNetwork:
+    """
+    Turn raw planner polylines into a RoadNetwork.
+
+    Vertices are rounded to pixels. Wherever a segment crosses another road,
+    or a road starts/ends within `snap` px of one, the meeting point is
+    inserted into both polylines so the roads share a node.
+    """
+    polys: list[tuple[str, list[tuple[int, int]]]] = []
+    for road_type in ROAD_TYPES:
+        for raw in polylines.get(road_type, []) or []:
+            pts: list[tuple[int, int]] = []
+            for x, y in raw:
+                p = (int(round(x)), int(round(y)))
+                if not pts or pts[-1] != p:
+                    pts.append(p)
+            if len(pts) >= 2:
+                polys.append((road_type, pts))
+
+    # (poly index, segment index) -> [(t along segment, point)]
+    splits: dict[tuple[int, int], list[tuple[float, tuple[int, int]]]] = {}
+    segments: list[tuple[int, int, tuple[int, int], tuple[int, int]]] = []
+    for pi, (_, pts) in enumerate(polys):
+        for si in range(len(pts) - 1):
+            segments.append((pi, si, pts[si], pts[si + 1]))
+
+    for a, b in _candidate_pairs(segments, snap):
+        pa, sa, a1, a2 = segments[a]
+        pb, sb, b1, b2 = segments[b]
+        hit = _meet(a1, a2, b1, b2, snap)
+        if hit is None:
+            continue
+        ta, tb, point = hit
+        splits.setdefault((pa, sa), []).append((ta, point))
+        splits.setdefault((pb, sb), []).append((tb, point))
+
+    network = RoadNetwork(width=int(width), height=int(height))
+    network.widths = {k: int(v) for k, v in widths.items()}
+    node_ids: dict[tuple[int, int], int] = {}
+    users: dict[int, set[int]] = {}
+
+    def _node(p: tuple[int, int]) -> int:
+        idx = node_ids.get(p)
+        if idx is None:
+            idx = len(network.nodes)
+            node_ids[p] = idx
+            network.nodes.append(p)
+        return idx
+
+    for pi, (road_type, pts) in enumerate(polys):
+        full: list[tuple[int, int]] = [pts[0]]
+        for si in range(len(pts) - 1):
+            for _, p in sorted(splits.get((pi, si), [])):
+                if p != full[-1]:
+                    full.append(p)
+            if pts[si + 1] != full[-1]:
+                full.append(pts[si + 1])
+        ids = [_node(p) for p in full]
+        for idx in ids:
+            users.setdefault(idx, set()).add(pi)
+        network.roads.setdefault(road_type, []).append(ids)
+
+    network.junctions = sorted(idx for idx, owners in users.items() if len(owners) >= 2)
+    return network
+
+
+def _candidate_pairs(segments, snap: float) -> Iterator[tuple[int, int]]:
+    """Pairs of segments from different polylines whose padded bboxes share a bucket."""
+    buckets: dict[tuple[int, int], list[int]] = {}
+    for i, (_, _, p, q) in enumerate(segments):
+        x0 = int((min(p[0], q[0]) - snap) // _BUCKET)
+        x1 = int((max(p[0], q[0]) + snap) // _BUCKET)
+        y0 = int((min(p[1], q[1]) - snap) // _BUCKET)
+        y1 = int((max(p[1], q[1]) + snap) // _BUCKET)
+        for by in range(y0, y1 + 1):
+            for bx in range(x0, x1 + 1):
+                buckets.setdefault((bx, by), []).append(i)
+    seen: set[tuple[int, int]] = set()
+    for members in buckets.values():
+        for ii in range(len(members)):
+            a = members[ii]
+            for jj in range(ii + 1, len(members)):
+                b = members[jj]
+                if segments[a][0] == segments[b][0]:
+                    continue
+                key = (a, b) if a < b else (b, a)
+                if key in seen:
+                    continue
+                seen.add(key)
+                yield key
+
+
+def _meet(a1, a2, b1, b2, snap: float):
+    """
+    Where segment a meets segment b: (t on a, t on b, shared pixel), or None.
+    Ends within `snap` px of the other segment count as meeting (T-branches).
+    """
+    ax, ay = a2[0] - a1[0], a2[1] - a1[1]
+    bx, by = b2[0] - b1[0], b2[1] - b1[1]
+    la = math.hypot(ax, ay)
+    lb = math.hypot(bx, by)
+    if la == 0 or lb == 0:
+        return None
+    denom = ax * by - ay * bx
+    if abs(denom) < 1e-9:
+        return None  # parallel / colinear overlaps are left alone
+    dx, dy = b1[0] - a1[0], b1[1] - a1[1]
+    t = (dx * by - dy * bx) / denom
+    u = (dx * ay - dy * ax) / denom
+    ea = snap / la
+    eb = snap / lb
+    if not (-ea <= t <= 1 + ea and -eb <= u <= 1 + eb):
+        return None
+    t = min(1.0, max(0.0, t))
+    u = min(1.0, max(0.0, u))
+    # meeting point on the segment that actually passes through it
+    if 0.0 < u < 1.0 and (t in (0.0, 1.0)):
+        px, py = b1[0] + bx * u, b1[1] + by * u
+    else:
+        px, py = a1[0] + ax * t, a1[1] + ay * t
+    point = (int(round(px)), int(round(py)))
+    # both segments must actually reach the point (clamping can move it away)
+    if _dist_to_segment(point, a1, a2) > snap + 0.75 or _dist_to_segment(point, b1, b2) > snap + 0.75:
+        return None
+    return t, u, point
+
+
+def _dist_to_segment(p, a, b) -> float:
+    ax, ay = b[0] - a[0], b[1] - a[1]
+    l2 = ax * ax + ay * ay
+    if l2 == 0:
+        return math.hypot(p[0] - a[0], p[1] - a[1])
+    t = max(0.0, min(1.0, ((p[0] - a[0]) * ax + (p[1] - a[1]) * ay) / l2))
+    return math.hypot(p[0] - (a[0] + ax * t), p[1] - (a[1] + ay * t))
@@ -0,0 +1,146 @@
+"""
+Memoized A* results for the pathfinding road planner.
+
+Live-preview regenerations often re-plan roads over an identical cost grid
+(e.g. after a vegetation colour or details preset change). Results are keyed
+by a hash of the cost grid contents plus (start, goal, diag), so any change
+to terrain, vegetation or planner settings that alters the grid misses.
+
+- an in-memory LRU lives for the process (the GUI session)
+- an optional directory keeps entries on disk between sessions, at most
+  `max_disk_entries` files; a write over the cap deletes the least recently
+  used files (oldest mtime; hits touch their file) down to 90% of it
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from array import array
+from collections import OrderedDict
+from hashlib import blake2b
+from itertools import chain
+from pathlib import Path
+from typing import Sequence
+
+# bump when the A* cost model changes so stale disk entries miss
+ALGO_VERSION = 1
+
+_MISS = object()
+
+GridPath = list[tuple[int, int]] | None
+
+
+class PathCache:
+    def __init__(self, max_entries: int = 512, disk_dir: Path | None = None, max_disk_entries: int = 4096):
+        self.max_entries = max(1, int(max_entries))
+        self.disk_dir = Path(disk_dir).expanduser() if disk_dir else None
+        self.max_disk_entries = max(1, int(max_disk_entries))
+        self._disk_count: int | None = None
+        self._mem: OrderedDict[str, GridPath] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(grid: Sequence[Sequence[int]], start: tuple[int, int], goal: tuple[int, int], diag: bool) -> str:
+        gh = len(grid)
+        gw = len(grid[0]) if gh else 0
+        h = blake2b(digest_size=16)
+        h.update(f"{ALGO_VERSION}|{gw}x{gh}|{start[0]},{start[1]}|{goal[0]},{goal[1]}|{int(bool(diag))}".encode("ascii"))
+        h.update(array("i", chain.from_iterable(grid)).tobytes())
+        return h.hexdigest()
+
+    def get(self, key: str):
+        """Cached path (possibly None for 'unreachable'), or _MISS."""
+        if key in self._mem:
+            self._mem.move_to_end(key)
+            self.hits += 1
+            return _copy(self._mem[key])
+        if self.disk_dir is not None:
+            path = self.disk_dir / f"{key}.json"
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                data = _MISS
+            if data is not _MISS:
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+                value = [tuple(p) for p in data] if data is not None else None
+                self._remember(key, value)
+                self.hits += 1
+                return _copy(value)
+        self.misses += 1
+        return _MISS
+
+    def put(self, key: str, value: GridPath) -> None:
+        value = [tuple(p) for p in value] if value is not None else None
+        self._remember(key, value)
+        if self.disk_dir is not None:
+            path = self.disk_dir / f"{key}.json"
+            try:
+                self.disk_dir.mkdir(parents=True, exist_ok=True)
+                if self._disk_count is None:
+                    self._disk_count = sum(1 for _ in self.disk_dir.glob("*.json"))
+                fresh = not path.exists()
+                path.write_text(json.dumps(value), encoding="utf-8")
+            except OSError:
+                return
+            if fresh:
+                self._disk_count += 1
+                if self._disk_count > self.max_disk_entries:
+                    self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        """Delete the oldest files down to 90% of the cap (so pruning isn't on every write)."""
+        entries = []
+        for path in self.disk_dir.glob("*.json"):
+            try:
+                entries.append((path.stat().st_mtime_ns, path))
+            except OSError:
+                pass
+        entries.sort()
+        keep = self.max_disk_entries * 9 // 10
+        for _, path in entries[:max(0, len(entries) - keep)]:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+        self._disk_count = sum(1 for _ in self.disk_dir.glob("*.json"))
+
+    def clear(self) -> None:
+        self._mem.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, value: GridPath) -> None:
+        self._mem[key] = value
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+
+def _copy(value: GridPath) -> GridPath:
+    return list(value) if value is not None else None
+
+
+# one cache per disk location, kept for the life of the process
+_CACHES: dict[str, PathCache] = {}
+
+
+def cache_for(road_conf: dict) -> PathCache | None:
+    """Session cache for this roads config, or None when caching is off."""
+    if not road_conf.get("path_cache", True):
+        return None
+    disk_dir = road_conf.get("path_cache_dir") or ""
+    cache = _CACHES.get(disk_dir)
+    if cache is None:
+        cache = PathCache(disk_dir=Path(disk_dir) if disk_dir else None,
+                          max_disk_entries=int(road_conf.get("path_cache_max_files", 4096)))
+        _CACHES[disk_dir] = cache
+    return cache
+
+
+def is_miss(value) -> bool:
+    return value is _MISS
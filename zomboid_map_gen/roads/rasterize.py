@@ -0,0 +1,203 @@
+"""
+Road rasterization, split from planning.
+
+The planner produces one world-scale RoadNetwork. Each cell (300x300 by
+default) is then drawn on its own:
+
+- polylines are clipped to the cell plus a stroke-width margin
+- strokes are drawn on a small padded canvas in z-order
+- potholes and dirt transitions run on that canvas with cell-derived seeds
+- the padding is cropped away
+
+Potholes are seeded per cell and every cell also replays its neighbours'
+candidates inside its margin, so tiles line up without seams and any box
+renders the same pixels as the full map. Consumers take cells as they need
+them: details and vegetation carving via iter_cells, tile export renders
+each cell's job (cell_job/render_job) inside its tile worker. render_full
+assembles the whole map only for the full-map roads/combined PNGs.
+"""
+
+from __future__ import annotations
+
+import random
+from typing import Iterator, Mapping
+
+from PIL import Image, ImageDraw
+
+from ..utils import seeds as seed_utils
+from ..utils.parallel import cpu_count, iter_process_map
+from . import road_post
+from .network import RoadNetwork
+
+# lowest first: highways end up on top
+DRAW_ORDER = ("side", "main", "major", "highway")
+
+# transitions read 1px neighbours and stamp up to 2px sideways / 1px down
+_POST_REACH = road_post.POTHOLE_MAX_RADIUS + 4
+
+# below this many pixels a pool costs more to start than the cells take to draw
+_INLINE_PIXELS = 1 << 20
+
+
+def render_settings(conf: dict, colors: Mapping[str, tuple[int, int, int]]) -> dict:
+    """Plain-data render options (picklable for worker processes)."""
+    road_conf = conf.get("roads", {})
+    canvas = conf.get("canvas", {})
+    master_seed = conf.get("seed", 0)
+    seed_offset = int(road_conf.get("seed_offset", 4242))
+    return {
+        "colors": {k: tuple(v[:3]) for k, v in colors.items()},
+        "cell_size": max(1, int(canvas.get("cell_size", 300))),
+        "pothole_density": float(road_conf.get("pothole_density", 0.02)),
+        "pothole_seed": (master_seed + seed_offset * 7) & 0xFFFFFFFF,
+    }
+
+
+def cell_grid(network: RoadNetwork, cell_size: int) -> tuple[int, int]:
+    cells_x = max(1, -(-network.width // cell_size))
+    cells_y = max(1, -(-network.height // cell_size))
+    return cells_x, cells_y
+
+
+def cell_box(network: RoadNetwork, cell_size: int, cx: int, cy: int) -> tuple[int, int, int, int]:
+    x0, y0 = cx * cell_size, cy * cell_size
+    return x0, y0, min(network.width, x0 + cell_size), min(network.height, y0 + cell_size)
+
+
+def cell_padding(network: RoadNetwork) -> int:
+    widest = max(network.widths.values(), default=1)
+    return int(widest) + _POST_REACH
+
+
+def clip_strokes(network: RoadNetwork, box: tuple[int, int, int, int], margin: int
+                 ) -> list[tuple[str, int, list[tuple[int, int]]]]:
+    """
+    Strokes (road_type, width, points) touching `box` grown by `margin` plus
+    the stroke width, in draw order. Each polyline is cut down to its runs of
+    touching segments, extended by one segment either side so joints draw the
+    same as in the uncut line.
+    """
+    x0, y0, x1, y1 = box
+    strokes = []
+    for road_type in DRAW_ORDER:
+        width = int(network.widths.get(road_type, 1))
+        pad = margin + width
+        bx0, by0, bx1, by1 = x0 - pad, y0 - pad, x1 + pad, y1 + pad
+        for pts in network.polylines(road_type):
+            hits = [
+                i for i in range(len(pts) - 1)
+                if min(pts[i][0], pts[i + 1][0]) <= bx1 and max(pts[i][0], pts[i + 1][0]) >= bx0
+                and min(pts[i][1], pts[i + 1][1]) <= by1 and max(pts[i][1], pts[i + 1][1]) >= by0
+            ]
+            if not hits:
+                continue
+            last = len(pts) - 2
+            run_start = max(0, hits[0] - 1)
+            run_end = min(last, hits[0] + 1)
+            for i in hits[1:]:
+                if i - 1 <= run_end + 1:
+                    run_end = min(last, i + 1)
+                    continue
+                strokes.append((road_type, width, pts[run_start:run_end + 2]))
+                run_start, run_end = max(0, i - 1), min(last, i + 1)
+            strokes.append((road_type, width, pts[run_start:run_end + 2]))
+    return strokes
+
+
+def cell_job(network: RoadNetwork, settings: Mapping, cx: int, cy: int, margin: int = 0) -> tuple:
+    """
+    Picklable render job for one cell grown by `margin` (clipped to the
+    world); render_job turns it into the image. Only the clipped strokes
+    travel with it, not the network.
+    """
+    cell_size = int(settings["cell_size"])
+    x0, y0, x1, y1 = cell_box(network, cell_size, cx, cy)
+    box = (max(0, x0 - margin), max(0, y0 - margin),
+           min(network.width, x1 + margin), min(network.height, y1 + margin))
+    pad = cell_padding(network)
+    return (clip_strokes(network, box, pad), box, pad, (network.width, network.height),
+            cell_grid(network, cell_size), dict(settings))
+
+
+def render_job(job: tuple) -> Image.Image:
+    box = job[1]
+    return Image.frombytes("RGBA", (box[2] - box[0], box[3] - box[1]), _render_cell_worker(*job))
+
+
+def render_cell(network: RoadNetwork, settings: Mapping, cx: int, cy: int) -> Image.Image:
+    """Rasterize one cell of the network (cell-sized RGBA image)."""
+    return render_job(cell_job(network, settings, cx, cy))
+
+
+def iter_cells(network: RoadNetwork, settings: Mapping, cells: list[tuple[int, int]] | None = None,
+               max_workers: int | None = None, margin: int = 0
+               ) -> Iterator[tuple[tuple[int, int], Image.Image]]:
+    """
+    Yield ((cx, cy), cell image) as cells finish. Canvases above
+    _INLINE_PIXELS are spread over a process pool; each worker only receives
+    its clipped strokes.
+
+    `margin` grows every cell by that many pixels (clipped to the world) for
+    callers that read roads just outside the cell; the image then starts at
+    (max(0, x0 - margin), max(0, y0 - margin)).
+    """
+    cell_size = int(settings["cell_size"])
+    grid = cell_grid(network, cell_size)
+    if cells is None:
+        cells = [(cx, cy) for cy in range(grid[1]) for cx in range(grid[0])]
+    if not cells:
+        return
+    margin = max(0, int(margin))
+    jobs = [cell_job(network, settings, cx, cy, margin) for cx, cy in cells]
+
+    area = sum((box[2] - box[0]) * (box[3] - box[1]) for _, box, *_ in jobs)
+    if len(jobs) == 1 or area <= _INLINE_PIXELS or (max_workers is not None and max_workers <= 1):
+        results = ((i, _render_cell_worker(*args)) for i, args in enumerate(jobs))
+    else:
+        results = iter_process_map(_render_cell_worker, jobs, max_workers=max_workers or min(len(jobs), cpu_count()))
+    for i, data in results:
+        box = jobs[i][1]
+        yield cells[i], Image.frombytes("RGBA", (box[2] - box[0], box[3] - box[1]), data)
+
+
+def render_full(network: RoadNetwork, settings: Mapping, max_workers: int | None = None) -> Image.Image:
+    """Assemble every cell into one full-size roads image."""
+    out = Image.new("RGBA", (network.width, network.height), (0, 0, 0, 0))
+    cell_size = int(settings["cell_size"])
+    for (cx, cy), tile in iter_cells(network, settings, max_workers=max_workers):
+        out.paste(tile, (cx * cell_size, cy * cell_size))
+    return out
+
+
+# ---- worker (top-level for Windows spawn) ----
+def _render_cell_worker(strokes, box, pad, world_size, grid, settings) -> bytes:
+    world_w, world_h = world_size
+    x0, y0, x1, y1 = box
+    # padded canvas, clipped to the world so world edges behave like one big image
+    px0, py0 = max(0, x0 - pad), max(0, y0 - pad)
+    px1, py1 = min(world_w, x1 + pad), min(world_h, y1 + pad)
+    canvas = Image.new("RGBA", (px1 - px0, py1 - py0), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(canvas)
+    colors = settings["colors"]
+    for road_type, width, pts in strokes:
+        local = [(x - px0, y - py0) for x, y in pts]
+        draw.line(local, fill=tuple(colors[road_type]) + (255,), width=width, joint="curve")
+
+    density = float(settings.get("pothole_density", 0.0))
+    if density > 0:
+        cell_size = int(settings["cell_size"])
+        # every cell whose potholes can reach the padded box
+        nx0, ny0 = max(0, (x0 - pad) // cell_size), max(0, (y0 - pad) // cell_size)
+        nx1 = min(grid[0] - 1, (x1 - 1 + pad) // cell_size)
+        ny1 = min(grid[1] - 1, (y1 - 1 + pad) // cell_size)
+        candidates = []
+        for ny in range(ny0, ny1 + 1):
+            for nx in range(nx0, nx1 + 1):
+                nbox = (nx * cell_size, ny * cell_size,
+                        min(world_w, (nx + 1) * cell_size), min(world_h, (ny + 1) * cell_size))
+                rnd = random.Random(seed_utils.derive_seed(int(settings["pothole_seed"]), f"potholes_{nx}_{ny}"))
+                candidates.extend(road_post.pothole_candidates(rnd, nbox, density))
+        road_post.stamp_potholes(canvas, candidates, origin=(px0, py0))
+
+    road_post.sprinkle_dirt_transitions(canvas)
+    return canvas.crop((x0 - px0, y0 - py0, x1 - px0, y1 - py0)).tobytes()
@@ -2,6 +2,9 @@
 """
 Sample terrain/vegetation and return a "cost" for putting a road there.
 Higher cost = worse place to put a road.
+
+The samplers take anything with `size` and `getpixel` returning RGB(A)
+tuples: an RGBA image or a utils.indexed.PixelView.
 """
 
 from ..utils import colors as base_colors
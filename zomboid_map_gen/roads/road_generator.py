@@ -10,13 +10,19 @@ Default is "path" which tends to be reliable and obstacle-aware.
 
 import random
 import math
-from PIL import Image, ImageDraw
+from PIL import Image
 
 from ..utils import colors as base_colors
+from ..utils import cancel
+from ..utils import indexed
+from ..utils import seeds as seed_utils
 from . import patterns
 from . import road_costs
 from . import road_post
 from . import dirt_paths
+from . import network
+from . import path_cache
+from . import rasterize
 
 
 # pick colors straight from user palette
@@ -43,23 +49,48 @@ def _step_from(x, y, angle_deg, length):
     return x + math.cos(rad) * length, y + math.sin(rad) * length
 
 
-def _pick_edge_start(w, h):
-    side = random.choice(["top", "bottom", "left", "right"])
+def _pick_edge_start(rng, w, h):
+    side = rng.choice(["top", "bottom", "left", "right"])
     if side == "top":
-        return random.randint(0, w - 1), 1, 90
+        return rng.randint(0, w - 1), 1, 90
     if side == "bottom":
-        return random.randint(0, w - 1), h - 2, -90
+        return rng.randint(0, w - 1), h - 2, -90
     if side == "left":
-        return 1, random.randint(0, h - 1), 0
-    return w - 2, random.randint(0, h - 1), 180
+        return 1, rng.randint(0, h - 1), 0
+    return w - 2, rng.randint(0, h - 1), 180
 
 
 def generate(conf: dict, terrain_img=None, vegetation_img=None):
+    """
+    Plan and draw the road overlay.
+
+    Returns (roads_img, lots_img, road_network) where road_network is the
+    planned graph (see roads.network.RoadNetwork). The roads image is
+    rasterized cell by cell from the network (see roads.rasterize).
+    """
+    road_network, lots_img = plan(conf, terrain_img, vegetation_img)
+    roads_img = rasterize.render_full(road_network, render_settings(conf))
+    return roads_img, lots_img, road_network
+
+
+def render_settings(conf: dict) -> dict:
+    """Rasterizer settings for this config (road colours, potholes, cell size)."""
+    return rasterize.render_settings(conf, {k: v["color"] for k, v in ROAD_STYLES.items()})
+
+
+def plan(conf: dict, terrain_img=None, vegetation_img=None):
+    """
+    World-scale planning only: returns (road_network, lots_img) without
+    drawing any roads.
+    """
     if terrain_img is None:
         raise ValueError("road_generator.generate needs terrain_img for sizing")
 
     width, height = terrain_img.size
     road_conf = conf.get("roads", {})
+    # the cost samplers read single pixels; views give RGBA tuples for indexed layers too
+    terrain_px = indexed.PixelView(terrain_img)
+    veg_px = indexed.PixelView(vegetation_img) if vegetation_img is not None else None
 
     planner = (road_conf.get("planner", "path") or "path").lower()
 
@@ -146,17 +177,21 @@ def generate(conf: dict, terrain_img=None, vegetation_img=None):
 
     ignore_water = bool(road_conf.get("ignore_water", False))
     ignore_trees = bool(road_conf.get("ignore_trees", False))
+    paths = path_cache.cache_for(road_conf)
 
-    # RNG
+    # RNG: a private stream, so another run in this process (GUI, server) can't shift it
     master_seed = conf.get("seed", 0)
     seed_offset = int(road_conf.get("seed_offset", 4242))
-    random.seed(master_seed + seed_offset)
+    rng = random.Random(master_seed + seed_offset)
+
+    def _feature_rng(name: str) -> random.Random:
+        # one stream per planned feature, so adding a town doesn't move the others
+        return random.Random(seed_utils.derive_seed(master_seed + seed_offset, name))
 
     # --- accumulators ---
     polylines = {"highway": [], "major": [], "main": [], "side": []}
     same_type_segments = {"highway": [], "major": [], "main": [], "side": []}
 
-    roads_img = Image.new("RGBA", (width, height), (0, 0, 0, 0))
     lots_img = Image.new("RGBA", (width, height), (0, 0, 0, 0))
 
     # helpers ---------------------------------------------------------------
@@ -197,6 +232,7 @@ def generate(conf: dict, terrain_img=None, vegetation_img=None):
 
     # ------------------- Random-walk planner ------------------------------
     def _make_road(start_x, start_y, start_angle, road_type: str):
+        cancel.check()
         mode = (type_modes.get(road_type) or default_mode).lower()
         gstep = grid_steps.get(road_type, 0)
         min_len, max_len = length_ranges[road_type]
@@ -211,7 +247,7 @@ def generate(conf: dict, terrain_img=None, vegetation_img=None):
             if segs_made >= max_segs:
                 break
 
-            seg_len = random.randint(int(min_len), int(max_len))
+            seg_len = rng.randint(int(min_len), int(max_len))
             nx, ny = _step_from(x, y, angle, seg_len)
             nx, ny = patterns.snap_point_to_grid(nx, ny, gstep)
 
@@ -220,7 +256,7 @@ def generate(conf: dict, terrain_img=None, vegetation_img=None):
 
             avg_cost = road_costs.segment_avg_cost(
                 x, y, nx, ny,
-                terrain_img, vegetation_img,
+                terrain_px, veg_px,
                 ignore_water=ignore_water,
                 ignore_trees=ignore_trees,
             )
@@ -230,12 +266,12 @@ def generate(conf: dict, terrain_img=None, vegetation_img=None):
             if _too_close_parallel(road_type, x, y, nx, ny):
                 # try a turn then retry
                 if mode == "free":
-                    jitter = random.uniform(turn_min, turn_max)
-                    if random.random() < 0.5:
+                    jitter = rng.uniform(turn_min, turn_max)
+                    if rng.random() < 0.5:
                         jitter = -jitter
                     angle = patterns.snap_angle(angle + jitter, mode)
                 else:
-                    angle = patterns.snap_angle(angle + random.choice([-90, 90, -45, 45]), mode)
+                    angle = patterns.snap_angle(angle + rng.choice([-90, 90, -45, 45]), mode)
                 continue
 
             # commit
@@ -244,9 +280,9 @@ def generate(conf: dict, terrain_img=None, vegetation_img=None):
             segs_made += 1
 
             # maybe lot
-            if road_type in ("major", "main") and random.random() < lot_spawn_chance:
-                lw = random.randint(lot_min_w, lot_max_w)
-                lh = random.randint(lot_min_h, lot_max_h)
+            if road_type in ("major", "main") and rng.random() < lot_spawn_chance:
+                lw = rng.randint(lot_min_w, lot_max_w)
+                lh = rng.randint(lot_min_h, lot_max_h)
                 lx, ly = int(nx + 5), int(ny + 5)
                 if _in_bounds(lx, ly, width, height, margin=5):
                     road_post.add_parking_lot_rect(lots_img, lx, ly, lw, lh)
@@ -255,13 +291,13 @@ def generate(conf: dict, terrain_img=None, vegetation_img=None):
 
             # turn for next segment
             if mode == "free":
-                jitter = random.uniform(turn_min, turn_max)
-                angle = patterns.snap_angle(angle + (jitter if random.random() < 0.5 else -jitter), mode)
+                jitter = rng.uniform(turn_min, turn_max)
+                angle = patterns.snap_angle(angle + (jitter if rng.random() < 0.5 else -jitter), mode)
             else:
                 if mode == "ortho":
-                    angle = patterns.snap_angle(angle + random.choice([0, 90, -90]), mode)
+                    angle = patterns.snap_angle(angle + rng.choice([0, 90, -90]), mode)
                 else:  # ortho45
-                    angle = patterns.snap_angle(angle + random.choice([0, 45, -45, 90, -90]), mode)
+                    angle = patterns.snap_angle(angle + rng.choice([0, 45, -45, 90, -90]), mode)
 
         return points if len(points) > 1 else None
 
@@ -272,16 +308,30 @@ def generate(conf: dict, terrain_img=None, vegetation_img=None):
         gh = max(1, height // step)
         grid = [[2 for _ in range(gw)] for __ in range(gh)]
         for gy in range(gh):
+            cancel.check()
             py = min(height - 1, gy * step + step // 2)
             for gx in range(gw):
                 px = min(width - 1, gx * step + step // 2)
-                c = road_costs.terrain_cost_at(px, py, terrain_img, ignore_water=ignore_water)
-                c += road_costs.veg_cost_at(px, py, vegetation_img, ignore_trees=ignore_trees)
+                c = road_costs.terrain_cost_at(px, py, terrain_px, ignore_water=ignore_water)
+                c += road_costs.veg_cost_at(px, py, veg_px, ignore_trees=ignore_trees)
                 # clamp reasonable range and bias to integers
                 grid[gy][gx] = int(max(1.0, min(9999.0, c * 10.0)))
         return grid
 
     def _astar(grid, start, goal, diag=True):
+        """A* with results memoized per (cost grid contents, start, goal, diag)."""
+        cancel.check()
+        if paths is None:
+            return _astar_search(grid, start, goal, diag)
+        key = paths.key(grid, start, goal, diag)
+        cached = paths.get(key)
+        if not path_cache.is_miss(cached):
+            return cached
+        path = _astar_search(grid, start, goal, diag)
+        paths.put(key, path)
+        return path
+
+    def _astar_search(grid, start, goal, diag=True):
         gw, gh = len(grid[0]), len(grid)
         sx, sy = start; gx, gy = goal
         if not (0 <= sx < gw and 0 <= sy < gh and 0 <= gx < gw and 0 <= gy < gh):
@@ -448,11 +498,12 @@ def generate(conf: dict, terrain_img=None, vegetation_img=None):
             edge_pairs.append(((midx, 0), (midx, gh-1)))
         for i in range(2, count_hw):
             # additional random pairs across opposite sides
-            if random.random() < 0.5:
-                sy = random.randint(1, gh-2)
+            hw_rng = _feature_rng(f"highway_{i}")
+            if hw_rng.random() < 0.5:
+                sy = hw_rng.randint(1, gh-2)
                 edge_pairs.append(((0, sy), (gw-1, sy)))
             else:
-                sx = random.randint(1, gw-2)
+                sx = hw_rng.randint(1, gw-2)
                 edge_pairs.append(((sx, 0), (sx, gh-1)))
 
         for (s, g) in edge_pairs:
@@ -468,12 +519,13 @@ def generate(conf: dict, terrain_img=None, vegetation_img=None):
         towns = int(road_conf.get("towns", 1))
         town_block = int(road_conf.get("town_block", 48))
         town_rects = []
-        for _ in range(max(0, towns)):
+        for t in range(max(0, towns)):
             # pick a low-cost center away from edges
+            town_rng = _feature_rng(f"town_{t}")
             best = None; bestc = 1e18
             for _i in range(40):
-                gx = random.randint(gw//5, gw - gw//5)
-                gy = random.randint(gh//5, gh - gh//5)
+                gx = town_rng.randint(gw//5, gw - gw//5)
+                gy = town_rng.randint(gh//5, gh - gh//5)
                 c = cost_grid[gy][gx]
                 if c < bestc:
                     bestc = c; best = (gx, gy)
@@ -502,9 +554,10 @@ def generate(conf: dict, terrain_img=None, vegetation_img=None):
 
         # Farm spurs: pick random grass-ish cells
         farm_spurs = int(road_conf.get("farm_spurs", 12))
-        for _ in range(max(0, farm_spurs)):
-            gx = random.randint(1, gw-2)
-            gy = random.randint(1, gh-2)
+        for f in range(max(0, farm_spurs)):
+            spur_rng = _feature_rng(f"farm_spur_{f}")
+            gx = spur_rng.randint(1, gw-2)
+            gy = spur_rng.randint(1, gh-2)
             # simple heuristic: skip if current cost is high (water)
             if cost_grid[gy][gx] >= 200:
                 continue
@@ -527,7 +580,7 @@ def generate(conf: dict, terrain_img=None, vegetation_img=None):
         # highways from edges
         highways = []
         for _ in range(highways_count):
-            sx, sy, ang = _pick_edge_start(width, height)
+            sx, sy, ang = _pick_edge_start(rng, width, height)
             poly = _make_road(sx, sy, ang, "highway")
             if poly:
                 polylines["highway"].append(poly)
@@ -546,7 +599,7 @@ def generate(conf: dict, terrain_img=None, vegetation_img=None):
         # legacy mode: just spawn totals from edges
         def _spawn_total(n, rtype):
             for _ in range(int(n)):
-                sx, sy, ang = _pick_edge_start(width, height)
+                sx, sy, ang = _pick_edge_start(rng, width, height)
                 poly = _make_road(sx, sy, ang, rtype)
                 if poly:
                     polylines[rtype].append(poly)
@@ -556,28 +609,15 @@ def generate(conf: dict, terrain_img=None, vegetation_img=None):
         _spawn_total(legacy_totals["num_sides"], "side")
 
     # ------------------------------------------------------------------
-    # Draw in Z-order: side -> main -> major -> highway
+    # Stroke widths (drawing happens per cell in roads.rasterize)
     # ------------------------------------------------------------------
-    draw = ImageDraw.Draw(roads_img)
-    for rtype in ("side", "main", "major", "highway"):
-        style = ROAD_STYLES[rtype].copy()
-        style["width"] = int(road_conf.get(f"{rtype}_width_px", style["width"]))
-        for pts in polylines[rtype]:
-            draw.line(pts, fill=style["color"] + (255,), width=style["width"], joint="curve")
-
-    # potholes only on asphalt
-    pothole_density = float(road_conf.get("pothole_density", 0.02))
-    if pothole_density > 0:
-        road_post.apply_potholes_noise_jagged_clipped(
-            roads_img,
-            density=pothole_density,
-            seed=(master_seed + seed_offset * 7) & 0xFFFFFFFF,
-        )
-
-    # sprinkle transitions
-    road_post.sprinkle_dirt_transitions(roads_img)
+    widths = {
+        rtype: int(road_conf.get(f"{rtype}_width_px", style["width"]))
+        for rtype, style in ROAD_STYLES.items()
+    }
 
     # optional dirt path pass
     _ = dirt_paths.generate_paths(width, height, road_conf)
 
-    return roads_img, lots_img
+    road_network = network.build_network(width, height, polylines, widths)
+    return road_network, lots_img
@@ -10,6 +10,8 @@ import random
 from PIL import Image, ImageDraw, ImageChops
 from typing import Optional
 from ..utils import colors as base_colors
+from ..utils import image_utils
+from ..utils import indexed
 
 # road-ish colors we allow potholes on
 ASPHALTS = {
@@ -28,21 +30,15 @@ DIRTLIKE = {
 DARK_POTHOLE = base_colors.VANILLA["dark_pothole"][:3]
 LIGHT_POTHOLE = base_colors.VANILLA["light_pothole"][:3]
 
+# potholes never reach further than this from their centre
+POTHOLE_MAX_RADIUS = 4
+
 
 def _asphalt_mask(road_img: Image.Image) -> Image.Image:
     """
     Build an L mask (0-255) where pixel is one of the asphalt colors.
     """
-    w, h = road_img.size
-    mask = Image.new("L", (w, h), 0)
-    mp = mask.load()
-    rp = road_img.load()
-    for y in range(h):
-        for x in range(w):
-            px = rp[x, y]
-            if len(px) == 4 and px[3] > 0 and px[:3] in ASPHALTS:
-                mp[x, y] = 255
-    return mask
+    return image_utils.color_mask(road_img, ASPHALTS)
 
 
 def apply_potholes_noise_jagged_clipped(road_img: Image.Image, density=0.02, seed=None) -> Image.Image:
@@ -55,37 +51,71 @@ def apply_potholes_noise_jagged_clipped(road_img: Image.Image, density=0.02, see
 
     w, h = road_img.size
     rnd = random.Random(seed) if seed is not None else random
+    return stamp_potholes(road_img, pothole_candidates(rnd, (0, 0, w, h), density))
 
-    asphalt_mask = _asphalt_mask(road_img)
-    layer = Image.new("RGBA", (w, h), (0, 0, 0, 0))
-    d = ImageDraw.Draw(layer)
-    rp = road_img.load()
 
-    num_attempts = int(w * h * density * 0.15)
+def pothole_candidates(rnd, box, density: float) -> list[tuple[int, int, list[tuple[int, int]]]]:
+    """
+    Draw every pothole candidate for `box` (x0, y0, x1, y1) in one batch:
+    [(centre_x, centre_y, polygon points)] in the box's own coordinates.
 
+    Shapes are drawn for every candidate, hit or not, so the sequence only
+    depends on the seed and box; neighbouring cells can regenerate it exactly.
+    """
+    x0, y0, x1, y1 = box
+    num_attempts = int((x1 - x0) * (y1 - y0) * density * 0.15)
+    out = []
     for _ in range(num_attempts):
-        x = rnd.randint(0, w - 1)
-        y = rnd.randint(0, h - 1)
-        base_px = rp[x, y]
-        base_rgb = base_px[:3]
-        if base_rgb not in ASPHALTS:
-            continue
+        x = rnd.randrange(x0, x1)
+        y = rnd.randrange(y0, y1)
+        radius = rnd.randint(2, POTHOLE_MAX_RADIUS)
+        points = [
+            (x + rnd.randint(-radius, radius), y + rnd.randint(-radius, radius))
+            for _ in range(rnd.randint(4, 7))
+        ]
+        out.append((x, y, points))
+    return out
+
+
+def stamp_potholes(road_img: Image.Image, candidates, origin: tuple[int, int] = (0, 0)) -> Image.Image:
+    """
+    Stamp candidates whose centre sits on asphalt onto a single layer, then
+    paste it back clipped to the asphalt mask. `origin` is the world position
+    of road_img's top-left pixel.
+
+    Candidate centres are tested against precomputed dark/light asphalt masks
+    instead of per-pixel reads.
+    """
+    w, h = road_img.size
+    ox, oy = origin
+    dark_mask = image_utils.color_mask(
+        road_img, (base_colors.VANILLA["dark_asphalt"], base_colors.VANILLA["medium_asphalt"])
+    )
+    light_mask = image_utils.color_mask(road_img, (base_colors.VANILLA["light_asphalt"],))
+    asphalt_mask = ImageChops.lighter(dark_mask, light_mask)
+    if asphalt_mask.getbbox() is None:
+        return road_img
 
-        if base_rgb in (base_colors.VANILLA["dark_asphalt"][:3], base_colors.VANILLA["medium_asphalt"][:3]):
+    dark_bytes = dark_mask.tobytes()
+    light_bytes = light_mask.tobytes()
+    layer = Image.new("RGBA", (w, h), (0, 0, 0, 0))
+    d = ImageDraw.Draw(layer)
+
+    for x, y, points in candidates:
+        lx, ly = x - ox, y - oy
+        if not (0 <= lx < w and 0 <= ly < h):
+            continue
+        idx = ly * w + lx
+        if dark_bytes[idx]:
             pothole_col = DARK_POTHOLE
-        else:
+        elif light_bytes[idx]:
             pothole_col = LIGHT_POTHOLE
-
-        points = []
-        radius = rnd.randint(2, 4)
-        for _ in range(rnd.randint(4, 7)):
-            ox = x + rnd.randint(-radius, radius)
-            oy = y + rnd.randint(-radius, radius)
-            points.append((ox, oy))
-        d.polygon(points, fill=pothole_col + (255,))
+        else:
+            continue
+        d.polygon([(px - ox, py - oy) for px, py in points], fill=pothole_col + (255,))
 
     # clip pothole layer to asphalt mask
-    layer_alpha = layer.split()[3]
+    layer_alpha = layer.getchannel("A")
     combined_mask = ImageChops.multiply(layer_alpha, asphalt_mask)
     road_img.paste(layer, (0, 0), combined_mask)
     return road_img
@@ -97,31 +127,33 @@ def add_parking_lot_rect(lots_img: Image.Image, x, y, w, h, color=(255, 0, 0, 25
 
 
 def carve_vegetation_mask(veg_img: Optional[Image.Image], roads_img: Optional[Image.Image],
-                          skip_dirt: bool = True) -> Optional[Image.Image]:
+                          skip_dirt: bool = True, origin: tuple[int, int] = (0, 0)) -> Optional[Image.Image]:
     """
     Remove vegetation where roads are present.
     If skip_dirt=True, don't carve for dirt-like roads.
+
+    The carve mask is (road alpha > 0) minus the dirt-like colour mask and is
+    applied to veg_img in place with a single masked paste. `roads_img` may
+    be one cell of the roads layer placed at `origin`.
     """
     if veg_img is None or roads_img is None:
         return veg_img
 
-    w, h = veg_img.size
-    if roads_img.size != (w, h):
+    ox, oy = origin
+    w, h = roads_img.size
+    if ox + w > veg_img.width or oy + h > veg_img.height or roads_img.mode != "RGBA":
         return veg_img
 
-    none_col = base_colors.VEG["none"]
-    vpx = veg_img.load()
-    rpx = roads_img.load()
-
-    for y in range(h):
-        for x in range(w):
-            r = rpx[x, y]
-            if len(r) == 4 and r[3] > 0:
-                base = r[:3]
-                if skip_dirt and base in DIRTLIKE:
-                    continue
-                vpx[x, y] = none_col
+    carve = image_utils.alpha_mask(roads_img)
+    if skip_dirt:
+        dirt = image_utils.color_mask(roads_img, DIRTLIKE)
+        carve = ImageChops.subtract(carve, dirt)
+    if carve.getbbox() is None:
+        return veg_img
 
+    # palette index on an indexed layer, the colour itself on RGBA
+    fill = indexed.PixelView(veg_img).value(base_colors.VEG["none"])
+    veg_img.paste(fill, (ox, oy, ox + w, oy + h), carve)
     return veg_img
 
 
@@ -129,25 +161,58 @@ def sprinkle_dirt_transitions(roads_img: Image.Image, box=2):
     """
     Where dirt-like roads intersect asphalt roads, sprinkle a bit of dirt.
     This is light and cosmetic.
+
+    Transitions are found with shifted whole-image masks: an interior road
+    pixel qualifies when it is asphalt with a dirt-like 4-neighbour (or the
+    reverse) and its opaque neighbours hold at least two distinct colours.
+    A (2*box+1)-wide dirt strip is then stamped one row below each hit.
     """
     w, h = roads_img.size
-    px = roads_img.load()
-
-    for y in range(1, h - 1):
-        for x in range(1, w - 1):
-            here = px[x, y]
-            if here[3] == 0:
-                continue
-
-            base = here[:3]
-            neigh = [px[x - 1, y], px[x + 1, y], px[x, y - 1], px[x, y + 1]]
-            colors = {n[:3] for n in neigh if n[3] > 0}
-            if len(colors) >= 2:
-                if (base in ASPHALTS and any((n[:3] in DIRTLIKE) for n in neigh if n[3] > 0)) or \
-                   (base in DIRTLIKE and any((n[:3] in ASPHALTS) for n in neigh if n[3] > 0)):
-                    dirt_col = base_colors.VANILLA["dirt"][:3]
-                    for dx in range(-box, box + 1):
-                        xx = x + dx
-                        yy = y + 1
-                        if 0 <= xx < w and 0 <= yy < h:
-                            px[xx, yy] = dirt_col + (255,)
+    if w < 3 or h < 3:
+        return roads_img
+
+    asphalt = image_utils.color_mask(roads_img, ASPHALTS)
+    dirtlike = image_utils.color_mask(roads_img, DIRTLIKE)
+    if asphalt.getbbox() is None or dirtlike.getbbox() is None:
+        return roads_img
+
+    opaque = image_utils.alpha_mask(roads_img)
+    # neighbour (x+dx, y+dy) moved onto (x, y)
+    offsets = ((-1, 0), (1, 0), (0, -1), (0, 1))
+    near_dirt = image_utils.any_mask((image_utils.shift_image(dirtlike, -dx, -dy) for dx, dy in offsets), (w, h))
+    near_asphalt = image_utils.any_mask((image_utils.shift_image(asphalt, -dx, -dy) for dx, dy in offsets), (w, h))
+    hits = ImageChops.lighter(
+        ImageChops.darker(asphalt, near_dirt),
+        ImageChops.darker(dirtlike, near_asphalt),
+    )
+    if hits.getbbox() is None:
+        return roads_img
+
+    # at least two distinct colours among the opaque neighbours; only the
+    # area around candidate hits (plus their neighbours) needs checking
+    x0, y0, x1, y1 = hits.getbbox()
+    region = (max(0, x0 - 1), max(0, y0 - 1), min(w, x1 + 1), min(h, y1 + 1))
+    roads_crop = roads_img.crop(region)
+    opaque_crop = opaque.crop(region)
+    neigh_rgb = [image_utils.shift_image(roads_crop, -dx, -dy) for dx, dy in offsets]
+    neigh_opaque = [image_utils.shift_image(opaque_crop, -dx, -dy) for dx, dy in offsets]
+    pairs = []
+    for i in range(len(offsets)):
+        for j in range(i + 1, len(offsets)):
+            both = ImageChops.darker(neigh_opaque[i], neigh_opaque[j])
+            pairs.append(ImageChops.darker(both, image_utils.rgb_differs_mask(neigh_rgb[i], neigh_rgb[j])))
+    distinct = Image.new("L", (w, h), 0)
+    distinct.paste(image_utils.any_mask(pairs, roads_crop.size), region[:2])
+    hits = ImageChops.darker(hits, distinct)
+
+    # interior pixels only
+    ImageDraw.Draw(hits).rectangle([0, 0, w - 1, h - 1], outline=0)
+    if hits.getbbox() is None:
+        return roads_img
+
+    stamp = image_utils.any_mask(
+        (image_utils.shift_image(hits, dx, 1) for dx in range(-box, box + 1)), (w, h)
+    )
+    dirt_col = base_colors.VANILLA["dirt"][:3]
+    roads_img.paste(dirt_col + (255,), (0, 0, w, h), stamp)
+    return roads_img
@@ -0,0 +1,270 @@
+# zomboid_map_gen/server.py
+"""
+Warm headless generation daemon.
+
+Keeps one process alive with the worker pool started, Pillow and the
+pipeline imported, and the in-process caches (Rules.txt palette, TBX
+catalog index, road path cache) filled, so build scripts and editor plugins
+pay none of that per request.
+
+Run with:
+    python -m zomboid_map_gen.server [--port 8765] [--workers N] [--config warm.json]
+
+Local HTTP API (127.0.0.1 by default):
+    GET  /health               -> {"ok": true, "busy": bool, "requests": n}
+    POST /generate             body: {"config": {...} | "config_path": "...", "overrides": {"a.b": v}}
+    POST /preview              body: as /generate, plus "cell_x", "cell_y", "lowres" (factor, optional)
+    POST /tiles                body: as /generate, plus "prefix", "tiles_root" (optional)
+
+POST bodies must be sent as Content-Type: application/json, and requests
+whose Host or Origin names another machine are refused (403), so a web page
+open in a browser can't drive the server by a form post or DNS rebinding.
+Binding --host to a non-local address adds that address to the allowed
+hosts.
+
+POST replies stream newline-delimited JSON events as the run goes:
+    {"event": "queued"} {"event": "started"} {"event": "stage", "stage": "terrain"}
+    {"event": "progress", "done": 3, "total": 16}      (tiles)
+    {"event": "lowres_ready", "path": "..."}          (preview with "lowres": the
+                                                       quick pass, saved as preview_lowres.png)
+    {"event": "done", "seconds": 4.2, "output_dir": "...", "outputs": [...]}
+    {"event": "error", "error": "..."}
+Runs are served one at a time (they share the whole pool); a client that
+disconnects cancels its run.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable
+from urllib.parse import urlsplit
+
+from . import batch
+from . import config as cfg
+from . import core
+from .export import encoding
+from .lots import prototype as lots_prototype
+from .utils import cancel, parallel
+from .utils import rules_palette
+
+DEFAULT_PORT = 8765
+LOWRES_PREVIEW = "preview_lowres.png"
+
+_LOCAL_HOSTS = frozenset({"localhost", "127.0.0.1", "::1"})
+
+
+class GenerationServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int]):
+        super().__init__(address, _Handler)
+        self.run_lock = threading.Lock()
+        self.requests_served = 0
+        # names a request may address this server by (Host / Origin)
+        self.allowed_hosts = set(_LOCAL_HOSTS)
+        if address[0] not in ("", "0.0.0.0", "::"):
+            self.allowed_hosts.add(address[0].lower())
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: GenerationServer
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/health":
+            self._reply_json(HTTPStatus.NOT_FOUND, {"error": f"unknown path {self.path}"})
+            return
+        self._reply_json(HTTPStatus.OK, {
+            "ok": True,
+            "busy": self.server.run_lock.locked(),
+            "requests": self.server.requests_served,
+        })
+
+    def do_POST(self):
+        action = _ACTIONS.get(self.path.rstrip("/"))
+        if action is None:
+            self._reply_json(HTTPStatus.NOT_FOUND, {"error": f"unknown path {self.path}"})
+            return
+        refusal = self._refusal()
+        if refusal is not None:
+            self._reply_json(*refusal)
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            conf = _request_config(body)
+        except (OSError, ValueError, TypeError) as exc:
+            self._reply_json(HTTPStatus.BAD_REQUEST, {"error": str(exc)})
+            return
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        token = cancel.CancelToken()
+
+        def emit(event: str, **data: Any) -> None:
+            try:
+                self.wfile.write(json.dumps({"event": event, **data}).encode("utf-8") + b"\n")
+                self.wfile.flush()
+            except OSError:
+                # client went away: stop working on its behalf
+                token.cancel()
+
+        emit("queued")
+        with self.server.run_lock:
+            if token.cancelled:
+                return
+            emit("started")
+            start = time.perf_counter()
+            try:
+                with cancel.scope(token):
+                    result = action(conf, body, emit)
+            except cancel.Cancelled:
+                return
+            except Exception as exc:
+                emit("error", error=f"{type(exc).__name__}: {exc}")
+                return
+            finally:
+                self.server.requests_served += 1
+            emit("done", seconds=round(time.perf_counter() - start, 3), **result)
+
+    def _refusal(self) -> tuple[HTTPStatus, dict] | None:
+        """Why a POST must not run (status, payload), or None when it may."""
+        content_type = (self.headers.get("Content-Type") or "").split(";", 1)[0].strip().lower()
+        if content_type != "application/json":
+            return HTTPStatus.UNSUPPORTED_MEDIA_TYPE, {"error": "POST body must be application/json"}
+        host = _hostname("//" + (self.headers.get("Host") or ""))
+        if host not in self.server.allowed_hosts:
+            return HTTPStatus.FORBIDDEN, {"error": f"host not allowed: {host}"}
+        origin = self.headers.get("Origin")
+        if origin is not None and _hostname(origin) not in self.server.allowed_hosts:
+            return HTTPStatus.FORBIDDEN, {"error": f"origin not allowed: {origin}"}
+        return None
+
+    def _reply_json(self, status: HTTPStatus, payload: dict) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        print(f"[ZOMBOID-MAP-GEN] server: {format % args}")
+
+
+def _hostname(url: str) -> str | None:
+    try:
+        return urlsplit(url).hostname
+    except ValueError:
+        return None
+
+
+def _request_config(body: dict) -> dict:
+    if "config" in body:
+        conf = body["config"]
+        if not isinstance(conf, dict):
+            raise ValueError("'config' must be a JSON object")
+        conf = json.loads(json.dumps(conf))
+    elif body.get("config_path"):
+        conf = cfg.load_config(body["config_path"])
+    else:
+        conf = cfg.default_config()
+    for path, value in (body.get("overrides") or {}).items():
+        batch.set_path(conf, path, value)
+    return conf
+
+
+def _outputs(out_dir: Path) -> dict:
+    files = sorted(str(p) for p in out_dir.iterdir() if p.is_file()) if out_dir.exists() else []
+    return {"output_dir": str(out_dir), "outputs": files}
+
+
+def _generate(conf: dict, body: dict, emit: Callable[..., None]) -> dict:
+    core.generate_from_config(conf, on_stage=lambda name: emit("stage", stage=name))
+    return _outputs(Path(conf.get("output_dir", "output")))
+
+
+def _preview(conf: dict, body: dict, emit: Callable[..., None]) -> dict:
+    cx, cy = int(body.get("cell_x", 0)), int(body.get("cell_y", 0))
+    if body.get("lowres"):
+        emit("stage", stage="lowres")
+        quick = core.generate_lowres_preview(conf, cx, cy, int(body["lowres"]))
+        path = None
+        if quick["combined"] is not None:
+            out_dir = Path(conf.get("output_dir", "output"))
+            out_dir.mkdir(parents=True, exist_ok=True)
+            path = out_dir / LOWRES_PREVIEW
+            encoding.save_png(quick["combined"], path, encoding.profile_name(conf.get("export", {})))
+        emit("lowres_ready", path=str(path) if path is not None else None)
+    core.generate_preview_from_config(conf, cx, cy, on_stage=lambda name: emit("stage", stage=name))
+    return _outputs(Path(conf.get("output_dir", "output")))
+
+
+def _tiles(conf: dict, body: dict, emit: Callable[..., None]) -> dict:
+    prefix = body.get("prefix") or conf.get("export", {}).get("tile_prefix", "tiles")
+    tiles_root = core.generate_tiles(
+        conf, prefix,
+        progress=lambda done, total: emit("progress", done=done, total=total),
+        tile_root_override=Path(body["tiles_root"]) if body.get("tiles_root") else None,
+        on_stage=lambda name: emit("stage", stage=name),
+    )
+    return {"output_dir": str(conf.get("output_dir", "output")), "tiles_root": str(tiles_root)}
+
+
+_ACTIONS: dict[str, Callable[[dict, dict, Callable[..., None]], dict]] = {
+    "/generate": _generate,
+    "/preview": _preview,
+    "/tiles": _tiles,
+}
+
+
+def warm_up(conf: dict, workers: int | None = None) -> None:
+    """Start the shared pool and fill the per-process caches a first run would."""
+    workers = workers or parallel.cpu_count()
+    pool = parallel.start_shared_pool(workers)
+    # spawn the workers now rather than on the first request
+    for fut in [pool.submit(parallel.cpu_count) for _ in range(workers)]:
+        fut.result()
+    rules_path = rules_palette.get_rules_file(conf)
+    if rules_path:
+        rules_palette.load_rules_colors(rules_path)
+    proto_conf = (conf.get("lots", {}) or {}).get("prototype", {}) or {}
+    if proto_conf.get("enabled", False):
+        lots_prototype.load_asset_catalog(proto_conf)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm Project Zomboid map generation server")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Interface to bind (default: localhost only).")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, help="Worker processes in the shared pool (default: CPU count).")
+    parser.add_argument("--config", type=str, help="Config used to warm the caches (default config otherwise).")
+    args = parser.parse_args()
+
+    conf = cfg.load_config(args.config) if args.config else cfg.default_config()
+    print("[ZOMBOID-MAP-GEN] server: warming up...")
+    warm_up(conf, args.workers)
+    server = GenerationServer((args.host, args.port))
+    print(f"[ZOMBOID-MAP-GEN] server: listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        parallel.shutdown_shared_pool()
+
+
+if __name__ == "__main__":
+    main()
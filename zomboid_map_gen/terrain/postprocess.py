@@ -5,12 +5,13 @@ Terrain post-processing passes:
 - speckle: add small patches of other vanilla colors to reduce sameness
 - erosion: push dirt/sand/dirt-grass into transition areas
 
-All passes stay within the user's vanilla color set.
+All passes stay within the user's vanilla color set. They read and paint
+through utils.indexed.PixelView, so an indexed terrain stays indexed.
 """
 
 from PIL import Image
 import random
-from ..utils import colors as base_colors
+from ..utils import cancel, indexed, colors as base_colors
 
 # unpack palette
 WATER        = base_colors.VANILLA["water"][:3]
@@ -23,17 +24,17 @@ SAND         = base_colors.VANILLA["sand"][:3]
 GRAVEL_DIRT  = base_colors.VANILLA["gravel_dirt"][:3]
 
 
-def _get_neighbors(img, x, y):
-    w, h = img.size
+def _get_neighbors(src, x, y):
+    w, h = src.size
     neigh = []
     if x > 0:
-        neigh.append(img.getpixel((x - 1, y))[:3])
+        neigh.append(src[x - 1, y][:3])
     if x < w - 1:
-        neigh.append(img.getpixel((x + 1, y))[:3])
+        neigh.append(src[x + 1, y][:3])
     if y > 0:
-        neigh.append(img.getpixel((x, y - 1))[:3])
+        neigh.append(src[x, y - 1][:3])
     if y < h - 1:
-        neigh.append(img.getpixel((x, y + 1))[:3])
+        neigh.append(src[x, y + 1][:3])
     return neigh
 
 
@@ -46,13 +47,13 @@ def edge_ragging(img: Image.Image, strength: float = 0.5, rnd: random.Random | N
     Break up clean edges by letting neighbor colors invade.
     """
     w, h = img.size
-    src = img
+    src = indexed.PixelView(img)
     out = img.copy()
-    px = out.load()
+    px = indexed.PixelView(out)
 
     for y in range(h):
         for x in range(w):
-            here = src.getpixel((x, y))[:3]
+            here = src[x, y][:3]
             neigh = _get_neighbors(src, x, y)
             # boundary: neighboring pixel is very different
             boundary_neighbors = [n for n in neigh if _color_dist(here, n) > 25]
@@ -61,7 +62,7 @@ def edge_ragging(img: Image.Image, strength: float = 0.5, rnd: random.Random | N
 
             r = rnd.random() if rnd else random.random()
             if r < strength * 0.6:
-                new_col = random.choice(boundary_neighbors)
+                new_col = (rnd or random).choice(boundary_neighbors)
                 px[x, y] = new_col + (255,)
 
     return out
@@ -73,7 +74,7 @@ def speckle(img: Image.Image, density: float = 0.01, rnd: random.Random | None =
     """
     w, h = img.size
     out = img.copy()
-    px = out.load()
+    px = indexed.PixelView(out)
 
     # don't speckle water, but we can speckle grass/dirt/sand
     candidates = [
@@ -115,13 +116,13 @@ def erosion(img: Image.Image, strength: float = 0.5, rnd: random.Random | None =
     - mixed terrain edges -> dirt or dirt grass
     """
     w, h = img.size
-    src = img
+    src = indexed.PixelView(img)
     out = img.copy()
-    px = out.load()
+    px = indexed.PixelView(out)
 
     for y in range(h):
         for x in range(w):
-            here = src.getpixel((x, y))[:3]
+            here = src[x, y][:3]
             neigh = _get_neighbors(src, x, y)
 
             # near water -> sand
@@ -245,10 +246,12 @@ def apply_all(img: Image.Image, conf: dict) -> Image.Image:
         es = float(edge_strength) if edge_strength is not None else (0.35 + 0.45 * overall)
         es = max(0.0, min(1.0, es))
         out = edge_ragging(out, strength=es, rnd=rnd)
+    cancel.check()
     if speckle_on:
         dens = float(speckle_density) if speckle_density is not None else (0.004 + 0.02 * overall)
         dens = max(0.0, dens)
         out = speckle(out, density=dens, rnd=rnd)
+    cancel.check()
     if erosion_on:
         er = float(erosion_strength) if erosion_strength is not None else (0.35 + 0.45 * overall)
         er = max(0.0, min(1.0, er))
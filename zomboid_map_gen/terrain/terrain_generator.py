@@ -9,13 +9,14 @@ Features:
   (b) explicit layer list in config["terrain"]["layers"] (layer mode)
 - uses per-layer noise from utils.noise_utils
 - applies postprocess passes at the end
+- paints a palette-indexed ("P") image (see utils.indexed)
 """
 
 from PIL import Image
 import math
 
-from ..utils import noise_utils, colors as base_colors, seeds as seed_utils
-from ..utils.parallel import split_range, run_process_map, cpu_count
+from ..utils import cancel, indexed, noise_utils, colors as base_colors, seeds as seed_utils
+from ..utils.parallel import abandoned, split_range, run_process_map, cpu_count
 from . import presets, postprocess
 
 
@@ -38,6 +39,8 @@ def _noise_chunk_simple_worker(x0: int, x1: int, width: int, height: int,
     cy = height / 2.0
     if (rot % 360) == 0 and offx == 0 and offy == 0:
         for x in range(x0, x1):
+            if abandoned():  # run cancelled; the result is discarded
+                break
             for y in range(height):
                 v = noise_utils.perlin2(x, y, scale=scale, octaves=octaves,
                                         persistence=persistence, lacunarity=lacunarity, seed=seed)
@@ -46,6 +49,8 @@ def _noise_chunk_simple_worker(x0: int, x1: int, width: int, height: int,
         ang = math.radians(rot)
         ca, sa = math.cos(ang), math.sin(ang)
         for x in range(x0, x1):
+            if abandoned():  # run cancelled; the result is discarded
+                break
             rx = x - cx
             for y in range(height):
                 ry = y - cy
@@ -70,6 +75,8 @@ def _noise_chunk_layer_worker(x0: int, x1: int, width: int, height: int,
     ca, sa = math.cos(ang), math.sin(ang)
     use_tr = (rot % 360) != 0 or offx != 0 or offy != 0
     for x in range(x0, x1):
+        if abandoned():  # run cancelled; the result is discarded
+            break
         rx = x - cx
         for y in range(height):
             if use_tr:
@@ -119,7 +126,12 @@ def _generate_simple(conf: dict, width: int, height: int) -> Image.Image:
     dirt = base_colors.VANILLA["dirt"][:3]
     sand = base_colors.VANILLA["sand"][:3]
 
-    img = Image.new("RGB", (width, height))
+    img = indexed.new((width, height), water)
+    view = indexed.PixelView(img)
+    water, dark_grass, med_grass, light_grass, dirt, sand = (
+        view.value(c) for c in (water, dark_grass, med_grass, light_grass, dirt, sand)
+    )
+    px = img.load()
 
     # Compute the noise field once, in parallel stripes across X.
     rot = float(conf.get("terrain", {}).get("transform", {}).get("rotation", 0.0))
@@ -160,9 +172,9 @@ def _generate_simple(conf: dict, width: int, height: int) -> Image.Image:
             else:
                 c = sand
 
-            img.putpixel((x, y), c)
+            px[x, y] = c
 
-    return img.convert("RGBA")
+    return img
 
 
 def _generate_layers(conf: dict, width: int, height: int) -> Image.Image:
@@ -230,12 +242,15 @@ def _generate_layers(conf: dict, width: int, height: int) -> Image.Image:
         vmaxs.append(vmax)
 
     # now actually paint
-    img = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    img = indexed.new((width, height))
+    view = indexed.PixelView(img)
+    px = img.load()
 
     # We'll keep a separate coverage mask if later we want "linked thresholds"
     for li, layer in enumerate(layers):
-        color = tuple(layer.get("color", (255, 0, 255, 255)))
+        color = view.value(layer.get("color", (255, 0, 255, 255)))
         threshold = float(layer.get("threshold", 0.5))
+        cancel.check()
         vals = layer_noises[li]
         vmin = vmins[li]
         vmax = vmaxs[li]
@@ -247,7 +262,7 @@ def _generate_layers(conf: dict, width: int, height: int) -> Image.Image:
                 v = (vals[i] - vmin) / vrange
                 i += 1
                 if v >= threshold:
-                    img.putpixel((x, y), color)
+                    px[x, y] = color
 
     return img
 
@@ -286,6 +301,7 @@ def generate(conf: dict):
         img = _generate_simple(conf, width, height)
 
     # postprocess (erosion, speckle, edge rag)
+    cancel.check()
     img = postprocess.apply_all(img, conf)
     return img
 
@@ -1,18 +1,19 @@
-﻿import io
+﻿from __future__ import annotations
+
+import io
 import json
 import os
-import shutil
 import sys
 import tempfile
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from pathlib import Path
-from PIL import Image, ImageTk, ImageEnhance
 import threading
 
-from .. import core, config as cfg
-from ..worlded import launch_worlded, prepare_project, project_dir_for
+from .. import config as cfg
+from ..utils import cancel
+from ..utils.lazy import lazy_import
 from .sound import SoundPlayer
 from .terrain_gui import TerrainTab
 from .vegetation_gui import VegetationTab
@@ -22,6 +23,15 @@ from .export_gui import ExportTab
 from .details_gui import DetailsTab
 from .tmx_tools import TmxReadWindow
 
+# Pillow, the pipeline and the WorldEd bridge load on first use, after the
+# window is up
+Image = lazy_import("PIL.Image")
+ImageTk = lazy_import("PIL.ImageTk")
+ImageEnhance = lazy_import("PIL.ImageEnhance")
+core = lazy_import("..core", __package__)
+raster_store = lazy_import("..utils.raster_store", __package__)
+worlded = lazy_import("..worlded", __package__)
+
 
 THUMB_SIZE = (300, 300)   # larger thumbnails, keep aspect via .thumbnail
 THUMB_BG = "#1b1b1b"
@@ -41,6 +51,16 @@ DEFAULT_PRESETS = [
 ]
 
 
+# thumbnail key -> stage store entry holding the same layer
+STORE_THUMB_LAYERS = {
+    "terrain": "final_terrain",
+    "vegetation": "final_vegetation",
+    "combo": "combined",
+    "roads": "roads",
+    "lots": "lots",
+    "details": "final_details",
+}
+
 THUMB_KEYS = [
     ("terrain", "Terrain"),
     ("vegetation", "Vegetation"),
@@ -119,6 +139,9 @@ class InfinitXYZApp(tk.Tk):
         self._regen_after_id = None
         self._regen_delay_ms = 250
         self._busy = False
+        self._busy_full = False
+        self._regen_pending = False
+        self._cancel_token: cancel.CancelToken | None = None
         self._gen_thread = None
         self._latest_pzw: Path | None = None
         self._roads_grid_thread: threading.Thread | None = None
@@ -446,32 +469,28 @@ class InfinitXYZApp(tk.Tk):
         self._set_worlded_result(None)
         world_conf = self.conf.get("worlded", {}) or {}
         project_name = world_conf.get("default_project_name") or self.conf.get("export", {}).get("tile_prefix", "map")
-        project_dir = project_dir_for(self.conf, project_name)
+        project_dir = worlded.project_dir_for(self.conf, project_name)
         project_dir.parent.mkdir(parents=True, exist_ok=True)
-        images_root = project_dir / "images"
-        shutil.rmtree(images_root, ignore_errors=True)
-
 
+        # tiles go to the normal export folder; prepare_project syncs only the
+        # changed ones into the project
         def after_generate(conf_snapshot):
             world_conf_snapshot = conf_snapshot.get("worlded", {}) or {}
-            project = prepare_project(
-                conf_snapshot,
-                project_name=project_name,
-                tiles_root_override=images_root,
-                reuse_tiles=True,
-            )
+            project = worlded.prepare_project(conf_snapshot, project_name=project_name)
             auto_launch = bool(world_conf_snapshot.get("auto_launch")) and world_conf_snapshot.get("worlded_exe")
             launch_note = ""
             if auto_launch:
                 try:
-                    launch_worlded(project, world_conf_snapshot)
+                    worlded.launch_worlded(project, world_conf_snapshot)
                     launch_note = " (WorldEd launched)"
                 except Exception as exc:
                     launch_note = f" (auto-launch failed: {exc})"
-            message = f"WorldEd project ready: {project.project_dir}{launch_note}"
+            sync = project.sync
+            sync_note = f" ({sync.get('placed', 0)} files updated, {sync.get('unchanged', 0)} unchanged)"
+            message = f"WorldEd project ready: {project.project_dir}{sync_note}{launch_note}"
             return {"message": message, "project_dir": str(project.project_dir), "pzw": str(project.pzw_path)}
 
-        self._start_generation(full=True, after_generate=after_generate, tiles_root_override=images_root)
+        self._start_generation(full=True, after_generate=after_generate)
 
     def _open_worlded_file(self):
         if not self._latest_pzw:
@@ -507,8 +526,13 @@ class InfinitXYZApp(tk.Tk):
     def _start_generation(self, full: bool, after_generate=None, *, tiles_root_override: Path | None = None):
 
         if self._busy:
-
-            return
+            if self._busy_full:
+                if not full:
+                    # rerun once the export finishes so the latest values get a preview
+                    self._regen_pending = True
+                return
+            # a newer request supersedes the running preview
+            self._cancel_token.cancel()
 
         px = max(0, int(self.var_prev_x.get()))
 
@@ -520,6 +544,9 @@ class InfinitXYZApp(tk.Tk):
             self.sound.generate_started()
 
         self._busy = True
+        self._busy_full = full
+        token = cancel.CancelToken()
+        self._cancel_token = token
 
         if not full:
             status_text = "Generating preview..." if preview_on else "Preview disabled."
@@ -558,25 +585,40 @@ class InfinitXYZApp(tk.Tk):
 
         after_result = {}
 
+        # runs share module state (palette overrides, tracer, profiler, stage
+        # store), so a superseding run starts once the cancelled one has unwound
+        previous = self._gen_thread
+
         def worker():
 
+            if previous is not None:
+                previous.join()
+
             try:
 
-                if full:
-                    core.generate_tiles(conf_copy, tile_prefix, progress=report_callback,
-                                        tile_root_override=tiles_root_override)
-                    if after_generate:
-                        result_payload = after_generate(conf_copy)
-                        if isinstance(result_payload, dict):
-                            after_result.update(result_payload)
-                        elif result_payload is not None:
-                            after_result["message"] = str(result_payload)
-                else:
+                with cancel.scope(token):
+                    if full:
+                        core.generate_tiles(conf_copy, tile_prefix, progress=report_callback,
+                                            tile_root_override=tiles_root_override)
+                        if after_generate:
+                            result_payload = after_generate(conf_copy)
+                            if isinstance(result_payload, dict):
+                                after_result.update(result_payload)
+                            elif result_payload is not None:
+                                after_result["message"] = str(result_payload)
+                    else:
 
-                    if preview_on:
-                        core.generate_preview_from_config(conf_copy, px, py)
+                        if preview_on:
+                            prev_conf = conf_copy.get("preview", {}) or {}
+                            if prev_conf.get("progressive", True):
+                                quick = core.generate_lowres_preview(conf_copy, px, py,
+                                                                     int(prev_conf.get("lowres_factor", 4)))
+                                self.after(0, lambda: self._show_quick_preview(quick, token))
+                            core.generate_preview_from_config(conf_copy, px, py)
 
                 def on_complete():
+                    if token.cancelled:
+                        return
 
                     if progress_popup:
 
@@ -607,6 +649,10 @@ class InfinitXYZApp(tk.Tk):
 
                 self.after(0, on_complete)
 
+            except cancel.Cancelled:
+                # superseded by a newer request; that run reports instead
+                pass
+
             except Exception as e:
                 err_msg = str(e)
 
@@ -626,7 +672,7 @@ class InfinitXYZApp(tk.Tk):
 
             finally:
 
-                self.after(0, lambda: setattr(self, "_busy", False))
+                self.after(0, lambda: self._generation_finished(token))
 
         t = threading.Thread(target=worker, daemon=True)
 
@@ -634,6 +680,14 @@ class InfinitXYZApp(tk.Tk):
 
         t.start()
 
+    def _generation_finished(self, token):
+        if token is not self._cancel_token:
+            return  # a cancelled run unwinding after its replacement started
+        self._busy = False
+        if self._regen_pending:
+            self._regen_pending = False
+            self._schedule_regen()
+
     def _preview_enabled(self) -> bool:
         return bool(self.conf.get("preview", {}).get("enabled", True))
 
@@ -706,17 +760,37 @@ class InfinitXYZApp(tk.Tk):
             self._apply_thumb_dim(key, path)
             return
         lbl.configure(bg=THUMB_BG)
-        if not path or not path.exists():
-            lbl.configure(image="")
-            self._thumb_imgs[key] = None
-            self._thumb_last_paths[key] = path
-            return
-        img = self._open_image_fresh(path)
+        img = self._store_image(key)
+        if img is None:
+            if not path or not path.exists():
+                lbl.configure(image="")
+                self._thumb_imgs[key] = None
+                self._thumb_last_paths[key] = path
+                return
+            img = self._open_image_fresh(path)
+        self._set_thumb_image(key, img)
+        self._thumb_last_paths[key] = path
+
+    def _set_thumb_image(self, key, img: Image.Image):
+        # indexed layers: resample and display in RGBA
+        img = img.convert("RGBA") if img.mode == "P" else img.copy()
         img.thumbnail(THUMB_SIZE, Image.LANCZOS)
         imgtk = ImageTk.PhotoImage(img)
-        lbl.configure(image=imgtk)
+        self._thumb_labels[key].configure(image=imgtk)
         self._thumb_imgs[key] = imgtk
-        self._thumb_last_paths[key] = path
+
+    def _show_quick_preview(self, layers: dict, token):
+        # low-res pass: shown at once, replaced by _update_thumbs when the full pass lands.
+        # It has no roads, so the "Terrain + Roads" thumb waits for the full pass
+        if token.cancelled:
+            return
+        for key in ("terrain", "vegetation"):
+            img = layers.get(key)
+            if img is None or key not in self._thumb_labels or not self._preview_thumb_enabled(key):
+                continue
+            self._thumb_labels[key].configure(bg=THUMB_BG)
+            self._set_thumb_image(key, img)
+        self.status_var.set("Refining preview...")
 
     def _update_thumbs(self):
         t_path, v_path, r_path, c_path, l_path, d_path = self._paths()
@@ -769,11 +843,20 @@ class InfinitXYZApp(tk.Tk):
         img = ImageEnhance.Color(img).enhance(0.25)
         return ImageTk.PhotoImage(img)
 
+    def _store_image(self, key: str) -> Image.Image | None:
+        # raw stage rasters skip the PNG decode when the stage store is on
+        store = raster_store.store_for(self.conf)
+        name = STORE_THUMB_LAYERS.get(key)
+        if store is None or not name:
+            return None
+        return store.get(name)
+
     def _open_image_fresh(self, path: Path) -> Image.Image:
         # avoid stale handles/caching
         with Image.open(path) as im:
             im.load()
-            return im.copy()
+            # palette PNGs (terrain/vegetation) are shown, filtered and thumbnailed in RGBA
+            return im.convert("RGBA") if im.mode == "P" else im.copy()
 
     def _animate_preview_fade(self):
         # Fade the combined preview image if available
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import threading
 from pathlib import Path
 from typing import Dict
 
@@ -19,7 +20,12 @@ MUSIC_EXTS = {".wav", ".mp3"}
 
 
 class SoundPlayer:
-    """Cross-platform sound & music helper used by the GUI."""
+    """Cross-platform sound & music helper used by the GUI.
+
+    pygame and the sound files load on a background thread so the window
+    paints without waiting for the mixer; until then sound effects are
+    skipped and music starts once loading finishes.
+    """
 
     def __init__(self, project_root: Path, conf: dict):
         self.conf = conf
@@ -28,7 +34,7 @@ class SoundPlayer:
         self.music = sound_root / "music"
 
         self.paths: Dict[str, Path] = {}
-        # self.sounds: Dict[str, "pygame.mixer.Sound"] = {}
+        self.sounds: Dict[str, "pygame.mixer.Sound"] = {}
         self.music_tracks: list[Path] = []
         self._pygame = None
         self._winsound = None
@@ -36,10 +42,18 @@ class SoundPlayer:
         self._waiting_music = False
         self._drone_played = False
         self._music_index = 0
+        self._music_lock = threading.Lock()
+        self._ready = threading.Event()
+
+        self.sync_settings()
+        threading.Thread(target=self._init_background, name="sound-init", daemon=True).start()
 
+    def _init_background(self):
         self._init_audio()
         self._load_sfx()
         self._load_music()
+        self._ready.set()
+        # apply whatever the settings are by now
         self.sync_settings()
 
     def _find_sound_root(self, project_root: Path) -> Path:
@@ -89,7 +103,7 @@ class SoundPlayer:
         audio.setdefault("enabled", True)
         audio.setdefault("music_mode", "always")
         audio.setdefault("music_volume_db", -12.0)
-        if self._pygame:
+        if self._ready.is_set() and self._pygame:
             self._set_music_volume()
         self._maybe_update_music()
 
@@ -115,7 +129,7 @@ class SoundPlayer:
             pass
 
     def _play_sfx(self, key: str):
-        if not self._sound_enabled():
+        if not self._ready.is_set() or not self._sound_enabled():
             return
         if self._pygame and key in self.sounds:
             try:
@@ -188,13 +202,14 @@ class SoundPlayer:
         return False
 
     def _maybe_update_music(self):
-        if not self._pygame or not self.music_tracks:
+        if not self._ready.is_set() or not self._pygame or not self.music_tracks:
             return
-        should = self._should_play_music()
-        if should and not self._music_playing:
-            self._start_music_loop()
-        elif not should and self._music_playing:
-            self._stop_music()
+        with self._music_lock:
+            should = self._should_play_music()
+            if should and not self._music_playing:
+                self._start_music_loop()
+            elif not should and self._music_playing:
+                self._stop_music()
 
     def _start_music_loop(self):
         if not self.music_tracks:
@@ -1,3 +1,5 @@
+from __future__ import annotations
+
 import base64
 import struct
 import zlib
@@ -7,7 +9,10 @@ from dataclasses import dataclass
 from pathlib import Path
 import tkinter as tk
 
-from PIL import Image, ImageTk
+from ..utils.lazy import lazy_import
+
+Image = lazy_import("PIL.Image")
+ImageTk = lazy_import("PIL.ImageTk")
 
 
 COLOR_MAP = {
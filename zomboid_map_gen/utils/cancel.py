@@ -0,0 +1,61 @@
+"""
+Cooperative cancellation for generation runs.
+
+A CancelToken is made per run and installed for the running thread with
+`scope(token)`. Pipeline code calls `check()` at safe points (between stages,
+between layers, while waiting on pool chunks); once the token is cancelled,
+check() raises Cancelled and the run unwinds without writing further output.
+Process pools started inside a scope also get a cross-process flag, so pool
+workers can abandon their chunks (see parallel.abandoned).
+"""
+
+from __future__ import annotations
+
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class Cancelled(Exception):
+    """Raised at a check point after the run's token was cancelled."""
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self) -> None:
+        if self._event.is_set():
+            raise Cancelled()
+
+
+_current: contextvars.ContextVar[CancelToken | None] = contextvars.ContextVar("zmg_cancel_token", default=None)
+
+
+def current() -> CancelToken | None:
+    return _current.get()
+
+
+@contextmanager
+def scope(token: CancelToken | None) -> Iterator[CancelToken | None]:
+    """Make `token` the current one for code run in this block (this thread)."""
+    reset = _current.set(token)
+    try:
+        yield token
+    finally:
+        _current.reset(reset)
+
+
+def check() -> None:
+    """Raise Cancelled if the current run has been cancelled; no-op outside a scope."""
+    token = _current.get()
+    if token is not None:
+        token.check()
@@ -2,12 +2,21 @@
 """
 Image creation/compositing helpers.
 Wraps Pillow so other modules don't have to import it directly.
+
+The mask helpers below work on whole bands at once (Image.point / ImageChops),
+so per-pixel colour tests run in Pillow's C loops instead of Python.
 """
 
 try:
-    from PIL import Image
+    from PIL import Image, ImageChops
+    from . import indexed
 except ImportError:
     Image = None
+    ImageChops = None
+    indexed = None
+
+
+_NONZERO_LUT = [0] + [255] * 255
 
 
 def create_rgba(width: int, height: int, color=(0, 0, 0, 0)):
@@ -27,3 +36,127 @@ def composite_under(base, overlay):
     base = base.copy()
     base.paste(overlay, (0, 0), overlay)
     return base
+
+
+def alpha_mask(img):
+    """
+    L mask (0/255) of pixels with non-zero alpha. Images without alpha are
+    treated as fully opaque.
+    """
+    if img.mode == "P":
+        return _palette_lut_mask(img, lambda col: col[3] > 0)
+    if img.mode != "RGBA":
+        return Image.new("L", img.size, 255)
+    return img.getchannel("A").point(_NONZERO_LUT)
+
+
+def color_mask(img, colors, opaque_only: bool = True):
+    """
+    L mask (0/255) of pixels whose RGB is exactly one of `colors`.
+
+    Each band is turned into an equality mask with a 256-entry lookup table
+    and the three bands are AND-ed (darker); colours are OR-ed (lighter).
+    With opaque_only, fully transparent pixels never match. Indexed ("P")
+    images are matched per palette entry instead.
+    """
+    if img.mode == "P":
+        wanted = {tuple(int(v) for v in c[:3]) for c in colors}
+        return _palette_lut_mask(img, lambda col: col[:3] in wanted and (col[3] > 0 or not opaque_only))
+    rgba = img if img.mode == "RGBA" else img.convert("RGBA")
+    bands = rgba.split()
+    band_cache: dict[tuple[int, int], Image.Image] = {}
+
+    def _eq(band_idx: int, value: int):
+        key = (band_idx, value)
+        if key not in band_cache:
+            lut = [255 if i == value else 0 for i in range(256)]
+            band_cache[key] = bands[band_idx].point(lut)
+        return band_cache[key]
+
+    mask = Image.new("L", rgba.size, 0)
+    for col in {tuple(int(v) for v in c[:3]) for c in colors}:
+        hit = ImageChops.darker(ImageChops.darker(_eq(0, col[0]), _eq(1, col[1])), _eq(2, col[2]))
+        mask = ImageChops.lighter(mask, hit)
+    if opaque_only:
+        mask = ImageChops.darker(mask, bands[3].point(_NONZERO_LUT))
+    return mask
+
+
+def _palette_lut_mask(img, match):
+    """L mask (0/255) of a "P" image's pixels whose palette colour satisfies `match`."""
+    lut = [255 if match(col) else 0 for col in indexed.colors(img)]
+    return img.point(lut + [0] * (256 - len(lut)), "L")
+
+
+def rgb_differs_mask(a, b):
+    """
+    L mask (0/255) of pixels where the RGB of `a` and `b` differ.
+    """
+    if a.mode != b.mode or a.mode not in ("RGB", "RGBA"):
+        a, b = a.convert("RGB"), b.convert("RGB")
+    diff = ImageChops.difference(a, b)
+    r, g, b_ = (band.point(_NONZERO_LUT) for band in diff.split()[:3])
+    return ImageChops.lighter(ImageChops.lighter(r, g), b_)
+
+
+def shift_image(img, dx: int, dy: int):
+    """
+    Translate an image by (dx, dy) pixels. Uncovered areas become zero
+    (transparent / black) instead of wrapping like ImageChops.offset.
+    """
+    out = Image.new(img.mode, img.size, 0)
+    out.paste(img, (int(dx), int(dy)))
+    return out
+
+
+def any_mask(masks, size):
+    """
+    OR together a sequence of L masks; empty input gives an all-zero mask.
+    """
+    out = Image.new("L", size, 0)
+    for m in masks:
+        out = ImageChops.lighter(out, m)
+    return out
+
+
+def palette_index(img, colors, max_exact: int = 4096):
+    """
+    L image holding, per pixel, the index of the nearest entry of `colors`
+    (RGB distance; alpha ignored). Each distinct colour is matched once and
+    painted through a colour mask; images with more than `max_exact` colours
+    fall back to Pillow's palette quantizer. Indexed images just map their
+    palette entries.
+    """
+    colors = [tuple(int(v) for v in c[:3]) for c in colors][:256]
+    if img.mode == "P":
+        # one lookup per palette entry
+        lut = [_nearest(col[:3], colors) for col in indexed.colors(img)]
+        return img.point(lut + [0] * (256 - len(lut)), "L")
+    rgb = img.convert("RGB")
+    found = rgb.getcolors(max_exact)
+    if found is None:
+        flat = [v for c in colors for v in c]
+        flat.extend(flat[:3] * (256 - len(colors)))
+        pal = Image.new("P", (1, 1))
+        pal.putpalette(flat)
+        index = rgb.quantize(palette=pal, dither=Image.Dither.NONE)
+        # padding entries repeat the first colour; fold them back onto it
+        return index.point([i if i < len(colors) else 0 for i in range(256)], "L")
+
+    by_index: dict[int, list[tuple[int, int, int]]] = {}
+    for _count, col in found:
+        by_index.setdefault(_nearest(col, colors), []).append(col)
+    out = Image.new("L", img.size, 0)
+    for idx, cols in by_index.items():
+        if idx:
+            out.paste(idx, (0, 0, img.width, img.height), color_mask(rgb, cols, opaque_only=False))
+    return out
+
+
+def _nearest(col, colors) -> int:
+    best, best_dist = 0, None
+    for i, (r, g, b) in enumerate(colors):
+        dist = (col[0] - r) ** 2 + (col[1] - g) ** 2 + (col[2] - b) ** 2
+        if best_dist is None or dist < best_dist:
+            best, best_dist = i, dist
+    return best
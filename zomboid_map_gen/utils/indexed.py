@@ -0,0 +1,191 @@
+"""
+Palette-indexed rasters.
+
+Terrain and vegetation only ever hold a handful of colours (utils.colors plus
+Rules overrides), so the generators paint them as Pillow "P" images: one
+byte per pixel indexing an RGBA palette that grows as colours are first
+painted. That is a quarter of the memory of RGBA, PNG stores it as an
+indexed file (faster to encode, smaller on disk), and recolouring edits the
+palette instead of rewriting pixels. to_rgba() is for the places that
+composite.
+
+PixelView reads and writes RGBA tuples whatever the mode, so per-pixel
+code works unchanged on indexed layers and on RGBA ones (e.g. a stage kept in
+the raster store by an older version).
+"""
+
+from __future__ import annotations
+
+from typing import Mapping, Sequence
+
+from PIL import Image
+
+Color = tuple[int, int, int, int]
+
+TRANSPARENT: Color = (0, 0, 0, 0)
+
+
+def _rgba(color: Sequence[int]) -> Color:
+    values = tuple(int(v) for v in color[:4])
+    return values if len(values) == 4 else values[:3] + (255,)
+
+
+def new(size: tuple[int, int], fill: Sequence[int] = TRANSPARENT) -> Image.Image:
+    """"P" image with a one-entry RGBA palette (`fill`) that every pixel uses."""
+    img = Image.new("P", size, 0)
+    img.putpalette(_rgba(fill), "RGBA")
+    return img
+
+
+def colors(img: Image.Image) -> list[Color]:
+    """RGBA colour of each palette entry of a "P" image, in index order."""
+    flat = img.getpalette("RGBA") or []
+    return [tuple(flat[i:i + 4]) for i in range(0, len(flat), 4)]
+
+
+def to_rgba(img: Image.Image) -> Image.Image:
+    """RGBA copy of any image, for compositing."""
+    return img.copy() if img.mode == "RGBA" else img.convert("RGBA")
+
+
+class PixelView:
+    """
+    view[x, y] reads an RGBA tuple and view[x, y] = colour writes one, whatever
+    the image mode. On a "P" image colours go through the palette, and a colour
+    painted for the first time becomes a new entry (at most 256). getpixel and
+    size make the view a stand-in for the image in read-only samplers.
+
+    Hot loops can resolve a colour once with value() and store that straight
+    into img.load().
+    """
+
+    def __init__(self, img: Image.Image):
+        self.img = img
+        self.size = img.size
+        self._px = img.load()
+        self._indexed = img.mode == "P"
+        self._colors: list[Color] = colors(img) if self._indexed else []
+        self._index: dict[Color, int] = {}
+        for i, col in enumerate(self._colors):
+            self._index.setdefault(col, i)
+
+    def __getitem__(self, xy: tuple[int, int]):
+        value = self._px[xy]
+        return self._colors[value] if self._indexed else value
+
+    def __setitem__(self, xy: tuple[int, int], color: Sequence[int]) -> None:
+        self._px[xy] = self.value(color)
+
+    def getpixel(self, xy: tuple[int, int]):
+        return self[xy]
+
+    def value(self, color: Sequence[int]):
+        """What to store in a pixel to paint `color`: its palette index, or the colour itself."""
+        if not self._indexed:
+            return color
+        col = _rgba(color)
+        index = self._index.get(col)
+        if index is None:
+            if len(self._colors) >= 256:
+                raise ValueError("indexed raster palette is full (256 colours)")
+            index = len(self._colors)
+            self._colors.append(col)
+            self._index[col] = index
+            self.img.putpalette([v for c in self._colors for v in c], "RGBA")
+        return index
+
+
+def index_rgb(rgb: Image.Image, palette: Sequence[Sequence[int]]) -> Image.Image | None:
+    """
+    "P" image of an RGB image made only of `palette`'s (distinct, at most 256)
+    colours, each pixel holding the index of its colour; None when Pillow
+    can't index it exactly.
+    """
+    palette = [tuple(int(v) for v in col[:3]) for col in palette]
+    # the quantizer looks colours up through a coarse cache, so close colours
+    # (a ramp one step apart) can land on a neighbour's entry. Spread each
+    # band's values evenly over 0..255 first; distinct colours then sit far
+    # apart and the quantizer only has to find an exact match
+    luts = []
+    for band in range(3):
+        values = sorted({col[band] for col in palette})
+        step = 256 // len(values)
+        lut = [0] * 256
+        for k, v in enumerate(values):
+            lut[v] = k * step + step // 2
+        luts.append(lut)
+    spread = [(luts[0][r], luts[1][g], luts[2][b]) for r, g, b in palette]
+    flat = [v for col in spread for v in col]
+    # pad with a colour the image doesn't have, so no pixel matches a padding entry
+    used = set(spread)
+    pad = next((0, 0, b) for b in range(257) if (0, 0, b) not in used)
+    flat.extend(pad * (256 - len(spread)))
+    pal = Image.new("P", (1, 1))
+    pal.putpalette(flat)
+    # the mapping only depends on the colour, so one pixel per colour proves
+    # the whole image indexes exactly
+    probe = Image.new("RGB", (len(spread), 1))
+    probe.putdata(spread)
+    if list(probe.quantize(palette=pal, dither=Image.Dither.NONE).tobytes()) != list(range(len(spread))):
+        return None
+    index = rgb.point(luts[0] + luts[1] + luts[2]).quantize(palette=pal, dither=Image.Dither.NONE)
+    index.putpalette([v for col in palette for v in col])
+    return index
+
+
+def recolor(img: Image.Image, replacements: Mapping[tuple[int, int, int], Sequence[int]]) -> Image.Image:
+    """Copy of a "P" image with palette entries whose RGB is in `replacements` swapped (alpha kept)."""
+    out = img.copy()
+    swapped = []
+    for col in colors(img):
+        new_rgb = replacements.get(col[:3])
+        swapped.extend(tuple(int(v) for v in new_rgb[:3]) + col[3:] if new_rgb else col)
+    out.putpalette(swapped, "RGBA")
+    return out
+
+
+def composite(base: Image.Image, overlay: Image.Image) -> Image.Image:
+    """
+    `overlay` alpha-composited over `base`, as a new image. An indexed base
+    stays indexed when the overlay is fully opaque wherever it draws (the
+    details layer is) and the palette has room for its colours; otherwise
+    the result is RGBA.
+    """
+    overlay = overlay if overlay.mode == "RGBA" else overlay.convert("RGBA")
+    if base.mode == "P":
+        out = _paste_indexed(base, overlay)
+        if out is not None:
+            return out
+    out = to_rgba(base)
+    out.alpha_composite(overlay)
+    return out
+
+
+def _paste_indexed(base: Image.Image, overlay: Image.Image) -> Image.Image | None:
+    alpha = overlay.getchannel("A")
+    hist = alpha.histogram()
+    if any(hist[1:255]):
+        return None
+    out = base.copy()
+    if not hist[255]:
+        return out
+    rgb = overlay.convert("RGB")
+    found = rgb.getcolors(256)
+    drawn = overlay.getcolors(512)
+    if found is None or drawn is None:
+        return None
+    src = [col for _count, col in found]
+    index = index_rgb(rgb, src)
+    if index is None:
+        return None
+    opaque = {col[:3] for _count, col in drawn if col[3]}
+    view = PixelView(out)
+    try:
+        # colours only found under transparent pixels never show; don't add them
+        lut = [view.value(col) if col in opaque else 0 for col in src]
+    except ValueError:
+        return None
+    lut.extend([0] * (256 - len(lut)))
+    # P -> P paste copies indices as they are, so remap them into out's palette first
+    out.paste(index.point(lut), (0, 0), alpha)
+    return out
@@ -0,0 +1,43 @@
+"""
+Deferred module imports.
+
+`lazy_import(".terrain.terrain_generator", __package__)` returns a stand-in
+module at once; the real module is imported on the first attribute access,
+so modules that merely reference the generators (the CLI's --help, the GUI's
+first paint) don't pay for PIL, multiprocessing and the generators up front.
+
+The stand-in forwards every lookup to the real module in sys.modules, so
+module globals that change after import are always read fresh, and the
+first import goes through the regular import lock (safe from GUI worker
+threads).
+"""
+
+from __future__ import annotations
+
+import importlib
+import importlib.util
+import sys
+from types import ModuleType
+from typing import Any
+
+
+class _LazyModule(ModuleType):
+    def __getattr__(self, attr: str) -> Any:
+        if attr.startswith("__") and attr.endswith("__"):
+            # keep copy/pickle/inspect probes from triggering the import
+            raise AttributeError(attr)
+        return getattr(importlib.import_module(self.__name__), attr)
+
+    def __dir__(self) -> list[str]:
+        return dir(importlib.import_module(self.__name__))
+
+    def __repr__(self) -> str:
+        return f"<lazy module {self.__name__!r}>"
+
+
+def lazy_import(name: str, package: str | None = None) -> ModuleType:
+    fullname = importlib.util.resolve_name(name, package)
+    module = sys.modules.get(fullname)
+    if module is not None:
+        return module
+    return _LazyModule(fullname)
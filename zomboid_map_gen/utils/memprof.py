@@ -0,0 +1,280 @@
+"""
+Memory accounting for generation runs.
+
+- projection: before a run, estimate the peak for the configured canvas from
+  the per-pixel cost of the layers and the noise float lists, and warn when it
+  exceeds the RAM currently available.
+- profiling (config `memory.enabled`): per pipeline stage, record RSS, the
+  peak RSS of the parent and of pool workers during that stage, tracemalloc
+  peak and the top allocation sites that grew during the stage, plus the size
+  of the lists returned by each worker. The result goes to a JSON report.
+
+ru_maxrss is a process-lifetime high-water mark (and pool workers are
+reused), so stage and job peaks are sampled from /proc while they run; the
+high-water mark only counts when it rose inside the window, which makes it
+that window's peak. The lifetime marks are reported as *_peak_rss_so_far.
+Without /proc (macOS) only the rises are seen; elsewhere RSS is null and
+only tracemalloc is used.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Mapping
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_PROFILER: "MemoryProfiler | None" = None
+
+# bytes per pixel held at the peak: indexed terrain and vegetation plus their
+# rules-palette copies (1 byte each), RGBA roads, details, combined and
+# preview (4 bytes each) ...
+_RASTER_BYTES_PER_PX = 4 * 1 + 4 * 4
+# ... and one list of Python floats per noise layer (8-byte slot + 24-byte float)
+_NOISE_BYTES_PER_PX = 8 + 24
+
+
+def _peak_rss(who: int) -> int | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _current_rss() -> int | None:
+    try:
+        with open("/proc/self/statm", "rb") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class RssSampler:
+    """Highest RSS between start() and stop(), polled from a daemon thread."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak: int | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._high_water: int | None = None
+
+    def start(self) -> "RssSampler":
+        self._high_water = _peak_rss(resource.RUSAGE_SELF) if resource else None
+        self.peak = _current_rss()
+        if self.peak is not None:
+            self._thread = threading.Thread(target=self._poll, name="memprof-rss", daemon=True)
+            self._thread.start()
+        return self
+
+    def _poll(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._see(_current_rss())
+
+    def _see(self, rss: int | None) -> None:
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def stop(self) -> int | None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._see(_current_rss())
+        high_water = _peak_rss(resource.RUSAGE_SELF) if resource else None
+        if high_water is not None and self._high_water is not None and high_water > self._high_water:
+            # the lifetime mark rose in this window, so it is this window's peak
+            self._see(high_water)
+        return self.peak
+
+
+def available_memory() -> int | None:
+    """RAM available to new allocations in bytes, or None when unknown."""
+    try:
+        with open("/proc/meminfo", "r", encoding="ascii") as fh:
+            for line in fh:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def projected_memory(conf: Mapping) -> int:
+    """Rough peak bytes for a full run of `conf`."""
+    canvas = conf.get("canvas", {}) or {}
+    cell = int(canvas.get("cell_size", 300))
+    pixels = cell * max(1, int(canvas.get("cells_x", 1))) * cell * max(1, int(canvas.get("cells_y", 1)))
+    terrain = conf.get("terrain", {}) or {}
+    veg = conf.get("vegetation", {}) or {}
+    # layered terrain keeps every layer's field until painting; vegetation layers likewise
+    noise_lists = max(1, len(terrain.get("layers") or []))
+    if veg.get("use_layers", True) is not False:
+        noise_lists += len(veg.get("layers") or [])
+    return pixels * (_RASTER_BYTES_PER_PX + _NOISE_BYTES_PER_PX * noise_lists)
+
+
+def check_projection(conf: Mapping) -> dict[str, Any]:
+    """Projection vs. available RAM; prints a warning when the run likely won't fit."""
+    projected = projected_memory(conf)
+    available = available_memory()
+    fits = available is None or projected <= available
+    if not fits and (conf.get("memory", {}) or {}).get("warn", True):
+        print(f"[ZOMBOID-MAP-GEN] WARNING: projected memory {_mb(projected):.0f} MB exceeds "
+              f"available RAM {_mb(available):.0f} MB; reduce canvas.cell_size or cells_x/cells_y.")
+    return {"projected_bytes": projected, "available_bytes": available, "fits": fits}
+
+
+def _mb(n: int | None) -> float:
+    return (n or 0) / (1024 * 1024)
+
+
+def _list_bytes(value: Any) -> int:
+    """Size of a returned list of floats/ints (container + element objects)."""
+    if isinstance(value, list):
+        return sys.getsizeof(value) + sum(sys.getsizeof(v) for v in value[:1]) * len(value)
+    if isinstance(value, (bytes, bytearray)):
+        return sys.getsizeof(value)
+    return 0
+
+
+class MemoryProfiler:
+    def __init__(self, top: int = 10):
+        self.top = top
+        self.stages: list[dict[str, Any]] = []
+        self._current: dict[str, Any] | None = None
+        self._snapshot: tracemalloc.Snapshot | None = None
+        self._sampler: RssSampler | None = None
+        self._started = 0.0
+
+    def enter(self, name: str) -> None:
+        self.close()
+        tracemalloc.reset_peak()
+        self._snapshot = tracemalloc.take_snapshot()
+        self._sampler = RssSampler().start()
+        self._started = time.perf_counter()
+        self._current = {
+            "stage": name,
+            "rss_start": _current_rss(),
+            "results": {},
+            "workers": {},
+        }
+
+    def record_chunk(self, worker: str, pid: int, peak_rss: int | None, result: Any) -> None:
+        stage = self._current
+        if stage is None:
+            return
+        entry = stage["results"].setdefault(worker, {"jobs": 0, "bytes": 0})
+        entry["jobs"] += 1
+        entry["bytes"] += _list_bytes(result)
+        if peak_rss is not None:
+            stage["workers"][pid] = max(stage["workers"].get(pid, 0), peak_rss)
+
+    def close(self) -> None:
+        stage, self._current = self._current, None
+        if stage is None:
+            return
+        # before the snapshot below, which allocates on its own
+        peak_rss = self._sampler.stop() if self._sampler is not None else None
+        rss_end = _current_rss()
+        self._sampler = None
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        growth = snapshot.compare_to(self._snapshot, "lineno") if self._snapshot is not None else []
+        growth = [s for s in growth if s.size_diff > 0][: self.top]
+        workers = stage.pop("workers")
+        stage.update({
+            "seconds": round(time.perf_counter() - self._started, 3),
+            "rss_end": rss_end,
+            "peak_rss": peak_rss,
+            "tracemalloc_current": current,
+            "tracemalloc_peak": peak,
+            "worker_count": len(workers),
+            "worker_peak_rss": max(workers.values()) if workers else None,
+            "top_allocations": [
+                {"where": f"{s.traceback[0].filename}:{s.traceback[0].lineno}",
+                 "size_diff": s.size_diff, "count_diff": s.count_diff}
+                for s in growth
+            ],
+        })
+        self.stages.append(stage)
+        self._snapshot = None
+
+    def report(self, projection: Mapping[str, Any]) -> dict[str, Any]:
+        peaks = [s["peak_rss"] for s in self.stages if s["peak_rss"] is not None]
+        return {
+            "projection": dict(projection),
+            "peak_rss": max(peaks) if peaks else None,
+            "peak_rss_so_far": _peak_rss(resource.RUSAGE_SELF) if resource else None,
+            "children_peak_rss_so_far": _peak_rss(resource.RUSAGE_CHILDREN) if resource else None,
+            "stages": self.stages,
+        }
+
+
+def enabled() -> bool:
+    return _PROFILER is not None
+
+
+def enter_stage(name: str) -> None:
+    if _PROFILER is not None:
+        _PROFILER.enter(name)
+
+
+def record_chunk(worker: str, pid: int, peak_rss: int | None, result: Any) -> None:
+    if _PROFILER is not None:
+        _PROFILER.record_chunk(worker, pid, peak_rss, result)
+
+
+def measured_call(worker, args) -> tuple[Any, tuple[int, int | None]]:
+    """Run `worker(*args)` in a pool worker; return its result with (pid, peak RSS during the call)."""
+    sampler = RssSampler().start()
+    try:
+        result = worker(*args)
+    finally:
+        peak = sampler.stop()
+    return result, (os.getpid(), peak)
+
+
+def report_path(conf: Mapping) -> Path | None:
+    mem_conf = conf.get("memory", {}) or {}
+    if not mem_conf.get("enabled", False):
+        return None
+    return Path(conf.get("output_dir", "output")) / (mem_conf.get("report") or "memory_report.json")
+
+
+@contextmanager
+def run_profile(conf: Mapping) -> Iterator[None]:
+    """Check the projection, then profile the enclosed run when the config asks for it."""
+    global _PROFILER
+    projection = check_projection(conf)
+    path = report_path(conf)
+    if path is None or _PROFILER is not None:
+        yield
+        return
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    profiler = MemoryProfiler(top=int((conf.get("memory", {}) or {}).get("top", 10)))
+    _PROFILER = profiler
+    try:
+        yield
+    finally:
+        profiler.close()
+        _PROFILER = None
+        if started_tracing:
+            tracemalloc.stop()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(profiler.report(projection), indent=2), encoding="utf-8")
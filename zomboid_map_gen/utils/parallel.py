@@ -3,15 +3,33 @@ Lightweight helpers for parallel execution.
 
 - Uses ProcessPoolExecutor for CPU-bound loops (escapes the GIL)
 - Provides range splitting utilities
+- Honours the current cancel token (utils.cancel): pending chunks are dropped,
+  running ones see abandoned() and may return early
 
 No external dependencies. Safe to import from Windows/macOS/Linux.
 """
 
 from __future__ import annotations
 
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from itertools import chain
+import multiprocessing
 import os
-from typing import Callable, Iterable, Any
+from typing import Callable, Iterable, Iterator, Any
+
+from . import cancel, memprof, trace
+
+# how often a waiting caller looks at its cancel token (seconds)
+_CANCEL_POLL = 0.1
+
+# set in pool workers started inside a cancel scope
+_ABANDON = None
+
+# set in workers of an outer pool (batch runs): jobs run in-process, no nested pools
+_INLINE = False
+
+# long-lived pool reused by every dispatch (server); None = a fresh pool per call
+_SHARED: ProcessPoolExecutor | None = None
 
 
 def cpu_count(default: int = 4) -> int:
@@ -45,6 +63,37 @@ def split_range(n: int, parts: int | None = None) -> list[tuple[int, int]]:
     return out
 
 
+def abandoned() -> bool:
+    """True inside a pool worker whose run was cancelled; chunk loops may return early."""
+    return _ABANDON is not None and _ABANDON.is_set()
+
+
+def start_shared_pool(max_workers: int | None = None) -> ProcessPoolExecutor:
+    """Keep one warm pool for all later dispatches in this process."""
+    global _SHARED
+    if _SHARED is None:
+        _SHARED = ProcessPoolExecutor(max_workers=max_workers or cpu_count())
+    return _SHARED
+
+
+def shutdown_shared_pool() -> None:
+    global _SHARED
+    if _SHARED is not None:
+        _SHARED.shutdown(wait=True, cancel_futures=True)
+        _SHARED = None
+
+
+def run_inline() -> None:
+    """Run this process's pool jobs in-process; used as an outer pool's initializer."""
+    global _INLINE
+    _INLINE = True
+
+
+def _init_worker(flag) -> None:
+    global _ABANDON
+    _ABANDON = flag
+
+
 def run_process_map(
     worker: Callable[..., Any],
     args_list: Iterable[tuple[Any, ...]],
@@ -55,16 +104,115 @@ def run_process_map(
     worker must be a top-level function (picklable) because Windows uses spawn.
     """
     args_list = list(args_list)
-    if not args_list:
-        return []
+    results = [None] * len(args_list)
+    for i, result in iter_process_map(worker, args_list, max_workers):
+        results[i] = result
+    return results
+
+
+def iter_process_map(
+    worker: Callable[..., Any],
+    args_list: Iterable[tuple[Any, ...]],
+    max_workers: int | None = None,
+    window: int | None = None,
+) -> Iterator[tuple[int, Any]]:
+    """Like run_process_map, but yield (index, result) as each job completes.
+
+    Lets callers consume results (write files, report progress) while the
+    remaining jobs are still running, instead of holding every result.
+    With `window`, at most that many jobs are in flight and `args_list` is
+    read lazily as earlier jobs complete, so a generator of large payloads
+    only ever has `window` of them alive.
+    Raises cancel.Cancelled if the current run is cancelled meanwhile.
+    """
+    sized = {"jobs": len(args_list)} if hasattr(args_list, "__len__") else {}
+    jobs = iter(args_list)
+    first = next(jobs, None)
+    if first is None:
+        return
+    jobs = chain([first], jobs)
+    traced, profiled = trace.enabled(), memprof.enabled()
+    if not (traced or profiled):
+        yield from _dispatch(worker, jobs, max_workers, window)
+        return
+    # instrumented: jobs are wrapped so timing / peak RSS are taken inside the worker
+    name = getattr(worker, "__name__", "job")
+    call = worker
+    if profiled:
+        call, jobs = memprof.measured_call, _wrapped(call, jobs)
+    if traced:
+        call, jobs = trace.timed_call, _wrapped(call, jobs)
+    with trace.span(f"dispatch:{name}", "dispatch", **sized):
+        for i, result in _dispatch(call, jobs, max_workers, window):
+            if traced:
+                result, (start, end, pid) = result
+                trace.record(f"chunk:{name}", "chunk", start, end, pid=pid, index=i)
+            if profiled:
+                result, (pid, peak_rss) = result
+                memprof.record_chunk(name, pid, peak_rss, result)
+            yield i, result
+
+
+def _wrapped(call, jobs: Iterator) -> Iterator[tuple[Any, tuple]]:
+    for args in jobs:
+        yield call, args
+
+
+def _dispatch(worker, jobs: Iterator, max_workers: int | None, window: int | None) -> Iterator[tuple[int, Any]]:
+    if _INLINE:
+        for i, args in enumerate(jobs):
+            cancel.check()
+            yield i, worker(*args)
+        return
+    if _SHARED is not None:
+        yield from _iter_shared(worker, jobs, window)
+        return
     if max_workers is None:
         max_workers = cpu_count()
 
-    results = [None] * len(args_list)
-    with ProcessPoolExecutor(max_workers=max_workers) as ex:
-        fut_to_idx = {ex.submit(worker, *args): i for i, args in enumerate(args_list)}
-        for fut in as_completed(fut_to_idx):
-            i = fut_to_idx[fut]
-            results[i] = fut.result()
-    return results
+    cancel.check()
+    token = cancel.current()
+    flag = multiprocessing.Event() if token is not None else None
+    ex = ProcessPoolExecutor(max_workers=max_workers,
+                             initializer=_init_worker if flag is not None else None,
+                             initargs=(flag,) if flag is not None else ())
+    try:
+        yield from _as_completed(ex, worker, jobs, window, token, flag)
+    finally:
+        # a cancelled run doesn't wait for chunks its workers are abandoning
+        ex.shutdown(wait=flag is None or not flag.is_set(), cancel_futures=True)
+
+
+def _as_completed(ex, worker, jobs: Iterator, window: int | None, token, flag) -> Iterator[tuple[int, Any]]:
+    """Submit jobs (keeping at most `window` in flight) and yield (index, result) as they finish."""
+    pending: dict[Future, int] = {}
+    numbered = enumerate(jobs)
+
+    def fill() -> None:
+        for i, args in numbered:
+            pending[ex.submit(worker, *args)] = i
+            if window is not None and len(pending) >= window:
+                break
+
+    try:
+        fill()
+        while pending:
+            done, _ = wait(pending, timeout=_CANCEL_POLL if token is not None else None,
+                           return_when=FIRST_COMPLETED)
+            if token is not None and token.cancelled:
+                if flag is not None:
+                    flag.set()
+                raise cancel.Cancelled()
+            for fut in done:
+                yield pending.pop(fut), fut.result()
+            fill()
+    finally:
+        for fut in pending:
+            fut.cancel()
+
 
+def _iter_shared(worker, jobs: Iterator, window: int | None) -> Iterator[tuple[int, Any]]:
+    # the warm pool has no per-run abandon flag: on cancel, queued chunks are
+    # dropped and running ones finish in the background
+    cancel.check()
+    yield from _as_completed(_SHARED, worker, jobs, window, cancel.current(), None)
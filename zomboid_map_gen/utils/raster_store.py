@@ -0,0 +1,161 @@
+# zomboid_map_gen/utils/raster_store.py
+"""
+Stage-output store: uncompressed rasters handed between pipeline stages.
+
+Each raster is one `<name>.raw` file: a 24-byte header (magic, Pillow mode,
+width, height) followed by the pixel bytes exactly as Image.tobytes() gives
+them. Reading is one read() of the pixel bytes wrapped by Image.frombuffer,
+so a stage (or another process, or the GUI) gets the pixels without PNG
+decode. The file is closed before the image is returned: nothing keeps it
+open or mapped, so the next write_raster can replace it (Windows refuses to
+replace a file that is still mapped).
+
+A manifest (`store.json`) records a key per entry. Keys hash the config that
+produced a stage plus its upstream keys, so a stale entry is never reused.
+PNG stays an export format only.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import struct
+from hashlib import blake2s
+from pathlib import Path
+from typing import Any, Iterable, Mapping
+
+from PIL import Image
+
+from . import trace
+
+MAGIC = b"ZMGRAW1\0"
+_HEADER = struct.Struct("<8s8sII")
+MANIFEST = "store.json"
+
+
+def stage_key(conf: Mapping, sections: Iterable[str], *upstream: str) -> str:
+    """Stable key for a stage: its config sections plus upstream stage keys."""
+    payload = {
+        "sections": {name: conf.get(name) for name in sections},
+        "upstream": list(upstream),
+    }
+    data = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return blake2s(data, digest_size=16).hexdigest()
+
+
+def write_raster(path: Path, img: Image.Image) -> None:
+    mode = img.mode.encode("ascii")
+    if len(mode) > 8:
+        raise ValueError(f"unsupported image mode for raster store: {img.mode}")
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with trace.span("write:raw", "io", path=str(path)), open(tmp, "wb") as fh:
+        fh.write(_HEADER.pack(MAGIC, mode, img.width, img.height))
+        fh.write(img.tobytes())
+    os.replace(tmp, path)
+
+
+def read_raster(path: Path) -> Image.Image:
+    """Image over an in-memory copy of the file's pixels; the file is closed on return."""
+    with open(path, "rb") as fh:
+        header = fh.read(_HEADER.size)
+        if len(header) != _HEADER.size:
+            raise ValueError(f"truncated raster file: {path}")
+        magic, mode, width, height = _HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f"not a raster store file: {path}")
+        mode = mode.rstrip(b"\0").decode("ascii")
+        if width == 0 or height == 0:
+            return Image.new(mode, (width, height))
+        expected = len(Image.new(mode, (1, 1)).tobytes()) * width * height
+        data = bytearray(expected)
+        got = fh.readinto(data)
+        if got != expected or fh.read(1):
+            raise ValueError(f"raster size mismatch in {path}: expected {expected} bytes")
+    return Image.frombuffer(mode, (width, height), data, "raw", mode, 0, 1)
+
+
+class RasterStore:
+    def __init__(self, root: Path):
+        self.root = Path(root).expanduser()
+        self._manifest: dict[str, dict[str, Any]] | None = None
+
+    def has(self, name: str, key: str | None = None) -> bool:
+        """True when an entry (possibly an empty stage) exists under `key`."""
+        entry = self._entries().get(name)
+        if not entry or (key is not None and entry.get("key") != key):
+            return False
+        return not entry.get("file") or (self.root / entry["file"]).exists()
+
+    def put(self, name: str, img: Image.Image | None, key: str = "") -> None:
+        """Store a raster; None records that the stage produced nothing."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        if img is None:
+            self._record(name, {"key": key, "file": "", "kind": "none"})
+            return
+        write_raster(self.root / f"{name}.raw", img)
+        entry = {"key": key, "file": f"{name}.raw", "kind": "raster", "mode": img.mode, "size": list(img.size)}
+        if img.mode == "P" and img.palette is not None:
+            entry["palette_mode"] = img.palette.mode
+            entry["palette"] = img.getpalette(img.palette.mode)
+        self._record(name, entry)
+
+    def get(self, name: str, key: str | None = None) -> Image.Image | None:
+        """Stored raster, or None when missing, empty or stored under another key."""
+        entry = self._entries().get(name)
+        if not entry or entry.get("kind") != "raster" or (key is not None and entry.get("key") != key):
+            return None
+        try:
+            img = read_raster(self.root / entry["file"])
+        except (OSError, ValueError):
+            return None
+        if entry.get("palette"):
+            img.putpalette(entry["palette"], entry.get("palette_mode", "RGB"))
+        return img
+
+    def put_json(self, name: str, data: Any, key: str = "") -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.root / f"{name}.json"
+        with trace.span("write:json", "io", path=str(path)):
+            path.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+        self._record(name, {"key": key, "file": f"{name}.json", "kind": "json"})
+
+    def get_json(self, name: str, key: str | None = None) -> Any:
+        entry = self._entries().get(name)
+        if not entry or entry.get("kind") != "json" or (key is not None and entry.get("key") != key):
+            return None
+        try:
+            return json.loads((self.root / entry["file"]).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def is_empty_stage(self, name: str, key: str | None = None) -> bool:
+        """True when the stage ran under `key` and produced no output."""
+        entry = self._entries().get(name)
+        return bool(entry) and entry.get("kind") == "none" and (key is None or entry.get("key") == key)
+
+    def _entries(self) -> dict[str, dict[str, Any]]:
+        if self._manifest is None:
+            try:
+                data = json.loads((self.root / MANIFEST).read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                data = {}
+            self._manifest = data.get("entries", {}) if isinstance(data, dict) else {}
+        return self._manifest
+
+    def _record(self, name: str, entry: dict[str, Any]) -> None:
+        entries = self._entries()
+        entries[name] = entry
+        tmp = self.root / (MANIFEST + ".tmp")
+        with trace.span("write:json", "io", path=str(self.root / MANIFEST)):
+            tmp.write_text(json.dumps({"version": 1, "entries": entries}, indent=1), encoding="utf-8")
+            os.replace(tmp, self.root / MANIFEST)
+
+
+def store_for(conf: Mapping) -> RasterStore | None:
+    """The configured stage store, or None when disabled."""
+    store_conf = conf.get("store", {}) or {}
+    if not store_conf.get("enabled", False):
+        return None
+    root = store_conf.get("dir") or str(Path(conf.get("output_dir", "output")) / "stages")
+    return RasterStore(Path(root))
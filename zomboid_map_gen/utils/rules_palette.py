@@ -7,13 +7,18 @@ from pathlib import Path
 from typing import Callable, Dict, Tuple
 
 from ..config import DEFAULT_RULES
+from .lazy import lazy_import
+
+image_utils = lazy_import(".image_utils", __package__)
+indexed = lazy_import(".indexed", __package__)
 
 LAYER_TO_SECTION: Dict[str, str] = {
     "0_Floor": "terrain",
     "0_Vegetation": "vegetation",
 }
 
-_CACHE: Dict[str, Tuple[Dict[str, Dict[str, Tuple[int, int, int]]], str | None]] = {}
+# path -> ((mtime_ns, size), parsed result); a changed file is parsed again
+_CACHE: Dict[str, Tuple[Tuple[int, int] | None, Tuple[Dict[str, Dict[str, Tuple[int, int, int]]], str | None]]] = {}
 
 
 def get_rules_file(conf: dict) -> Path | None:
@@ -60,15 +65,21 @@ def _parse_rules(text: str, callback: Callable[[str, str, Tuple[int, int, int]],
 
 def load_rules_colors(path: Path) -> Tuple[Dict[str, Dict[str, Tuple[int, int, int]]], str | None]:
     key = str(path.resolve())
-    if key in _CACHE:
-        return _CACHE[key]
+    try:
+        st = path.stat()
+        stamp = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        stamp = None
+    cached = _CACHE.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
     data: Dict[str, Dict[str, Tuple[int, int, int]]] = {"terrain": {}, "vegetation": {}}
     error: str | None = None
     try:
         text = path.read_text(encoding="utf-8", errors="ignore")
     except Exception as exc:
         error = f"Failed to read {path}: {exc}"
-        _CACHE[key] = (data, error)
+        _CACHE[key] = (stamp, (data, error))
         return data, error
 
     def _collect(layer: str, label: str, color: Tuple[int, int, int]):
@@ -78,7 +89,7 @@ def load_rules_colors(path: Path) -> Tuple[Dict[str, Dict[str, Tuple[int, int, i
         data[section][label] = color
 
     _parse_rules(text, _collect)
-    _CACHE[key] = (data, error)
+    _CACHE[key] = (stamp, (data, error))
     return data, error
 
 
@@ -113,16 +124,34 @@ def build_palette_replacements(conf: dict) -> Dict[str, Dict[Tuple[int, int, int
 
 
 def recolor_image(image, replacements: Dict[Tuple[int, int, int], Tuple[int, int, int]]):
+    """
+    Copy of `image` with every RGB in `replacements` swapped for its new
+    colour; alpha is kept as is.
+
+    Indexed ("P") layers get their palette edited. Other layers come back as
+    RGBA: with at most 256 colours they are indexed against a palette of
+    exactly their colours, the entries are swapped and the index is expanded
+    again; otherwise each replaced colour is pasted through a colour mask.
+    """
     if not replacements:
         return image
+    if image.mode == "P":
+        return indexed.recolor(image, replacements)
     img = image.convert("RGBA")
-    px = img.load()
-    width, height = img.size
-    for y in range(height):
-        for x in range(width):
-            current = px[x, y]
-            base = current[:3]
-            replacement = replacements.get(base)
-            if replacement:
-                px[x, y] = (*replacement, current[3])
-    return img
+    rgb = img.convert("RGB")
+    found = rgb.getcolors(256)
+    present = [col for _count, col in found] if found is not None else None
+    if present is not None and not any(col in replacements for col in present):
+        return img
+    index = indexed.index_rgb(rgb, present) if present is not None else None
+    if index is not None:
+        recolored = indexed.recolor(index, replacements).convert("RGB")
+    else:
+        # masks come from the untouched image so swaps ({A: B, B: A}) don't chain
+        recolored = rgb.copy()
+        for src, dst in replacements.items():
+            mask = image_utils.color_mask(rgb, [src], opaque_only=False)
+            if mask.getbbox() is not None:
+                recolored.paste(tuple(dst), (0, 0, rgb.width, rgb.height), mask)
+    recolored.putalpha(img.getchannel("A"))
+    return recolored
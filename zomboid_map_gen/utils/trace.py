@@ -0,0 +1,161 @@
+"""
+Opt-in run tracing in Chrome trace-event format (open in Perfetto or
+chrome://tracing).
+
+While a tracer is active, `span(name)` records a complete event; pipeline
+stages, pool dispatches, worker chunks (timed inside the worker, tagged with
+its pid) and file writes are instrumented. With no tracer active, `span`
+returns a shared no-op context and `enabled()` is a global lookup, so the
+instrumentation costs next to nothing.
+
+Enable per run with config `trace.enabled` (or the CLI's --trace); the trace
+is written to `trace.path` (default <output_dir>/trace.json) and a per-span
+summary is printed.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Iterator, Mapping
+
+_NULL = nullcontext()
+_TRACER: "Tracer | None" = None
+
+
+def _now_us() -> float:
+    # wall clock, so timestamps taken in worker processes line up
+    return time.time_ns() / 1000.0
+
+
+class Tracer:
+    def __init__(self):
+        self.events: list[dict[str, Any]] = []
+        self.pid = os.getpid()
+
+    def add(self, name: str, cat: str, start_us: float, end_us: float,
+            pid: int | None = None, tid: int | None = None, args: Mapping[str, Any] | None = None) -> None:
+        event = {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": start_us,
+            "dur": max(0.0, end_us - start_us),
+            "pid": pid if pid is not None else self.pid,
+            "tid": tid if tid is not None else threading.get_ident(),
+        }
+        if args:
+            event["args"] = dict(args)
+        self.events.append(event)
+
+    def write(self, path: Path) -> None:
+        pids = sorted({e["pid"] for e in self.events} | {self.pid})
+        meta = [
+            {"name": "process_name", "ph": "M", "pid": pid, "tid": 0,
+             "args": {"name": "zomboid_map_gen" if pid == self.pid else f"worker {pid}"}}
+            for pid in pids
+        ]
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"traceEvents": meta + self.events, "displayTimeUnit": "ms"}), encoding="utf-8")
+
+    def summary(self) -> list[tuple[str, int, float, float, float]]:
+        """(name, count, total_ms, mean_ms, max_ms) per span name, slowest total first."""
+        stats: dict[str, list[float]] = {}
+        for e in self.events:
+            stats.setdefault(e["name"], []).append(e["dur"] / 1000.0)
+        rows = [(name, len(d), sum(d), sum(d) / len(d), max(d)) for name, d in stats.items()]
+        return sorted(rows, key=lambda r: r[2], reverse=True)
+
+    def format_summary(self) -> str:
+        rows = self.summary()
+        width = max([len("span")] + [len(r[0]) for r in rows])
+        lines = [f"{'span':<{width}}  {'count':>6}  {'total ms':>10}  {'mean ms':>9}  {'max ms':>9}"]
+        lines += [f"{n:<{width}}  {c:>6}  {t:>10.1f}  {m:>9.2f}  {x:>9.2f}" for n, c, t, m, x in rows]
+        return "\n".join(lines)
+
+
+def enabled() -> bool:
+    return _TRACER is not None
+
+
+def span(name: str, cat: str = "", **args: Any):
+    """Context manager timing a block; a shared no-op when tracing is off."""
+    if _TRACER is None:
+        return _NULL
+    return _span(_TRACER, name, cat, args)
+
+
+@contextmanager
+def _span(tracer: Tracer, name: str, cat: str, args: Mapping[str, Any]) -> Iterator[None]:
+    start = _now_us()
+    try:
+        yield
+    finally:
+        tracer.add(name, cat, start, _now_us(), args=args)
+
+
+def record(name: str, cat: str, start_us: float, end_us: float, pid: int | None = None,
+           **args: Any) -> None:
+    """Add an event timed elsewhere (e.g. inside a worker process)."""
+    if _TRACER is not None:
+        _TRACER.add(name, cat, start_us, end_us, pid=pid, tid=pid, args=args)
+
+
+class Phases:
+    """Back-to-back spans: each enter() closes the previous phase."""
+
+    def __init__(self, cat: str):
+        self.cat = cat
+        self._current: tuple[str, float] | None = None
+
+    def enter(self, name: str) -> None:
+        if _TRACER is None:
+            return
+        self.close()
+        self._current = (name, _now_us())
+
+    def close(self) -> None:
+        if self._current is not None and _TRACER is not None:
+            name, start = self._current
+            _TRACER.add(name, self.cat, start, _now_us())
+        self._current = None
+
+
+def timed_call(worker, args) -> tuple[Any, tuple[float, float, int]]:
+    """Run `worker(*args)` and return its result with (start_us, end_us, pid)."""
+    start = _now_us()
+    result = worker(*args)
+    return result, (start, _now_us(), os.getpid())
+
+
+def trace_path(conf: Mapping) -> Path | None:
+    """Where this run's trace goes, or None when tracing is not enabled."""
+    trace_conf = conf.get("trace", {}) or {}
+    if not trace_conf.get("enabled", False):
+        return None
+    return Path(trace_conf.get("path") or Path(conf.get("output_dir", "output")) / "trace.json")
+
+
+@contextmanager
+def run_trace(conf: Mapping) -> Iterator[Tracer | None]:
+    """Trace the enclosed run when the config asks for it (and no trace is already running)."""
+    global _TRACER
+    path = trace_path(conf)
+    if path is None or _TRACER is not None:
+        yield _TRACER
+        return
+    tracer = Tracer()
+    _TRACER = tracer
+    try:
+        yield tracer
+    finally:
+        _TRACER = None
+        tracer.write(path)
+        if (conf.get("trace", {}) or {}).get("summary", True):
+            print(f"[ZOMBOID-MAP-GEN] trace written to {path}")
+            print(tracer.format_summary())
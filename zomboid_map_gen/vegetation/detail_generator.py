@@ -32,10 +32,12 @@ r'''
 from PIL import Image
 from typing import Optional
 from pathlib import Path
+import random
 import re
 import unicodedata
 from ..utils import colors as base_colors
-from ..utils import noise_utils, seeds as seed_utils
+from ..roads import rasterize
+from ..utils import cancel, indexed, noise_utils, seeds as seed_utils
 
 
 ASPHALT_SET = {
@@ -311,24 +313,10 @@ except Exception:
     pass
 
 
-def generate(conf: dict, width: int, height: int,
-             terrain_img: Optional[Image.Image] = None,
-             veg_img: Optional[Image.Image] = None,
-             roads_img: Optional[Image.Image] = None) -> Optional[Image.Image]:
+def detail_jobs(conf: dict) -> list[dict]:
+    """Enabled advanced layers followed by the enabled quick items."""
     det_conf = conf.get("details", {})
-    if not det_conf or not det_conf.get("enabled", True):
-        return None
-
     layers = det_conf.get("layers", [])
-
-    # Transparent base so it can overlay vegetation and preview
-    out = Image.new("RGBA", (width, height), (0, 0, 0, 0))
-    opx = out.load()
-    tpx = terrain_img.load() if terrain_img else None
-    rpx = roads_img.load() if roads_img else None
-    vpx = veg_img.load() if veg_img else None
-
-    # Build job list: advanced layers + quick items
     jobs = []
     for L in layers:
         if L.get("enabled", True):
@@ -428,208 +416,262 @@ def generate(conf: dict, width: int, height: int,
             "scale": 60,
         })
 
-    if not jobs:
-        return None
+    return jobs
+
+
+def _reads_roads(layer: dict) -> bool:
+    return (layer.get("road_mode", "any") or "any").lower() != "any" or int(layer.get("near_road_radius", 0)) > 0
 
-    multiplier = float(det_conf.get("density_multiplier", 1.0))
-    WATER = base_colors.VANILLA["water"][:3]
-    for layer in jobs:
-        if not layer.get("enabled", True):
-            continue
-        # resolve color(s): allow rule_labels list for variety
-        colors_list = []
-        if layer.get("rule_labels"):
-            colors_list = _colors_for_labels(layer.get("rule_labels", []))
-        color = None
-        if not colors_list:
-            if layer.get("rule_label"):
-                c = _color_from_rules_label(str(layer.get("rule_label")))
-                if c:
-                    color = c
-            if color is None:
-                color = tuple(layer.get("rule_color", (0, 0, 0)))
-            if color == (0, 0, 0):
-                continue
-        density = float(layer.get("density", 0.02)) * multiplier
-        scale = float(layer.get("scale", 60))
-        octaves = int(layer.get("octaves", 4))
-        persistence = float(layer.get("persistence", 0.5))
-        lacunarity = float(layer.get("lacunarity", 2.0))
-        seed = layer.get("seed")
-        if seed is None:
-            seed = seed_utils.derive_seed(conf.get("seed", 0), layer.get("name", "detail"))
-
-        road_mode = (layer.get("road_mode", "any") or "any").lower()
-        terr_in = set(layer.get("terrain_in", []))
-        veg_in_names = set(layer.get("veg_in", []))
-        veg_in_colors = {base_colors.VEG.get(k, None) for k in veg_in_names}
-        veg_in_colors = {c[:3] for c in veg_in_colors if c}
-        near_radius = int(layer.get("near_radius", 0))
-        near_road_radius = int(layer.get("near_road_radius", 0))
-
-        # threshold derived from density (higher density -> easier threshold)
-        # We normalize per layer using a quick min/max pass.
-        vmin = 1e9; vmax = -1e9
-        sample_mode = (layer.get("sampling", "noise") or "noise").lower()
-        if sample_mode == "noise":
-            for x in range(width):
-                for y in range(height):
-                    v = noise_utils.perlin2(x, y, scale=scale, octaves=octaves,
-                                            persistence=persistence, lacunarity=lacunarity, seed=seed)
-                    if v < vmin: vmin = v
-                    if v > vmax: vmax = v
-            vr = (vmax - vmin) or 1.0
-            if "threshold" in layer:
-                thresh = float(layer["threshold"])  # 0..1 after normalization
-            else:
-                thresh = 1.0 - max(0.0, min(1.0, density))
 
+def road_reach(conf: dict) -> int:
+    """
+    How far (px) outside its own cell a cell's details read the roads layer,
+    or -1 when no detail layer reads roads at all.
+    """
+    det_conf = conf.get("details", {})
+    if not det_conf or not det_conf.get("enabled", True):
+        return -1
+    return max((int(L.get("near_road_radius", 0)) for L in detail_jobs(conf) if _reads_roads(L)), default=-1)
+
+
+def _prepare_layer(layer: dict, conf: dict, width: int, height: int, multiplier: float) -> Optional[dict]:
+    """Resolve one job into plain painting parameters (None = nothing to paint)."""
+    # resolve color(s): allow rule_labels list for variety
+    colors_list = []
+    if layer.get("rule_labels"):
+        colors_list = _colors_for_labels(layer.get("rule_labels", []))
+    color = None
+    if not colors_list:
+        if layer.get("rule_label"):
+            c = _color_from_rules_label(str(layer.get("rule_label")))
+            if c:
+                color = c
+        if color is None:
+            color = tuple(layer.get("rule_color", (0, 0, 0)))
+        if color == (0, 0, 0):
+            return None
+    density = float(layer.get("density", 0.02)) * multiplier
+    seed = layer.get("seed")
+    if seed is None:
+        seed = seed_utils.derive_seed(conf.get("seed", 0), layer.get("name", "detail"))
+    veg_in_colors = {base_colors.VEG.get(k, None) for k in set(layer.get("veg_in", []))}
+    p = {
+        "colors_list": colors_list,
+        "color": color,
+        "density": density,
+        "scale": float(layer.get("scale", 60)),
+        "octaves": int(layer.get("octaves", 4)),
+        "persistence": float(layer.get("persistence", 0.5)),
+        "lacunarity": float(layer.get("lacunarity", 2.0)),
+        "seed": seed,
+        "road_mode": (layer.get("road_mode", "any") or "any").lower(),
+        "terr_in": set(layer.get("terrain_in", [])),
+        "veg_in_colors": {c[:3] for c in veg_in_colors if c},
+        "near_radius": int(layer.get("near_radius", 0)),
+        "near_road_radius": int(layer.get("near_road_radius", 0)),
+        "reads_roads": _reads_roads(layer),
         # Cluster parameters for tiny groups
-        gmin = int(layer.get("group_size_min", 1))
-        gmax = int(layer.get("group_size_max", 3))
-        radius = int(layer.get("cluster_radius", 2))
-        stride = max(1, int(layer.get("stride", 3)))
-        # Scan at stride intervals to avoid saturating coverage
-        rnd = seed_utils.derive_seed(seed, "detail_rnd")
-        import random as _random
-        rr = _random.Random(rnd)
-
-        jitter = int(layer.get("jitter", 0))
-        if sample_mode == "points" or int(layer.get("points", 0)) > 0:
-            # points-based sampling: pick N random seeds then spawn clusters
-            pts = int(layer.get("points", 0))
-            if pts <= 0:
-                # heuristic: approximate scan density with stride; scale by multiplier
-                scan_sites = (width // stride) * (height // stride)
-                pts = max(1, int(scan_sites * max(0.0, min(1.0, density)) * multiplier))
+        "gmin": int(layer.get("group_size_min", 1)),
+        "gmax": int(layer.get("group_size_max", 3)),
+        "radius": int(layer.get("cluster_radius", 2)),
+        "stride": max(1, int(layer.get("stride", 3))),
+        "jitter": int(layer.get("jitter", 0)),
+        "sample_mode": (layer.get("sampling", "noise") or "noise").lower(),
+        "points": int(layer.get("points", 0)),
+    }
+    p["use_points"] = p["sample_mode"] == "points" or p["points"] > 0
+
+    # threshold derived from density (higher density -> easier threshold)
+    # We normalize per layer using a quick min/max pass over the whole map.
+    if not p["use_points"]:
+        vmin = 1e9; vmax = -1e9
+        for x in range(width):
+            cancel.check()
+            for y in range(height):
+                v = noise_utils.perlin2(x, y, scale=p["scale"], octaves=p["octaves"],
+                                        persistence=p["persistence"], lacunarity=p["lacunarity"], seed=seed)
+                if v < vmin: vmin = v
+                if v > vmax: vmax = v
+        p["vmin"], p["vr"] = vmin, (vmax - vmin) or 1.0
+        if "threshold" in layer:
+            p["thresh"] = float(layer["threshold"])  # 0..1 after normalization
+        else:
+            p["thresh"] = 1.0 - max(0.0, min(1.0, density))
+    elif p["points"] <= 0:
+        # heuristic: approximate scan density with stride; scale by multiplier
+        p["site_rate"] = max(0.0, min(1.0, density)) * multiplier / (p["stride"] * p["stride"])
+    else:
+        p["site_rate"] = max(0.0, multiplier) * p["points"] / float(max(1, width * height))
+    return p
+
+
+class _Window:
+    """Pixel access into a roads tile that starts at `origin` in map space."""
+
+    __slots__ = ("_px", "_ox", "_oy")
+
+    def __init__(self, img: Image.Image, origin: tuple[int, int]):
+        self._px = img.load()
+        self._ox, self._oy = origin
+
+    def __getitem__(self, xy):
+        return self._px[xy[0] - self._ox, xy[1] - self._oy]
+
+
+WATER = base_colors.VANILLA["water"][:3]
+
+
+def _eligible(p: dict, x: int, y: int, width: int, height: int, tpx, vpx, rpx) -> bool:
+    if tpx is not None and tpx[x, y][:3] == WATER:
+        return False
+    # road filter
+    road_mode = p["road_mode"]
+    if road_mode != "any" and rpx is not None:
+        m = _roads_pixel_mode(rpx[x, y])
+        if road_mode == "asphalt_only" and m != "asphalt":
+            return False
+        if road_mode == "non_asphalt" and m != "non_asphalt":
+            return False
+    near_road_radius = p["near_road_radius"]
+    if near_road_radius > 0 and rpx is not None:
+        ok_road = False
+        for yy in range(max(0, y-near_road_radius), min(height, y+near_road_radius+1)):
+            for xx in range(max(0, x-near_road_radius), min(width, x+near_road_radius+1)):
+                if rpx[xx, yy][3] > 0:
+                    ok_road = True; break
+            if ok_road: break
+        if not ok_road:
+            return False
+
+    # terrain inclusion
+    if p["terr_in"] and tpx is not None:
+        tname = _closest_terrain_name(tpx[x, y][:3])
+        if tname not in p["terr_in"]:
+            return False
+
+    # vegetation inclusion (exact match or nearby within radius)
+    veg_in_colors = p["veg_in_colors"]
+    if veg_in_colors and vpx is not None:
+        near_radius = p["near_radius"]
+        if near_radius <= 0:
+            return vpx[x, y][:3] in veg_in_colors
+        wmin = max(0, x-near_radius); wmax = min(width-1, x+near_radius)
+        hmin = max(0, y-near_radius); hmax = min(height-1, y+near_radius)
+        for yy in range(hmin, hmax+1):
+            for xx in range(wmin, wmax+1):
+                if vpx[xx, yy][:3] in veg_in_colors:
+                    return True
+        return False
+    return True
+
+
+def _spawn(p: dict, rr, x: int, y: int, box: tuple[int, int, int, int], opx) -> None:
+    """Spawn a tiny group around (x, y); pixels outside the cell are dropped."""
+    x0, y0, x1, y1 = box
+    jitter, radius = p["jitter"], p["radius"]
+    colors_list = p["colors_list"]
+    count = rr.randint(p["gmin"], p["gmax"])
+    for _ in range(count):
+        cx = x + (rr.randint(-jitter, jitter) if jitter>0 else 0)
+        cy = y + (rr.randint(-jitter, jitter) if jitter>0 else 0)
+        ox = cx + rr.randint(-radius, radius)
+        oy = cy + rr.randint(-radius, radius)
+        if x0 <= ox < x1 and y0 <= oy < y1:
+            if colors_list:
+                cc = colors_list[rr.randrange(len(colors_list))]
+                opx[ox, oy] = cc + (255,)
             else:
-                pts = max(1, int(pts * max(0.0, multiplier)))
-
-            attempts_per_point = 8
-            for _ in range(pts):
-                placed = False
-                for _try in range(attempts_per_point):
-                    x = rr.randrange(width)
-                    y = rr.randrange(height)
-                    if tpx is not None and tpx[x, y][:3] == WATER:
-                        continue
-                    # road filter
-                    if road_mode != "any" and rpx is not None:
-                        m = _roads_pixel_mode(rpx[x, y])
-                        if road_mode == "asphalt_only" and m != "asphalt":
-                            continue
-                        if road_mode == "non_asphalt" and m != "non_asphalt":
-                            continue
-                    if near_road_radius > 0 and rpx is not None:
-                        ok_road = False
-                        for yy in range(max(0, y-near_road_radius), min(height, y+near_road_radius+1)):
-                            for xx in range(max(0, x-near_road_radius), min(width, x+near_road_radius+1)):
-                                if rpx[xx, yy][3] > 0:
-                                    ok_road = True; break
-                            if ok_road: break
-                        if not ok_road:
-                            continue
-
-                    # terrain inclusion
-                    if terr_in and tpx is not None:
-                        tname = _closest_terrain_name(tpx[x, y][:3])
-                        if tname not in terr_in:
-                            continue
-
-                    # vegetation inclusion (exact match or nearby within radius)
-                    if veg_in_colors and vpx is not None:
-                        ok = False
-                        if near_radius <= 0:
-                            if vpx[x, y][:3] in veg_in_colors:
-                                ok = True
-                        else:
-                            wmin = max(0, x-near_radius); wmax = min(width-1, x+near_radius)
-                            hmin = max(0, y-near_radius); hmax = min(height-1, y+near_radius)
-                            for yy in range(hmin, hmax+1):
-                                for xx in range(wmin, wmax+1):
-                                    if vpx[xx, yy][:3] in veg_in_colors:
-                                        ok = True; break
-                                if ok: break
-                        if not ok:
-                            continue
-
-                    # Spawn cluster around (x,y)
-                    count = rr.randint(gmin, gmax)
-                    for _g in range(count):
-                        cx = x + (rr.randint(-jitter, jitter) if jitter>0 else 0)
-                        cy = y + (rr.randint(-jitter, jitter) if jitter>0 else 0)
-                        ox = cx + rr.randint(-radius, radius)
-                        oy = cy + rr.randint(-radius, radius)
-                        if 0 <= ox < width and 0 <= oy < height:
-                            if colors_list:
-                                cc = colors_list[rr.randrange(len(colors_list))]
-                                opx[ox, oy] = cc + (255,)
-                            else:
-                                opx[ox, oy] = color + (255,)
-                    placed = True
+                opx[ox, oy] = p["color"] + (255,)
+
+
+def _paint_cell(p: dict, box: tuple[int, int, int, int], rr, opx, tpx, vpx, rpx,
+                width: int, height: int) -> None:
+    x0, y0, x1, y1 = box
+    if p["use_points"]:
+        # points-based sampling: pick N random seeds then spawn clusters
+        # the map-wide count shared out by cell area; fractions are rolled
+        expected = p["site_rate"] * (x1 - x0) * (y1 - y0)
+        pts = int(expected) + (rr.random() < expected - int(expected))
+        attempts_per_point = 8
+        for _ in range(pts):
+            for _try in range(attempts_per_point):
+                x = rr.randrange(x0, x1)
+                y = rr.randrange(y0, y1)
+                if _eligible(p, x, y, width, height, tpx, vpx, rpx):
+                    _spawn(p, rr, x, y, box, opx)
                     break
-                # if not placed after attempts, skip
-        else:
-            for x in range(0, width, stride):
-                for y in range(0, height, stride):
-                    if tpx is not None and tpx[x, y][:3] == WATER:
-                        continue
-                    # road filter
-                    if road_mode != "any" and rpx is not None:
-                        m = _roads_pixel_mode(rpx[x, y])
-                        if road_mode == "asphalt_only" and m != "asphalt":
-                            continue
-                        if road_mode == "non_asphalt" and m != "non_asphalt":
-                            continue
-                    if near_road_radius > 0 and rpx is not None:
-                        ok_road = False
-                        for yy in range(max(0, y-near_road_radius), min(height, y+near_road_radius+1)):
-                            for xx in range(max(0, x-near_road_radius), min(width, x+near_road_radius+1)):
-                                if rpx[xx, yy][3] > 0:
-                                    ok_road = True; break
-                            if ok_road: break
-                        if not ok_road:
-                            continue
-
-                    # terrain inclusion
-                    if terr_in and tpx is not None:
-                        tname = _closest_terrain_name(tpx[x, y][:3])
-                        if tname not in terr_in:
-                            continue
-
-                    # vegetation inclusion (exact match or nearby within radius)
-                    if veg_in_colors and vpx is not None:
-                        ok = False
-                        if near_radius <= 0:
-                            if vpx[x, y][:3] in veg_in_colors:
-                                ok = True
-                        else:
-                            wmin = max(0, x-near_radius); wmax = min(width-1, x+near_radius)
-                            hmin = max(0, y-near_radius); hmax = min(height-1, y+near_radius)
-                            for yy in range(hmin, hmax+1):
-                                for xx in range(wmin, wmax+1):
-                                    if vpx[xx, yy][:3] in veg_in_colors:
-                                        ok = True; break
-                                if ok: break
-                        if not ok:
-                            continue
-
-                    v = noise_utils.perlin2(x, y, scale=scale, octaves=octaves,
-                                            persistence=persistence, lacunarity=lacunarity, seed=seed)
-                    v = (v - vmin) / ((vmax - vmin) or 1.0)
-                    if v >= thresh:
-                        # spawn a tiny group around (x,y)
-                        count = rr.randint(gmin, gmax)
-                        for _ in range(count):
-                            cx = x + (rr.randint(-jitter, jitter) if jitter>0 else 0)
-                            cy = y + (rr.randint(-jitter, jitter) if jitter>0 else 0)
-                            ox = cx + rr.randint(-radius, radius)
-                            oy = cy + rr.randint(-radius, radius)
-                            if 0 <= ox < width and 0 <= oy < height:
-                                if colors_list:
-                                    cc = colors_list[rr.randrange(len(colors_list))]
-                                    opx[ox, oy] = cc + (255,)
-                                else:
-                                    opx[ox, oy] = color + (255,)
+            # if not placed after attempts, skip
+        return
+
+    # Scan at stride intervals (aligned to the map) to avoid saturating coverage
+    stride = p["stride"]
+    for x in range(-(-x0 // stride) * stride, x1, stride):
+        for y in range(-(-y0 // stride) * stride, y1, stride):
+            if not _eligible(p, x, y, width, height, tpx, vpx, rpx):
+                continue
+            v = noise_utils.perlin2(x, y, scale=p["scale"], octaves=p["octaves"],
+                                    persistence=p["persistence"], lacunarity=p["lacunarity"], seed=p["seed"])
+            if (v - p["vmin"]) / p["vr"] >= p["thresh"]:
+                _spawn(p, rr, x, y, box, opx)
+
+
+def generate(conf: dict, width: int, height: int,
+             terrain_img: Optional[Image.Image] = None,
+             veg_img: Optional[Image.Image] = None,
+             roads_img: Optional[Image.Image] = None,
+             road_network=None, road_settings: Optional[dict] = None) -> Optional[Image.Image]:
+    """
+    Paint the details layer cell by cell (canvas.cell_size).
+
+    Every layer draws from its own RNG stream per cell, seeded from the layer
+    seed and (cx, cy), and only paints inside that cell. A cell's details
+    therefore depend only on the map-wide terrain/vegetation/noise and on the
+    roads within road_reach() of it, so local edits stay local.
+
+    Roads are read from `roads_img`, or from per-cell renders of
+    `road_network` with `road_settings` (no full-map roads image needed).
+    """
+    det_conf = conf.get("details", {})
+    if not det_conf or not det_conf.get("enabled", True):
+        return None
+
+    jobs = detail_jobs(conf)
+    if not jobs:
+        return None
+
+    # Transparent base so it can overlay vegetation and preview
+    out = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    opx = out.load()
+    # terrain/vegetation may be indexed; views read RGBA tuples either way
+    tpx = indexed.PixelView(terrain_img) if terrain_img else None
+    vpx = indexed.PixelView(veg_img) if veg_img else None
+
+    multiplier = float(det_conf.get("density_multiplier", 1.0))
+    prepared = []
+    for layer in jobs:
+        cancel.check()
+        p = _prepare_layer(layer, conf, width, height, multiplier)
+        if p is not None:
+            prepared.append(p)
+    if not prepared:
+        return out
+
+    cell_size = max(1, int(conf.get("canvas", {}).get("cell_size", 300)))
+    cells = [(cx, cy) for cy in range(-(-height // cell_size)) for cx in range(-(-width // cell_size))]
+    reach = max((p["near_road_radius"] for p in prepared if p["reads_roads"]), default=-1)
+    if reach >= 0 and road_network is not None:
+        tiles = rasterize.iter_cells(road_network, road_settings, cells, max_workers=1, margin=reach)
+    else:
+        full = roads_img.load() if roads_img is not None and reach >= 0 else None
+        tiles = ((cell, full) for cell in cells)
+
+    for (cx, cy), tile in tiles:
+        cancel.check()
+        x0, y0 = cx * cell_size, cy * cell_size
+        box = (x0, y0, min(width, x0 + cell_size), min(height, y0 + cell_size))
+        rpx = _Window(tile, (max(0, x0 - reach), max(0, y0 - reach))) if isinstance(tile, Image.Image) else tile
+        for p in prepared:
+            rr = random.Random(seed_utils.derive_seed(p["seed"], f"detail_rnd_{cx}_{cy}"))
+            _paint_cell(p, box, rr, opx, tpx, vpx, rpx, width, height)
 
     return out
@@ -5,12 +5,12 @@ Vegetation renderer.
 - generates a vegetation.png-style mask using the user's veg color scheme
 - uses noise to decide which vegetation band to use
 - can optionally respect terrain (no trees on water or asphalt)
+- paints a palette-indexed ("P") image (see utils.indexed)
 """
 
-from PIL import Image
 import math
-from ..utils import noise_utils, colors as base_colors, seeds as seed_utils
-from ..utils.parallel import split_range, run_process_map, cpu_count
+from ..utils import cancel, indexed, noise_utils, colors as base_colors, seeds as seed_utils
+from ..utils.parallel import abandoned, split_range, run_process_map, cpu_count
 from . import presets
 
 
@@ -21,6 +21,8 @@ def _veg_noise_chunk_worker(x0, x1, width, height, scale, octaves, persistence,
     vals = []
     cx_local = width/2.0; cy_local = height/2.0
     for x in range(x0, x1):
+        if abandoned():  # run cancelled; the result is discarded
+            break
         rx = x - cx_local
         for y in range(height):
             if use_tr_flag:
@@ -79,12 +81,12 @@ def _get_canvas_size(conf: dict) -> tuple[int, int]:
     return width, height
 
 
-def _terrain_pixel_blocked(terrain_img, x, y, respect: bool) -> bool:
+def _terrain_pixel_blocked(terrain_px, x, y, respect: bool) -> bool:
     if not respect:
         return False
-    if terrain_img is None:
+    if terrain_px is None:
         return False
-    rgb = terrain_img.getpixel((x, y))[:3]
+    rgb = terrain_px[x, y][:3]
     return rgb in TERRAIN_BLOCKLIST
 
 
@@ -114,8 +116,10 @@ def _generate_layers(conf: dict, width: int, height: int, terrain_img=None):
     if not layers:
         return None
 
-    img = Image.new("RGBA", (width, height))
+    img = indexed.new((width, height))
+    view = indexed.PixelView(img)
     px = img.load()
+    terrain_px = indexed.PixelView(terrain_img) if terrain_img is not None else None
 
     # Precompute per-layer noise min/max so thresholds are meaningful (parallelized)
     noises = []
@@ -167,18 +171,19 @@ def _generate_layers(conf: dict, width: int, height: int, terrain_img=None):
 
     # Paint in order; later layers win
     for li, layer in enumerate(layers):
-        color = tuple(layer.get("color", base_colors.VEG["light_long_grass"]))
+        color = view.value(layer.get("color", base_colors.VEG["light_long_grass"]))
         threshold = float(layer.get("threshold", 0.5))
         respect = bool(layer.get("respect_terrain", True))
         terr_in = set(layer.get("terrain_in", []))
+        cancel.check()
         vals = noises[li]; vmin=vmins[li]; vmax=vmaxs[li]; vr = (vmax - vmin) or 1.0
         i=0
         for x in range(width):
             for y in range(height):
-                if _terrain_pixel_blocked(terrain_img, x, y, respect):
+                if _terrain_pixel_blocked(terrain_px, x, y, respect):
                     i+=1; continue
-                if terr_in and terrain_img is not None:
-                    tname = _closest_terrain_name(terrain_img.getpixel((x,y))[:3])
+                if terr_in and terrain_px is not None:
+                    tname = _closest_terrain_name(terrain_px[x, y][:3])
                     if tname not in terr_in:
                         i+=1; continue
                 v = (vals[i] - vmin)/vr; i+=1
@@ -206,8 +211,10 @@ def generate(conf: dict, terrain_img=None):
     layered = _generate_layers(conf, width, height, terrain_img)
 
     # Always compute banded base (used for banded or mixed)
-    img = Image.new("RGBA", (width, height))
+    img = indexed.new((width, height))
+    view = indexed.PixelView(img)
     px = img.load()
+    terrain_px = indexed.PixelView(terrain_img) if terrain_img is not None else None
 
     # Two-pass normalization using transformed sample coords to ensure we use
     # the full band range and get more than just 2–3 colors.
@@ -239,6 +246,7 @@ def generate(conf: dict, terrain_img=None):
     vmin = 1e9
     vmax = -1e9
     for x in range(width):
+        cancel.check()
         for y in range(height):
             vv = sample_at(x, y)
             if vv < vmin: vmin = vv
@@ -255,9 +263,9 @@ def generate(conf: dict, terrain_img=None):
     })
 
     def terrain_bias(x, y):
-        if terrain_img is None:
+        if terrain_px is None:
             return 0.0
-        rgb = terrain_img.getpixel((x, y))[:3]
+        rgb = terrain_px[x, y][:3]
         # quick nearest match among key colors
         candidates = {
             "dark_grass": base_colors.VANILLA["dark_grass"][:3],
@@ -273,11 +281,14 @@ def generate(conf: dict, terrain_img=None):
                 best_d = d; best_name = name
         return float(bias_conf.get(best_name, 0.0))
 
+    none_value = view.value(base_colors.VEG["none"])
+    band_values = [view.value(col) for col in VEG_BANDS]
     for x in range(width):
+        cancel.check()
         for y in range(height):
             # optional terrain-aware rule
-            if _terrain_pixel_blocked(terrain_img, x, y, respect_terrain):
-                px[x, y] = base_colors.VEG["none"]
+            if _terrain_pixel_blocked(terrain_px, x, y, respect_terrain):
+                px[x, y] = none_value
                 continue
 
             vv = sample_at(x, y)
@@ -290,8 +301,7 @@ def generate(conf: dict, terrain_img=None):
             while idx < bands_count and v >= VEG_THRESH[idx + 1]:
                 idx += 1
 
-            col = VEG_BANDS[idx]
-            px[x, y] = col + (255,)
+            px[x, y] = band_values[idx]
 
     if mode == "banded" or layered is None:
         return img
@@ -302,7 +312,7 @@ def generate(conf: dict, terrain_img=None):
     # mixed: replace base with layered pixel with probability = wetness if layered has content
     wet = float(veg_conf.get("mixed_wetness", 0.5))
     wet = max(0.0, min(1.0, wet))
-    lpx = layered.load()
+    lpx = indexed.PixelView(layered)
     # coordinate‑based deterministic RNG
     import random as _random
     rr = _random.Random(int(seed))
@@ -312,7 +322,7 @@ def generate(conf: dict, terrain_img=None):
                 # derive per‑pixel decision from coords to keep deterministic
                 rr.seed((x * 73856093) ^ (y * 19349663) ^ int(seed))
                 if rr.random() < wet:
-                    px[x, y] = lpx[x, y]
+                    px[x, y] = view.value(lpx[x, y])
 
     return img
 
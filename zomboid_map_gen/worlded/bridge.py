@@ -1,14 +1,31 @@
 from __future__ import annotations
 
+import json
+import os
 import shutil
-from dataclasses import dataclass
+import sys
+from dataclasses import dataclass, field
 from datetime import datetime
+from hashlib import blake2s
 from pathlib import Path
-from typing import Tuple
+from typing import Any, Tuple
+
+from PIL import Image
+
 from ..config import DEFAULT_RULES
+from ..export import encoding
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
 WORLD_TAIL_PATH = Path(__file__).resolve().parents[1] / "assets" / "text" / "worlded_tail.txt"
 IMAGES_DIR_NAME = "images"
+# content hashes of the files prepare_project placed, for incremental re-syncs
+SYNC_MANIFEST_NAME = "sync_manifest.json"
+_SYNC_MANIFEST_VERSION = 1
+_FICLONE = 0x40049409  # linux/fs.h: share extents with another file (btrfs, xfs, ...)
 
 
 def project_dir_for(conf: dict, project_name: str | None = None) -> Path:
@@ -30,6 +47,8 @@ def _compute_project_dir(conf: dict, project_name: str | None = None) -> tuple[P
 class WorldEdProject:
     project_dir: Path
     pzw_path: Path
+    # placed / unchanged / removed file counts and whether the .pzw was rewritten
+    sync: dict[str, int] = field(default_factory=dict)
 
     def __str__(self) -> str:
         return str(self.project_dir)
@@ -45,7 +64,13 @@ def prepare_project(
     """
     Prepare a WorldEd-ready project folder from the latest tile export.
 
-    Returns the path to the newly created project directory.
+    Re-running against an existing project is incremental: files whose source
+    content matches the sync manifest are left alone, changed ones are placed
+    by reflink or hardlink where the filesystem allows (`worlded.link_tiles`;
+    safe because tile exports replace files rather than rewrite them, see
+    encoding.save_png) and copied otherwise, tiles of cells no longer in the grid are removed,
+    and the .pzw is only rewritten when its content (grid layout, flags)
+    changes.
     """
     project_dir, folder_name, world_conf = _compute_project_dir(conf, project_name)
 
@@ -60,13 +85,18 @@ def prepare_project(
     for sub in subdirs:
         (project_dir / sub).mkdir(parents=True, exist_ok=True)
 
+    # optional re-encode of the placed tiles; otherwise files are placed verbatim
+    profile = encoding.profile_name(world_conf, fallback="") or None
+    sync = _ProjectSync(project_dir, profile, link=bool(world_conf.get("link_tiles", True)))
+
     rules_src = Path(world_conf.get("rules_file", "")).expanduser()
     if not rules_src.is_file():
         if DEFAULT_RULES.exists():
             rules_src = DEFAULT_RULES
         else:
             raise FileNotFoundError(f"WorldEd rules file not found or invalid: {rules_src}")
-    shutil.copy2(rules_src, project_dir / "Rules.txt")
+    # copied, never linked: users edit the project's Rules.txt
+    sync.place(rules_src, project_dir / "Rules.txt", reencode=False, link=False)
 
     out_dir = Path(conf.get("output_dir", "output")).expanduser()
     exp = conf.get("export", {}) or {}
@@ -79,6 +109,8 @@ def prepare_project(
     if not terrain_src.exists():
         raise FileNotFoundError(f"Terrain tiles not found: {terrain_src}")
 
+    stats: list[encoding.EncodeStat] = []
+
     images_dir = project_dir / IMAGES_DIR_NAME
     terrain_dest = images_dir
     vegetation_dest = images_dir
@@ -92,6 +124,8 @@ def prepare_project(
         cells_y=cells_y,
         rel_root=IMAGES_DIR_NAME,
         copy_files=not reuse_tiles,
+        sync=sync,
+        stats=stats,
     )
     veg_rel_map = _copy_cells(
         vegetation_src,
@@ -105,6 +139,8 @@ def prepare_project(
         suffix="_veg",
         optional=True,
         copy_files=not reuse_tiles,
+        sync=sync,
+        stats=stats,
     )
     if not veg_rel_map:
         veg_rel_map = _copy_cells(
@@ -119,8 +155,14 @@ def prepare_project(
             suffix="_veg",
             optional=True,
             copy_files=not reuse_tiles,
+            sync=sync,
+            stats=stats,
         )
 
+    if stats:
+        encoding.write_report(project_dir / "encoding_report.json", profile, stats)
+    removed = sync.finish()
+
     rules_rel = "Rules.txt"
     tmx_rel = "TMX"
 
@@ -144,8 +186,12 @@ def prepare_project(
     )
 
     pzw_path = project_dir / f"{folder_name}.pzw"
-    pzw_path.write_text(pzw_content, encoding="utf-8")
-    return WorldEdProject(project_dir=project_dir, pzw_path=pzw_path)
+    # rewriting an unchanged world file would make WorldEd offer to reload it
+    pzw_written = not pzw_path.is_file() or pzw_path.read_text(encoding="utf-8") != pzw_content
+    if pzw_written:
+        pzw_path.write_text(pzw_content, encoding="utf-8")
+    counts = {"placed": sync.placed, "unchanged": sync.unchanged, "removed": removed, "pzw_written": int(pzw_written)}
+    return WorldEdProject(project_dir=project_dir, pzw_path=pzw_path, sync=counts)
 
 
 def _grid_dims(conf: dict) -> Tuple[int, int]:
@@ -176,6 +222,8 @@ def _copy_cells(
     suffix: str = "",
     optional: bool = False,
     copy_files: bool = True,
+    sync: _ProjectSync,
+    stats: list[encoding.EncodeStat] | None = None,
 ) -> dict[tuple[int, int], str]:
     dest_dir.mkdir(parents=True, exist_ok=True)
     rel_map: dict[tuple[int, int], str] = {}
@@ -194,7 +242,11 @@ def _copy_cells(
             dest_name = f"{dest_prefix}_{x}_{y}{suffix}.png"
             dest_path = dest_dir / dest_name
             if src_path != dest_path and (copy_files or not dest_path.exists()):
-                shutil.copy2(src_path, dest_path)
+                stat = sync.place(src_path, dest_path)
+                if stat is not None and stats is not None:
+                    stats.append(stat)
+            else:
+                sync.keep(dest_path)
             if not dest_path.exists():
                 missing.append(dest_path)
                 continue
@@ -210,6 +262,147 @@ def _copy_cells(
     return rel_map
 
 
+class _ProjectSync:
+    """
+    Places files into a project against the manifest of the previous sync.
+
+    Entries record the source's content hash and stat, the re-encode profile
+    and the placed file's stat. A source with the same stat (or, failing
+    that, the same hash) whose placed file is untouched is skipped.
+    """
+
+    def __init__(self, project_dir: Path, profile: str | None, link: bool):
+        self.project_dir = project_dir
+        self.profile = profile
+        self.link = link
+        self.path = project_dir / SYNC_MANIFEST_NAME
+        self.previous = _read_sync_manifest(self.path)
+        self.files: dict[str, dict[str, Any]] = {}
+        self.kept: set[str] = set()
+        self.placed = 0
+        self.unchanged = 0
+
+    def _rel(self, dest: Path) -> str:
+        return dest.relative_to(self.project_dir).as_posix()
+
+    def keep(self, dest: Path) -> None:
+        """A file that is used in place (not managed, never pruned)."""
+        self.kept.add(self._rel(dest))
+
+    def place(self, src: Path, dest: Path, *, reencode: bool = True,
+              link: bool | None = None) -> encoding.EncodeStat | None:
+        rel = self._rel(dest)
+        profile = self.profile if reencode else None
+        src_stat = src.stat()
+        entry: dict[str, Any] = {
+            "src_size": src_stat.st_size,
+            "src_mtime_ns": src_stat.st_mtime_ns,
+            "profile": profile or "",
+        }
+        prev = self.previous.get(rel)
+        digest = None
+        if prev and prev.get("profile") == entry["profile"]:
+            # a hardlinked tile follows its source; anything else must be untouched
+            linked = _same_file(src, dest)
+            if linked or _stat_matches(dest, prev, ""):
+                digest = prev.get("hash") if _stat_matches(src, prev, "src_") else _file_digest(src)
+                if linked or digest == prev.get("hash"):
+                    dest_stat = dest.stat()
+                    entry.update(hash=digest, size=dest_stat.st_size, mtime_ns=dest_stat.st_mtime_ns)
+                    self.files[rel] = entry
+                    if digest == prev.get("hash"):
+                        self.unchanged += 1
+                    else:
+                        self.placed += 1
+                    return None
+
+        stat = None
+        if profile:
+            dest.unlink(missing_ok=True)
+            with Image.open(src) as tile:
+                stat = encoding.save_png(tile, dest, profile)
+        else:
+            _link_or_copy(src, dest, self.link if link is None else link)
+        dest_stat = dest.stat()
+        entry.update(hash=digest or _file_digest(src), size=dest_stat.st_size, mtime_ns=dest_stat.st_mtime_ns)
+        self.files[rel] = entry
+        self.placed += 1
+        return stat
+
+    def finish(self) -> int:
+        """Drop files the previous sync placed that this one didn't; write the manifest."""
+        removed = 0
+        for rel in sorted(set(self.previous) - set(self.files) - self.kept):
+            try:
+                (self.project_dir / rel).unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+        manifest = {"version": _SYNC_MANIFEST_VERSION, "files": dict(sorted(self.files.items()))}
+        self.path.write_text(json.dumps(manifest, indent=1), encoding="utf-8")
+        return removed
+
+
+def _read_sync_manifest(path: Path) -> dict[str, dict[str, Any]]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != _SYNC_MANIFEST_VERSION:
+        return {}
+    files = data.get("files")
+    return files if isinstance(files, dict) else {}
+
+
+def _stat_matches(path: Path, entry: dict[str, Any], prefix: str) -> bool:
+    try:
+        st = path.stat()
+    except OSError:
+        return False
+    return st.st_size == entry.get(prefix + "size") and st.st_mtime_ns == entry.get(prefix + "mtime_ns")
+
+
+def _same_file(a: Path, b: Path) -> bool:
+    try:
+        return os.path.samefile(a, b)
+    except OSError:
+        return False
+
+
+def _file_digest(path: Path) -> str:
+    h = blake2s(digest_size=16)
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _link_or_copy(src: Path, dest: Path, link: bool) -> None:
+    # never write through an existing dest: it may be a hardlink to an old export
+    dest.unlink(missing_ok=True)
+    if link:
+        if _reflink(src, dest):
+            return
+        try:
+            os.link(src, dest)
+            return
+        except OSError:
+            pass  # other filesystem, or no hardlink support
+    shutil.copy2(src, dest)
+
+
+def _reflink(src: Path, dest: Path) -> bool:
+    if fcntl is None or not sys.platform.startswith("linux"):
+        return False
+    try:
+        with open(src, "rb") as s, open(dest, "wb") as d:
+            fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+    except OSError:
+        dest.unlink(missing_ok=True)
+        return False
+    shutil.copystat(src, dest)
+    return True
+
 
 def _build_pzw(
     *,